@@ -1,4 +1,13 @@
+from typing import List, Optional
+
+
 class Card:
+    """
+    Cards are interned: there's only one instance per card, created when the module is loaded.
+    Card(rank, suit) and Card.from_code(value) both return the shared instance.
+    """
+    __slots__ = ("_value", "_dto")
+
     RANKS = {
         2: "2",
         3: "3",
@@ -21,12 +30,31 @@ class Card:
         0: u"\u2660",  # 黑桃
     }
 
-    def __init__(self, rank: int, suit: int):
+    # Registry indexed by card value (None for values not matching any card)
+    _CARDS: List[Optional["Card"]] = []
+
+    def __new__(cls, rank: int, suit: int):
         if rank not in Card.RANKS:
             raise ValueError("Invalid card rank")
         if suit not in Card.SUITS:
             raise ValueError("Invalid card suit")
-        self._value: int = (rank << 2) + suit  # 数字左移两位，后两位用于保存花色
+        return Card._CARDS[(rank << 2) + suit]  # 数字左移两位，后两位用于保存花色
+
+    @staticmethod
+    def from_code(value: int) -> "Card":
+        """Returns the card whose value (rank << 2 | suit) is given."""
+        try:
+            card = Card._CARDS[value] if value >= 0 else None
+        except (IndexError, TypeError):
+            card = None
+        if card is None:
+            raise ValueError("Invalid card code")
+        return card
+
+    @staticmethod
+    def all_cards(lowest_rank: int = 2) -> List["Card"]:
+        """New list of the shared instances of every card from the lowest rank."""
+        return [card for card in Card._CARDS[lowest_rank << 2:] if card is not None]
 
     @property
     def rank(self) -> int:
@@ -43,8 +71,28 @@ class Card:
     def __eq__(self, other):
         return int(self) == int(other)
 
+    def __hash__(self):
+        return self._value
+
     def __int__(self):
         return self._value
 
+    def __reduce__(self):
+        # Unpickled cards are the shared instances as well
+        return Card.from_code, (self._value,)
+
     def dto(self):
-        return self.rank, self.suit
+        return self._dto
+
+
+def _create_card(value: int) -> Card:
+    card = object.__new__(Card)
+    card._value = value
+    card._dto = (value >> 2, value & 3)
+    return card
+
+
+Card._CARDS = [
+    _create_card(value) if (value >> 2) in Card.RANKS else None
+    for value in range((max(Card.RANKS) << 2) + 4)
+]
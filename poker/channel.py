@@ -1,3 +1,4 @@
+import json
 from typing import Optional, Any
 
 
@@ -33,12 +34,39 @@ class MessageFormatError(Exception):
             raise MessageFormatError(attribute="message_type", expected=expected, found=message["message_type"])
 
 
+class EncodedMessage(bytes):
+    """Serialized message (UTF-8 bytes) keeping the JSON text it was encoded from, for the channels sending text."""
+    text: str
+
+
+def encode_message(message: Any) -> EncodedMessage:
+    """Serializes a message the way it's sent to the remote host (JSON, UTF-8)."""
+    text = json.dumps(message)
+    data = EncodedMessage(text.encode("utf-8"))
+    data.text = text
+    return data
+
+
 class Channel:
     def recv_message(self, timeout_epoch: Optional[float] = None) -> Any:
         raise NotImplementedError
 
+    def poll_message(self) -> Any:
+        """
+        Returns the next message received if there is one, None otherwise (never waits).
+        Channels that can't tell whether a message is pending return None.
+        """
+        return None
+
     def send_message(self, message: Any):
         raise NotImplementedError
 
+    def send_encoded(self, data: bytes, message: Any = None):
+        """
+        Sends a message already serialized by encode_message, so that a message sent to many players is encoded once.
+        The original message can be given to the channels that don't serialize messages (in-process channels).
+        """
+        self.send_message(message if message is not None else json.loads(data))
+
     def close(self):
         pass
@@ -0,0 +1,193 @@
+import random
+import time
+from typing import Any, Callable, List, Optional
+from uuid import uuid4
+
+import gevent
+from gevent.queue import Queue, Empty
+
+from .card import Card
+from .channel import Channel, ChannelError, MessageTimeout
+from .player_server import PlayerServer
+from .score_detector import HoldemPokerScoreDetector
+from .simulation import CallStrategy
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Think time distributions: callables returning the seconds a bot waits before answering a bet request
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def fixed_think_time(seconds: float) -> Callable[[], float]:
+    return lambda: seconds
+
+
+def uniform_think_time(low: float, high: float, rand: Optional[random.Random] = None) -> Callable[[], float]:
+    rand = rand if rand else random.Random()
+    return lambda: rand.uniform(low, high)
+
+
+def exponential_think_time(mean: float, rand: Optional[random.Random] = None) -> Callable[[], float]:
+    rand = rand if rand else random.Random()
+    return lambda: rand.expovariate(1.0 / mean) if mean > 0 else 0.0
+
+
+class ChannelBot(Channel):
+    """
+    In-process client: answers the messages sent by the game service as a browser would.
+
+    - ping: pong
+    - ping-state: always ready
+    - table-state: acknowledged
+    - player-action bet requests for this player: a bet chosen by the strategy (see poker.simulation) after the
+      think time
+
+    Nothing is serialized, the game service messages are handled as they are sent.
+    """
+
+    def __init__(self, player_id: str, strategy: Optional[Callable] = None,
+                 think_time: Optional[Callable[[], float]] = None,
+                 score_detector: Optional[HoldemPokerScoreDetector] = None):
+        self._player_id: str = player_id
+        self._strategy: Callable = strategy if strategy else CallStrategy()
+        self._think_time: Callable[[], float] = think_time if think_time else fixed_think_time(0.0)
+        self._score_detector: HoldemPokerScoreDetector = score_detector if score_detector \
+            else HoldemPokerScoreDetector()
+        self._replies: Queue = Queue()
+        self._closed: bool = False
+        # Current hand
+        self._cards: List[Card] = []
+        self._shared_cards: List[Card] = []
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        self._closed = True
+        # Wakes up a pending recv_message
+        self._replies.put(None)
+
+    def send_message(self, message: Any):
+        if self._closed:
+            # Like a client gone away: the message is lost
+            return
+
+        message_type = message.get("message_type")
+        if message_type == "ping":
+            self._replies.put({"message_type": "pong"})
+        elif message_type == "ping-state":
+            self._replies.put({"message_type": "ready-state-change", "ready": True})
+        elif message_type == "table-state":
+            self._replies.put({"message_type": "state-ack", "version": message["version"]})
+        elif message_type == "game-update":
+            self._game_update(message)
+
+    def recv_message(self, timeout_epoch: Optional[float] = None) -> Any:
+        if self._closed:
+            raise ChannelError("Channel closed")
+        try:
+            timeout = None if timeout_epoch is None else max(0.0, timeout_epoch - time.time())
+            message = self._replies.get(timeout=timeout)
+        except Empty:
+            raise MessageTimeout("Timed out")
+        if self._closed:
+            raise ChannelError("Channel closed")
+        return message
+
+    def poll_message(self) -> Any:
+        if self._closed:
+            return None
+        try:
+            return self._replies.get_nowait()
+        except Empty:
+            return None
+
+    def _game_update(self, message: dict):
+        event = message.get("event")
+        if event == "new-game":
+            self._cards = []
+            self._shared_cards = []
+        elif event == "cards-assignment" and message.get("target") == self._player_id:
+            self._cards = [Card(rank, suit) for rank, suit in message["cards"]]
+        elif event == "shared-cards":
+            self._shared_cards += [Card(rank, suit) for rank, suit in message["cards"]]
+        elif event == "player-action" and message.get("action") == "bet" \
+                and message["player"]["id"] == self._player_id:
+            bet = self._strategy(
+                player=message["player"],
+                min_bet=message["min_bet"],
+                max_bet=message["max_bet"],
+                bets=message["bets"],
+                cards=self._cards,
+                shared_cards=self._shared_cards,
+                score=self._score_detector.get_score(self._cards + self._shared_cards) if self._cards else None
+            )
+            reply = {"message_type": "bet", "bet": bet}
+            think_time = self._think_time()
+            if think_time > 0:
+                gevent.spawn_later(think_time, self._replies.put, reply)
+            else:
+                self._replies.put(reply)
+
+
+def create_bot(name: Optional[str] = None, money: int = 1000, strategy: Optional[Callable] = None,
+               think_time: Optional[Callable[[], float]] = None,
+               score_detector: Optional[HoldemPokerScoreDetector] = None, logger=None) -> PlayerServer:
+    """Creates a player served by an in-process ChannelBot."""
+    player_id = "bot-{}".format(uuid4())
+    return PlayerServer(
+        ChannelBot(player_id, strategy, think_time, score_detector),
+        logger,
+        id=player_id,
+        name=name if name else player_id,
+        money=money,
+        loan=0,
+        ready=True
+    )
+
+
+if __name__ == '__main__':
+    # Load test of a game service process: python -m poker.channel_bot [tables] [players per table] [mean think time]
+    import logging
+    import sys
+
+    from .game_room import GameRoomFactory
+    from .game_server import GameServer
+    from .poker_game import GameSubscriber
+    from .poker_game_holdem import HoldemPokerGameFactory
+    from .simulation import RandomStrategy, ScoreStrategy
+
+    class HandsCounter(GameSubscriber):
+        def __init__(self):
+            self.hands = 0
+
+        def game_event(self, event, event_data):
+            if event == "game-over":
+                self.hands += 1
+
+    logging.basicConfig(level=logging.WARNING)
+    num_tables = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    table_size = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    mean_think_time = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+
+    counter = HandsCounter()
+    server = GameServer(
+        GameRoomFactory(
+            room_size=table_size,
+            game_factory=HoldemPokerGameFactory(10, 5, logging.getLogger(), [counter], persistent=False)
+        )
+    )
+    bots_rand = random.Random()
+    server.add_bots([
+        create_bot(
+            strategy=ScoreStrategy() if i % 2 else RandomStrategy(bots_rand),
+            think_time=exponential_think_time(mean_think_time, bots_rand)
+        )
+        for i in range(num_tables * table_size)
+    ])
+
+    start = time.time()
+    while True:
+        gevent.sleep(10)
+        print("{} tables: {} hands, {:.1f} hands/s".format(num_tables, counter.hands,
+                                                           counter.hands / (time.time() - start)), flush=True)
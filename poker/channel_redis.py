@@ -6,7 +6,7 @@ from typing import Optional, Any
 import gevent
 from redis import exceptions, Redis
 
-from .channel import Channel, MessageFormatError, MessageTimeout, ChannelError
+from .channel import Channel, MessageFormatError, MessageTimeout, ChannelError, encode_message
 
 
 class MessageQueue:
@@ -23,8 +23,9 @@ class MessageQueue:
         return self._queue_name
 
     def push(self, message: Any):
-        msg_serialized = json.dumps(message)
-        msg_encoded = msg_serialized.encode("utf-8")
+        self.push_encoded(encode_message(message))
+
+    def push_encoded(self, msg_encoded: bytes):
         try:
             self._redis.lpush(self._queue_name, msg_encoded)  # 推入队列左端
             self._redis.expire(self._queue_name, self._expire)  # 设置队列过期时间
@@ -33,22 +34,28 @@ class MessageQueue:
 
     def pop(self, timeout_epoch: Optional[float] = None) -> Any:
         while timeout_epoch is None or time.time() < timeout_epoch:
-            try:
-                response = self._redis.rpop(self._queue_name)  # 从队列右端弹出消息
-                if response is not None:
-                    try:
-                        # Deserialize and return the message
-                        return json.loads(response)
-                    except ValueError:
-                        # Invalid json
-                        raise MessageFormatError(desc="Unable to decode the JSON message")
-                else:
-                    # Context switching
-                    gevent.sleep(0.01)
-            except exceptions.RedisError as ex:
-                raise ChannelError(ex.args[0])
+            message = self.pop_nowait()
+            if message is not None:
+                return message
+            # Context switching
+            gevent.sleep(0.01)
         raise MessageTimeout("Timed out")
 
+    def pop_nowait(self) -> Any:
+        """Pops a message if the queue isn't empty, returns None otherwise."""
+        try:
+            response = self._redis.rpop(self._queue_name)  # 从队列右端弹出消息
+        except exceptions.RedisError as ex:
+            raise ChannelError(ex.args[0])
+        if response is None:
+            return None
+        try:
+            # Deserialize and return the message
+            return json.loads(response)
+        except ValueError:
+            # Invalid json
+            raise MessageFormatError(desc="Unable to decode the JSON message")
+
 
 class ChannelRedis(Channel):
     """
@@ -70,6 +77,12 @@ class ChannelRedis(Channel):
         # 左入
         self._queue_out.push(message)
 
+    def send_encoded(self, data: bytes, message: Any = None):
+        self._queue_out.push_encoded(data)
+
     def recv_message(self, timeout_epoch: Optional[float] = None) -> Any:
         # 右出
         return self._queue_in.pop(timeout_epoch)
+
+    def poll_message(self) -> Any:
+        return self._queue_in.pop_nowait()
@@ -5,7 +5,7 @@ from typing import Optional, Any
 
 from geventwebsocket.websocket import WebSocket
 
-from .channel import Channel, ChannelError, MessageFormatError, MessageTimeout
+from .channel import Channel, ChannelError, EncodedMessage, MessageFormatError, MessageTimeout, encode_message
 
 
 class ChannelWebSocket(Channel):
@@ -16,11 +16,17 @@ class ChannelWebSocket(Channel):
         self._ws.close()
 
     def send_message(self, message: Any):
+        self.send_encoded(encode_message(message))
+
+    def send_encoded(self, data: bytes, message: Any = None):
         if self._ws.closed:
             raise ChannelError("Unable to send data to the remote host (not connected)")
 
         try:
-            self._ws.send(json.dumps(message))
+            # JSON messages are text frames: gevent-websocket only sends str as text (bytes would be sent as "b'...'").
+            # Messages encoded by encode_message keep their text: broadcasts are not decoded for every player
+            text = data.text if isinstance(data, EncodedMessage) else data.decode("utf-8")
+            self._ws.send(text, binary=False)
         except:
             raise ChannelError("Unable to send data to the remote host")
 
@@ -8,6 +8,11 @@ import sqlite3
 
 DATABASE_PATH = "/home/pypoker/user.db"
 INIT_MONEY = 3000
+# 数据库结构版本（PRAGMA user_version），服务启动时升级
+SCHEMA_VERSION_CHIPS = 1
+# player_stats 表的计数列
+PLAYER_STATS_COLUMNS = ("hands", "vpip_hands", "pfr_hands", "aggressive_actions", "calls", "showdowns",
+                        "showdowns_won", "net_chips")
 
 
 def get_db_connection():
@@ -132,6 +137,7 @@ def get_ranking_list():
     # 获取排行列表
     all_player_data = query_ranking_in_db()
     daily_ranking = get_daily_ranking()
+    player_stats = query_player_stats()
     ranking_data = []
     for player_data in all_player_data:
         player_name, player_money, player_loan, player_hands, _ = player_data[0], player_data[1], player_data[2], \
@@ -141,7 +147,9 @@ def get_ranking_list():
         player_total_money = player_money - (1000 * player_loan)
         avg_profit = 0 if player_hands == 0 else round((player_total_money - INIT_MONEY) / player_hands, 2) * 100
         daily_profit = daily_ranking.get(player_name, 0)
-        ranking_data.append((player_name, player_total_money, avg_profit, daily_profit))
+        stats = player_stats.get(str(player_data[4]))
+        ranking_data.append((player_name, player_total_money, avg_profit, daily_profit,
+                             compute_player_stats(stats) if stats else None))
     ranking_data = sorted(ranking_data, key=lambda x: x[2], reverse=True)
 
     return ranking_data
@@ -218,15 +226,15 @@ def create_daily_table():
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
+        cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS daily (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 username TEXT NOT NULL,
-                start_money FLOAT DEFAULT ?,
-                latest_money FLOAT DEFAULT ?,
+                start_money INTEGER DEFAULT {INIT_MONEY},
+                latest_money INTEGER DEFAULT {INIT_MONEY},
                 date DATE DEFAULT (date('now', 'localtime'))
             )
-        """, (INIT_MONEY, INIT_MONEY))
+        """)
         conn.commit()
     except Exception as e:
         print(f"Error creating table in database: {e}")
@@ -390,6 +398,147 @@ def reset_daily_table():
         conn.close()
 
 
+def migrate_money_to_chips():
+    """
+    金额改为整数筹码：把 users 和 daily 表中的浮点金额四舍五入为整数，
+    并把 daily 表的 FLOAT 列改为 INTEGER（SQLite 的 FLOAT 列会把整数存成浮点数）。
+    服务启动时调用：迁移完成后数据库版本（PRAGMA user_version）记为 SCHEMA_VERSION_CHIPS，之后不再执行。
+    :return: 数据库是否已迁移
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if cursor.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION_CHIPS:
+            return True
+        cursor.execute("BEGIN")
+        tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if "users" in tables:
+            cursor.execute("""
+                UPDATE users
+                SET money = CAST(ROUND(money) AS INTEGER)
+                WHERE typeof(money) != 'integer'
+            """)
+        if "daily" in tables:
+            cursor.execute("ALTER TABLE daily RENAME TO daily_float")
+        cursor.execute(f"""
+            CREATE TABLE daily (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                start_money INTEGER DEFAULT {INIT_MONEY},
+                latest_money INTEGER DEFAULT {INIT_MONEY},
+                date DATE DEFAULT (date('now', 'localtime'))
+            )
+        """)
+        if "daily" in tables:
+            cursor.execute("""
+                INSERT INTO daily (id, username, start_money, latest_money, date)
+                SELECT id, username, CAST(ROUND(start_money) AS INTEGER), CAST(ROUND(latest_money) AS INTEGER), date
+                FROM daily_float
+            """)
+            cursor.execute("DROP TABLE daily_float")
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION_CHIPS}")
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error migrating money to chips in database: {e}")
+        conn.rollback()
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def create_player_stats_table():
+    # 服务启动时创建一次
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS player_stats (
+                player_id TEXT PRIMARY KEY,
+                {}
+            )
+        """.format(",\n                ".join("{} INTEGER DEFAULT 0".format(column) for column in PLAYER_STATS_COLUMNS)))
+        conn.commit()
+    except Exception as e:
+        print(f"Error creating player stats table in database: {e}")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def add_player_stats(stats):
+    """
+    累加玩家统计计数（一个事务写入一批）
+    :param stats: {player_id: {列名: 增量}}
+    :return: 是否写入成功
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany("""
+            INSERT INTO player_stats (player_id, {columns})
+            VALUES (?, {values})
+            ON CONFLICT(player_id) DO UPDATE SET {updates}
+        """.format(
+            columns=", ".join(PLAYER_STATS_COLUMNS),
+            values=", ".join("?" for _ in PLAYER_STATS_COLUMNS),
+            updates=", ".join("{0} = {0} + excluded.{0}".format(column) for column in PLAYER_STATS_COLUMNS)
+        ), [
+            [player_id] + [counters.get(column, 0) for column in PLAYER_STATS_COLUMNS]
+            for player_id, counters in stats.items()
+        ])
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error updating player stats in database: {e}")
+        conn.rollback()
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def query_player_stats():
+    """
+    查询所有玩家的统计计数
+    :return: {player_id: {列名: 计数}}
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT player_id, {} FROM player_stats".format(", ".join(PLAYER_STATS_COLUMNS)))
+        return {row[0]: dict(zip(PLAYER_STATS_COLUMNS, row[1:])) for row in cursor.fetchall()}
+    except Exception as e:
+        print(f"Error querying player stats from database: {e}")
+        return {}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def compute_player_stats(counters):
+    """
+    由统计计数计算玩家数据
+    - vpip: 翻牌前主动入池的手数比例 (%)
+    - pfr: 翻牌前加注的手数比例 (%)
+    - af: 激进度，加注次数 / 跟注次数（没有跟注时为 None）
+    - wsd: 摊牌胜率 (%)
+    - net_per_100: 每100手净胜筹码
+    """
+    hands = counters.get("hands", 0)
+    calls = counters.get("calls", 0)
+    showdowns = counters.get("showdowns", 0)
+    return {
+        "hands": hands,
+        "vpip": round(100.0 * counters.get("vpip_hands", 0) / hands, 1) if hands else 0.0,
+        "pfr": round(100.0 * counters.get("pfr_hands", 0) / hands, 1) if hands else 0.0,
+        "af": round(counters.get("aggressive_actions", 0) / calls, 2) if calls else None,
+        "wsd": round(100.0 * counters.get("showdowns_won", 0) / showdowns, 1) if showdowns else 0.0,
+        "net_per_100": round(100.0 * counters.get("net_chips", 0) / hands, 1) if hands else 0.0,
+    }
+
+
 if __name__ == '__main__':
     # 删除表
     # drop_tabel('daily')
@@ -398,6 +547,10 @@ if __name__ == '__main__':
     # 重置数据库
     # reset_player_in_db()
     # reset_daily_table()
+    # 金额改为整数筹码
+    # migrate_money_to_chips()
+    # 新建玩家统计表
+    # create_player_stats_table()
     # 查询当前所有数据
     query_all_data('users')
     print('=' * 50)
@@ -1,23 +1,30 @@
 import random
-from typing import List
+from typing import List, Optional, Type
 
 from .card import Card
 
 
 class DeckFactory:
-    def __init__(self, lowest_rank: int):
+    def __init__(self, lowest_rank: int, deck_type: Optional[Type] = None, rand: Optional[random.Random] = None):
         self._lowest_rank = lowest_rank  # 指定最小牌
+        # Deck implementation: Deck or CompactDeck
+        self._deck_type: Type = deck_type if deck_type else Deck
+        # Random generator shared by the decks (None for the deck default)
+        self._rand: Optional[random.Random] = rand
+        # Cards are shared instances, every deck is a shuffled copy of this list
+        self._cards: List[Card] = Card.all_cards(lowest_rank)
 
     def create_deck(self):
-        return Deck(self._lowest_rank)
+        return self._deck_type(self._lowest_rank, self._cards, self._rand)
 
 
 class Deck:
-    def __init__(self, lowest_rank: int):
+    def __init__(self, lowest_rank: int, cards: Optional[List[Card]] = None, rand: Optional[random.Random] = None):
         # 生成所有牌
-        self._cards: List[Card] = [Card(rank, suit) for rank in range(lowest_rank, 15) for suit in range(0, 4)]
+        self._cards: List[Card] = list(cards) if cards is not None else Card.all_cards(lowest_rank)
         self._discard: List[Card] = []  # 存放弃牌
-        random.shuffle(self._cards)
+        self._shuffle = rand.shuffle if rand is not None else random.shuffle
+        self._shuffle(self._cards)
 
     def pop_cards(self, num_cards=1) -> List[Card]:
         """Returns and removes cards them from the top of the deck."""
@@ -27,9 +34,52 @@ class Deck:
             new_cards = self._cards
             self._cards = self._discard
             self._discard = []
-            random.shuffle(self._cards)
+            self._shuffle(self._cards)
         return new_cards + [self._cards.pop() for _ in range(num_cards - len(new_cards))]
 
     def push_cards(self, discard: List[Card]):
         """Adds discard"""
         self._discard += discard
+
+
+class CompactDeck:
+    """
+    Deck of card codes (see Card._value) stored in a bytearray.
+    Cards are not shuffled upfront: every card is drawn at random among the remaining ones when it's dealt
+    (Fisher-Yates shuffle stopped after the dealt cards).
+    The random generator defaults to the operating system CSPRNG, a seeded random.Random can be given for tests.
+    """
+
+    def __init__(self, lowest_rank: int, cards: Optional[List[Card]] = None, rand: Optional[random.Random] = None):
+        cards = cards if cards is not None else Card.all_cards(lowest_rank)
+        self._codes: bytearray = bytearray(int(card) for card in cards)
+        # Cards still in the deck are codes[0:size], dealt cards are moved at the end
+        self._size: int = len(self._codes)
+        self._discard: bytearray = bytearray()  # 存放弃牌
+        self._rand: random.Random = rand if rand is not None else random.SystemRandom()
+
+    def __len__(self):
+        return self._size
+
+    def pop_cards(self, num_cards=1) -> List[Card]:
+        """Returns and removes random cards from the deck."""
+        cards = []
+        for _ in range(num_cards):
+            if not self._size:
+                # 牌堆中的牌用完后，使用弃牌堆补充牌堆
+                if not self._discard:
+                    raise IndexError("No cards left in the deck")
+                self._codes = self._discard
+                self._size = len(self._codes)
+                self._discard = bytearray()
+            self._size -= 1
+            i = self._rand.randrange(self._size + 1)
+            code = self._codes[i]
+            self._codes[i] = self._codes[self._size]
+            self._codes[self._size] = code
+            cards.append(Card.from_code(code))
+        return cards
+
+    def push_cards(self, discard: List[Card]):
+        """Adds discard"""
+        self._discard.extend(int(card) for card in discard)
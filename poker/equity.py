@@ -0,0 +1,187 @@
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from math import comb
+from typing import List, Optional, Sequence
+
+from .card import Card
+from .hand_evaluator import BoardState, HandEvaluator, get_hand_evaluator
+from .score_detector import HoldemPokerScoreDetector
+
+
+class EquityResult:
+    """Win and tie counts of every player over the evaluated boards."""
+
+    def __init__(self, num_players: int):
+        self._wins: List[int] = [0] * num_players
+        self._ties: List[int] = [0] * num_players
+        # Sum of the pot shares won in ties (1/2 for a 2-way tie, 1/3 for a 3-way tie, ...)
+        self._tie_shares: List[float] = [0.0] * num_players
+        self._boards: int = 0
+        self.exact: bool = False
+
+    @property
+    def boards(self) -> int:
+        return self._boards
+
+    def win(self, player: int) -> float:
+        return 100.0 * self._wins[player] / self._boards if self._boards else 0.0
+
+    def tie(self, player: int) -> float:
+        return 100.0 * self._ties[player] / self._boards if self._boards else 0.0
+
+    def equity(self, player: int) -> float:
+        """Share of the pot the player wins on average, in percentage."""
+        return 100.0 * (self._wins[player] + self._tie_shares[player]) / self._boards if self._boards else 0.0
+
+    def add_board(self, winners: List[int]):
+        self._boards += 1
+        if len(winners) == 1:
+            self._wins[winners[0]] += 1
+        else:
+            for winner in winners:
+                self._ties[winner] += 1
+                self._tie_shares[winner] += 1.0 / len(winners)
+
+    def merge(self, other: "EquityResult"):
+        self._boards += other._boards
+        for player in range(len(self._wins)):
+            self._wins[player] += other._wins[player]
+            self._ties[player] += other._ties[player]
+            self._tie_shares[player] += other._tie_shares[player]
+
+    def dto(self):
+        return {
+            "boards": self._boards,
+            "exact": self.exact,
+            "players": [
+                {"win": self.win(player), "tie": self.tie(player), "equity": self.equity(player)}
+                for player in range(len(self._wins))
+            ]
+        }
+
+
+def _score_board(evaluator: HandEvaluator, players_codes: List[List[int]], board_codes: Sequence[int],
+                 result: EquityResult):
+    board = BoardState()
+    board.add_cards(board_codes)
+    strengths = [evaluator.evaluate_board(board, codes) for codes in players_codes]
+    best = max(strengths)
+    result.add_board([player for player, strength in enumerate(strengths) if strength == best])
+
+
+def _run_equity_job(players_codes: List[List[int]], board_codes: List[int], deck_codes: List[int], exact: bool,
+                    job_id: int, num_jobs: int, samples: int, deadline: Optional[float], seed: int,
+                    evaluator: Optional[HandEvaluator] = None) -> EquityResult:
+    """
+    Runs a slice of an equity calculation (in a worker process).
+    Exact jobs evaluate every num_jobs-th board completion starting from job_id, Monte Carlo jobs draw random
+    completions until the number of samples or the deadline is reached.
+    """
+    if evaluator is None:
+        evaluator = get_hand_evaluator()
+    result = EquityResult(len(players_codes))
+    result.exact = exact
+    missing = 5 - len(board_codes)
+
+    if exact:
+        completions = itertools.islice(itertools.combinations(deck_codes, missing), job_id, None, num_jobs)
+        for completion in completions:
+            _score_board(evaluator, players_codes, board_codes + list(completion), result)
+        return result
+
+    rand = random.Random(seed)
+    for sample in range(samples):
+        # Checking the clock every 1000 boards
+        if deadline is not None and sample % 1000 == 0 and time.time() > deadline:
+            break
+        _score_board(evaluator, players_codes, board_codes + rand.sample(deck_codes, missing), result)
+    return result
+
+
+class EquityCalculator:
+    """
+    Win and tie percentages of 2 to 10 holdem hands, given an optional partial board and dead cards.
+
+    All the board completions are enumerated when there are at most `exact_limit` of them, otherwise boards are
+    sampled (Monte Carlo) until `max_samples` boards are evaluated or `time_budget` seconds are elapsed.
+    Work is split over a pool of `processes` worker processes (the calculation runs in the calling process if 1).
+    """
+    MIN_PLAYERS = 2
+    MAX_PLAYERS = 10
+
+    def __init__(self, processes: Optional[int] = None, exact_limit: int = 50000, max_samples: int = 100000,
+                 time_budget: Optional[float] = None, score_detector: Optional[HoldemPokerScoreDetector] = None,
+                 seed: Optional[int] = None):
+        self._processes: int = processes if processes else (os.cpu_count() or 1)
+        self._exact_limit: int = exact_limit
+        self._max_samples: int = max_samples
+        self._time_budget: Optional[float] = time_budget
+        self._score_detector: HoldemPokerScoreDetector = score_detector if score_detector \
+            else HoldemPokerScoreDetector()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Seeds of the Monte Carlo jobs
+        self._rand = random.Random(seed) if seed is not None else random.SystemRandom()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _remaining_cards(self, known_cards: List[Card]) -> List[Card]:
+        known = set(known_cards)
+        if len(known) != len(known_cards):
+            raise ValueError("Duplicate cards")
+        return [card for card in Card.all_cards() if card not in known]
+
+    def calculate(self, players_cards: List[List[Card]], board: Optional[List[Card]] = None,
+                  dead_cards: Optional[List[Card]] = None) -> EquityResult:
+        board = list(board) if board else []
+        dead_cards = list(dead_cards) if dead_cards else []
+
+        if not EquityCalculator.MIN_PLAYERS <= len(players_cards) <= EquityCalculator.MAX_PLAYERS:
+            raise ValueError("Equity needs between {} and {} players".format(
+                EquityCalculator.MIN_PLAYERS, EquityCalculator.MAX_PLAYERS))
+        if any(len(cards) != 2 for cards in players_cards):
+            raise ValueError("Every player needs 2 cards")
+        if len(board) > 5:
+            raise ValueError("Too many shared cards")
+
+        deck = self._remaining_cards([card for cards in players_cards for card in cards] + board + dead_cards)
+        missing = 5 - len(board)
+        if len(deck) < missing:
+            raise ValueError("Not enough cards left")
+
+        players_codes = [[int(card) for card in cards] for cards in players_cards]
+        board_codes = [int(card) for card in board]
+        deck_codes = [int(card) for card in deck]
+
+        exact = comb(len(deck_codes), missing) <= self._exact_limit
+        num_jobs = min(self._processes, comb(len(deck_codes), missing)) if exact else self._processes
+        deadline = time.time() + self._time_budget if self._time_budget is not None else None
+        seeds = [self._rand.getrandbits(64) for _ in range(num_jobs)]
+        samples = [self._max_samples // num_jobs + (1 if job_id < self._max_samples % num_jobs else 0)
+                   for job_id in range(num_jobs)]
+        jobs = [
+            (players_codes, board_codes, deck_codes, exact, job_id, num_jobs, samples[job_id], deadline, seeds[job_id])
+            for job_id in range(num_jobs)
+        ]
+
+        result = EquityResult(len(players_cards))
+        result.exact = exact
+        if num_jobs == 1:
+            result.merge(_run_equity_job(*jobs[0], evaluator=self._score_detector.evaluator))
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self._processes)
+            for job_result in self._executor.map(_run_equity_job, *zip(*jobs)):
+                result.merge(job_result)
+        return result
@@ -0,0 +1,181 @@
+import logging
+from typing import Dict, List, Optional
+
+import gevent
+from gevent.queue import JoinableQueue, Empty, Full
+
+
+class OverflowPolicy:
+    """What to do with a new event when the queue of a subscriber is full."""
+    DROP_OLDEST = "drop-oldest"  # 丢弃最早的事件
+    DROP_NEWEST = "drop-newest"  # 丢弃新事件
+    UNSUBSCRIBE = "unsubscribe"  # 取消订阅过慢的订阅者
+    BLOCK = "block"  # 等待队列有空位：不能丢失事件的订阅者才使用，会阻塞游戏
+
+    ALL = (DROP_OLDEST, DROP_NEWEST, UNSUBSCRIBE, BLOCK)
+
+
+class SubscriberQueue:
+    """
+    Bounded queue of the events of a subscriber, delivered in order by its own consumer greenlet.
+    Publishing never waits for the subscriber (unless its overflow policy is BLOCK).
+    """
+
+    def __init__(self, subscriber, max_size: int, overflow: str, logger):
+        if overflow not in OverflowPolicy.ALL:
+            raise ValueError("Unknown overflow policy: {}".format(overflow))
+        self._subscriber = subscriber
+        self._queue: JoinableQueue = JoinableQueue(maxsize=max_size)
+        self._overflow: str = overflow
+        self._logger = logger
+        self._closed: bool = False
+        # Metrics
+        self._max_depth: int = 0
+        self._published: int = 0
+        self._delivered: int = 0
+        self._dropped: int = 0
+        self._errors: int = 0
+        self._consumer = gevent.spawn(self._consume)
+
+    @property
+    def subscriber(self):
+        return self._subscriber
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def metrics(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_depth": self._max_depth,
+            "published": self._published,
+            "delivered": self._delivered,
+            "dropped": self._dropped,
+            "errors": self._errors,
+        }
+
+    def put(self, event: str, event_data: dict) -> bool:
+        """Queues an event, returns False if the subscriber must be unsubscribed (UNSUBSCRIBE overflow policy)."""
+        if self._closed:
+            return False
+        self._published += 1
+        try:
+            self._queue.put((event, event_data), block=self._overflow == OverflowPolicy.BLOCK)
+        except Full:
+            if self._overflow == OverflowPolicy.DROP_OLDEST:
+                self._drop_oldest()
+                self._queue.put_nowait((event, event_data))
+            elif self._overflow == OverflowPolicy.DROP_NEWEST:
+                self._drop(event)
+            else:
+                self._drop(event)
+                return False
+        self._max_depth = max(self._max_depth, self._queue.qsize())
+        return True
+
+    def _drop_oldest(self):
+        try:
+            event, _ = self._queue.get_nowait()
+        except Empty:
+            return
+        self._queue.task_done()
+        self._drop(event)
+
+    def _drop(self, event: str):
+        if not self._dropped:
+            self._logger.warning("Event queue of {} is full ({} policy)".format(self._subscriber, self._overflow))
+        self._dropped += 1
+        self._logger.debug("Event {} dropped for {}".format(event, self._subscriber))
+
+    def _consume(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                # 队列已关闭
+                self._queue.task_done()
+                return
+            event, event_data = item
+            try:
+                self._subscriber.game_event(event, event_data)
+                self._delivered += 1
+            except Exception:
+                self._errors += 1
+                self._logger.exception("Error delivering event {} to {}".format(event, self._subscriber))
+            finally:
+                self._queue.task_done()
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stops the consumer once the queued events are delivered (or when the timeout expires, dropping the events
+        still queued). Returns False if the queue could not be drained.
+        """
+        if self._closed:
+            return True
+        self._closed = True
+        # timeout 0: no wait at all, the queued events are dropped
+        drained = self._queue.join(timeout=timeout) if timeout != 0 else not self._queue.unfinished_tasks
+        while not self._queue.empty():
+            self._drop_oldest()
+        # The consumer stops after the event it may be delivering
+        self._queue.put_nowait(None)
+        return drained
+
+
+class GameEventBus:
+    """
+    Fans out the events of a game to its subscribers: every subscriber has a bounded queue and its own consumer, so
+    events are delivered in order to each subscriber and a slow subscriber never holds up the game or the others.
+    """
+    QUEUE_SIZE = 1000
+    OVERFLOW = OverflowPolicy.DROP_OLDEST
+    DRAIN_TIMEOUT = 5.0  # 取消订阅时等待队列中事件投递完成的时间
+
+    def __init__(self, logger=None):
+        self._queues: List[SubscriberQueue] = []
+        self._logger = logger if logger else logging
+
+    @property
+    def subscribers(self) -> list:
+        return [queue.subscriber for queue in self._queues]
+
+    def subscribe(self, subscriber, queue_size: Optional[int] = None, overflow: Optional[str] = None):
+        self._queues.append(SubscriberQueue(
+            subscriber,
+            max_size=queue_size if queue_size else self.QUEUE_SIZE,
+            overflow=overflow if overflow else self.OVERFLOW,
+            logger=self._logger
+        ))
+
+    def unsubscribe(self, subscriber, timeout: Optional[float] = DRAIN_TIMEOUT):
+        """Removes a subscriber once its pending events are delivered."""
+        queue = self._find_queue(subscriber)
+        self._queues.remove(queue)
+        queue.close(timeout)
+
+    def _find_queue(self, subscriber) -> SubscriberQueue:
+        for queue in self._queues:
+            if queue.subscriber is subscriber:
+                return queue
+        raise ValueError("Unknown subscriber")
+
+    def publish(self, event: str, event_data: dict):
+        for queue in list(self._queues):
+            if not queue.put(event, event_data):
+                self._logger.warning("Unsubscribing {}: event queue full".format(queue.subscriber))
+                self._queues.remove(queue)
+                queue.close(0)
+
+    def close(self, timeout: Optional[float] = DRAIN_TIMEOUT):
+        """Delivers the pending events and stops every consumer."""
+        queues, self._queues = self._queues, []
+        for queue in queues:
+            queue.close(timeout)
+
+    def metrics(self) -> Dict[str, dict]:
+        """Queue depth and delivery counters of every subscriber."""
+        return {str(queue.subscriber): queue.metrics() for queue in self._queues}
@@ -3,8 +3,11 @@ from typing import Dict, List, Optional
 
 import gevent
 
+from .channel import encode_message
+from .event_bus import OverflowPolicy
 from .player_server import PlayerServer
 from .poker_game import GameSubscriber, GameError, GameFactory
+from .table_state import HandSnapshot, TableState
 
 
 class FullGameRoomException(Exception):
@@ -118,6 +121,10 @@ class GameRoomEventHandler:
         self._room_players: GameRoomPlayers = room_players
         self._room_id: str = room_id
         self._logger = logger
+        self._table_state: TableState = TableState(room_id, len(room_players.seats))  # 座位和玩家的版本化状态
+        # 序列化和发送的消息数量（每局统计）
+        self._encoded: int = 0
+        self._sent: int = 0
 
     def room_event(self, event, player_id):
         """
@@ -136,22 +143,83 @@ class GameRoomEventHandler:
             ) + "\n" +
             ("-" * 80) + "\n"
         )
+        # 座位和玩家信息通过table-state消息发送
+        self.update_state(
+            players=[player.dto() for player in self._room_players.players],
+            seats=self._room_players.seats
+        )
         self.broadcast({
             "message_type": "room-update",
             "event": event,
             "room_id": self._room_id,
-            "players": {player.id: player.dto() for player in self._room_players.players},
-            "player_ids": self._room_players.seats,
+            "version": self._table_state.version,
             "player_id": player_id
         })
 
+    @property
+    def table_state(self) -> TableState:
+        return self._table_state
+
+    def update_state(self, players=(), seats=None):
+        """
+        更新房间状态，有变化时将变化部分发送给玩家。
+        :param players: 玩家DTO
+        :param seats: 座位列表
+        """
+        if self._table_state.update(players, seats):
+            self.send_state()
+
+    def send_state(self):
+        """
+        发送玩家确认的版本之后的状态变化，确认了同一版本的玩家共享同一条序列化的消息。
+        """
+        groups: Dict[Optional[int], List[PlayerServer]] = {}
+        for player in self._room_players.players:
+            player.receive_state_acks()
+            groups.setdefault(player.state_version, []).append(player)
+        for version, players in groups.items():
+            if version == self._table_state.version:
+                continue
+            message = self._table_state.delta(version)
+            data = self._encode(message)
+            for player in players:
+                player.try_send_encoded(data, message)
+            self._sent += len(players)
+
     def broadcast(self, message):
         """
-        广播消息到所有玩家。
+        广播消息到所有玩家，消息只序列化一次。
         :param message: 要广播的消息
         """
-        for player in self._room_players.players:
-            player.try_send_message(message)
+        players = self._room_players.players
+        if not players:
+            return
+        data = self._encode(message)
+        for player in players:
+            player.try_send_encoded(data, message)
+        self._sent += len(players)
+
+    def send(self, player: PlayerServer, message):
+        """
+        发送消息给单个玩家。
+        :param player: 接收消息的玩家
+        :param message: 要发送的消息
+        """
+        player.send_encoded(self._encode(message), message)
+        self._sent += 1
+
+    def _encode(self, message) -> bytes:
+        self._encoded += 1
+        return encode_message(message)
+
+    def pop_encode_counts(self) -> Dict[str, int]:
+        """
+        返回并清零序列化和发送的消息数量。
+        :return: {"encoded": 序列化次数, "sent": 发送的消息数}
+        """
+        counts = {"encoded": self._encoded, "sent": self._sent}
+        self._encoded = self._sent = 0
+        return counts
 
 
 class GameRoom(GameSubscriber):
@@ -160,6 +228,10 @@ class GameRoom(GameSubscriber):
     以及与游戏工厂交互以管理游戏的生命周期。
     继承自 GameSubscriber，支持订阅游戏事件。
     """
+    # 玩家信息由table-state消息发送的游戏事件
+    STATE_EVENTS = ("pots-update", "winner-designation")
+    # 玩家看到的事件不能丢失（丢失下注请求玩家就不会行动）：队列满时游戏等待房间
+    EVENT_OVERFLOW = OverflowPolicy.BLOCK
 
     def __init__(self, id: str, private: bool, game_factory: GameFactory, room_size: int, logger):
         """
@@ -176,7 +248,7 @@ class GameRoom(GameSubscriber):
         self._game_factory = game_factory
         self._room_players = GameRoomPlayers(room_size)  # 管理玩家
         self._room_event_handler = GameRoomEventHandler(self._room_players, self.id, logger)  # 管理房间
-        self._event_messages = []
+        self._hand_snapshot = HandSnapshot()  # 当前牌局的状态，发送给加入房间的玩家
         self._logger = logger
         self._lock = threading.Lock()
 
@@ -192,11 +264,10 @@ class GameRoom(GameSubscriber):
                 player = old_player
                 self._room_event_handler.room_event("player-rejoined", player.id)
 
-            for event_message in self._event_messages:
-                # 将事件信息广播给加入的玩家
-                if "target" not in event_message or event_message["target"] == player.id:
-                    # target为针对某玩家的单独事件
-                    player.send_message(event_message)
+            # 将当前牌局的状态发送给加入的玩家（只有一条消息）
+            snapshot = self._hand_snapshot.snapshot(player.id)
+            if snapshot is not None:
+                self._room_event_handler.send(player, snapshot)
         finally:
             self._lock.release()
 
@@ -229,19 +300,27 @@ class GameRoom(GameSubscriber):
             event_message = {"message_type": "game-update"}
             event_message.update(event_data)
 
+            if event in self.STATE_EVENTS:
+                # 只发送变化的玩家信息
+                self._room_event_handler.update_state(players=event_message.pop("players").values())
+                event_message["version"] = self._room_event_handler.table_state.version
+            elif event == "new-game":
+                self._room_event_handler.update_state(players=event_data["players"])
+
             if "target" in event_data:
                 player = self._room_players.get_player(event_data["target"])  # 获取指定PlayerServer
-                player.send_message(event_message)  # 发送消息
+                self._room_event_handler.send(player, event_message)  # 发送消息
             else:
                 # Broadcasting message
                 self._room_event_handler.broadcast(event_message)  # 广播消息
 
+            # 更新牌局状态（游戏结束时清空）
+            self._hand_snapshot.update(event_message)
+
             if event == "game-over":
-                # 游戏结束清空事件
-                self._event_messages = []
-            else:
-                # 添加事件
-                self._event_messages.append(event_message)
+                encode_counts = self._room_event_handler.pop_encode_counts()
+                self._logger.info("Room {}: {} messages encoded for {} sent this hand".format(
+                    self.id, encode_counts["encoded"], encode_counts["sent"]))
 
             if event == "dead-player":
                 self._leave(event_data["player"]["id"])
@@ -300,12 +379,15 @@ class GameRoom(GameSubscriber):
                         raise GameError("At least two players needed to start a new game")
 
                     dealer_key = (dealer_key + 1) % len(players)  # 更新庄家位置
-                    game = self._game_factory.create_game(players)  # game是HoldemPokerGame()
-                    game.event_dispatcher.subscribe(self)  # 添加订阅者
-                    game.play_hand(players[dealer_key].id)  # 开始游戏
-                    game.save_player_data()  # 保存玩家数据
-                    game.update_ranking_list()  # 更新排行榜
-                    game.event_dispatcher.unsubscribe(self)  # 取消订阅
+                    game = self._game_factory.create_game(players, room_id=self.id)  # game是HoldemPokerGame()
+                    game.event_dispatcher.subscribe(self, overflow=self.EVENT_OVERFLOW)  # 添加订阅者
+                    try:
+                        game.play_hand(players[dealer_key].id)  # 开始游戏
+                        game.save_player_data()  # 保存玩家数据
+                        game.update_ranking_list()  # 更新排行榜
+                    finally:
+                        # 投递完本局的事件后取消所有订阅
+                        game.event_dispatcher.close()
 
                 except GameError:
                     break
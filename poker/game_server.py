@@ -1,6 +1,6 @@
 import logging
 import threading
-from typing import List, Generator, Dict
+from typing import List, Generator, Dict, Optional
 from uuid import uuid4
 
 import gevent
@@ -87,6 +87,27 @@ class GameServer:
             self._logger.info("Player {}: joining private room {}".format(player.player.name, player.room_id))
             return self._join_private_room(player.player, player.room_id)
 
+    def _enter_room(self, player: ConnectedPlayer) -> GameRoom:
+        room = self._join_room(player)
+        self._logger.info("Room: {}".format(room.id))
+        if not room.active:
+            # 第一个加入房间的玩家同时激活房间状态，启动一个协程来维持房间状态
+            room.active = True
+            gevent.spawn(room.activate)
+        return room
+
+    def add_bots(self, bots: List[PlayerServer], room_id: Optional[str] = None) -> List[GameRoom]:
+        """
+        Seats in-process bot players (see poker.channel_bot), in a private room if room_id is given or filling the
+        public rooms otherwise. Returns the rooms the bots joined.
+        """
+        rooms = []
+        for bot in bots:
+            room = self._enter_room(ConnectedPlayer(bot, room_id))
+            if room not in rooms:
+                rooms.append(room)
+        return rooms
+
     def start(self):
         """
         启动游戏服务器，激活房间并将大厅队列中的玩家加入到房间中
@@ -100,12 +121,7 @@ class GameServer:
                 self._logger.info("{}: {} connected".format(self, player.player.name))
                 try:
                     # player: ConnectedPlayer(包含PlayerServer和room_id)，加入private还是public房间，将player加入到指定房间并返回GameRoom
-                    room = self._join_room(player)  # 此时玩家在GameRoom的_room_players中
-                    self._logger.info("Room: {}".format(room.id))
-                    if not room.active:
-                        # 第一个加入房间的玩家同时激活房间状态，启动一个协程来维持房间状态
-                        room.active = True
-                        gevent.spawn(room.activate)
+                    self._enter_room(player)  # 此时玩家在GameRoom的_room_players中
                 except:
                     # Close bad connections and ignore the connection
                     self._logger.exception("{}: bad connection".format(self))
@@ -6,6 +6,7 @@ from redis import Redis
 from .game_room import GameRoomFactory
 from .channel_redis import MessageQueue, ChannelRedis, ChannelError, MessageFormatError, MessageTimeout
 from .game_server import GameServer, ConnectedPlayer
+from .player import to_chips
 from .player_server import PlayerServer
 
 
@@ -61,7 +62,7 @@ class GameServerRedis(GameServer):
             raise MessageFormatError(attribute="player.name", desc="Invalid player name")
         # player money
         try:
-            player_money = float(message["player"]["money"])
+            player_money = to_chips(message["player"]["money"])
         except KeyError:
             raise MessageFormatError(attribute="player.money", desc="Missing attribute")
         except ValueError:
@@ -69,7 +70,7 @@ class GameServerRedis(GameServer):
                                      desc="'{}' is not a number".format(message["player"]["money"]))
         # player loan
         try:
-            player_loan = float(message["player"]["loan"])
+            player_loan = int(float(message["player"]["loan"]))
         except KeyError:
             raise MessageFormatError(attribute="player.loan", desc="Missing attribute")
         except ValueError:
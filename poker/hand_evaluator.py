@@ -0,0 +1,497 @@
+import array
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable, List, Optional
+
+# One prime per rank (2..14): the product of the primes of a hand identifies its rank multiset
+RANK_PRIMES = {
+    2: 2,
+    3: 3,
+    4: 5,
+    5: 7,
+    6: 11,
+    7: 13,
+    8: 17,
+    9: 19,
+    10: 23,
+    11: 29,
+    12: 31,
+    13: 37,
+    14: 41,
+}
+
+# Tables file: magic, format version, byte order, the size of the 3 tables and the SHA-256 of the tables, followed by
+# the tables (uint32)
+TABLES_MAGIC = b"PYPOKER\0"
+TABLES_VERSION = 2
+TABLES_HEADER = struct.Struct("=8sIcxxxIII32s")
+# Stored in the application data directory rather than in the (world writable) system temp directory: the tables
+# decide the showdowns
+TABLES_PATH = os.environ.get(
+    "HAND_EVALUATOR_TABLES",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data",
+                 "hand_evaluator.v{}.bin".format(TABLES_VERSION))
+)
+
+# Category values match HoldemPokerScore
+NO_PAIR = 0
+PAIR = 1
+TWO_PAIR = 2
+TRIPS = 3
+STRAIGHT = 4
+FLUSH = 5
+FULL_HOUSE = 6
+QUADS = 7
+STRAIGHT_FLUSH = 8
+
+# Card code (rank << 2 | suit) lookups, see Card._value
+CARD_CODES = range(60)
+CODE_PRIMES = [RANK_PRIMES.get(code >> 2, 0) for code in CARD_CODES]
+CODE_RANK_BITS = [1 << ((code >> 2) - 2) if (code >> 2) in RANK_PRIMES else 0 for code in CARD_CODES]
+
+
+def pack_strength(category: int, ranks: List[int]) -> int:
+    """
+    Packs a category and the ranks of the five score cards the same way HoldemPokerScore.strength does:
+    4 bits for the category followed by 4 bits per card.
+    """
+    strength = category
+    for offset in range(5):
+        strength <<= 4
+        try:
+            strength += ranks[offset]
+        except IndexError:
+            pass
+    return strength
+
+
+def unpack_ranks(strength: int) -> List[int]:
+    """Returns the ranks of the score cards encoded in a strength value."""
+    return [(strength >> shift) & 15 for shift in (16, 12, 8, 4, 0)]
+
+
+def straight_top(rank_mask: int) -> int:
+    """
+    Returns the highest rank of the best straight in a 13 bits rank mask (bit 0 is a 2, bit 12 an ace).
+    Returns 0 if there's no straight.
+    """
+    # Ace can go under the 2: shifting everything by one bit and copying the ace to bit 0
+    mask = (rank_mask << 1) | (rank_mask >> 12)
+    mask &= mask >> 1
+    mask &= mask >> 1
+    mask &= mask >> 2
+    if not mask:
+        return 0
+    # Bit n of the result is the lowest card of a straight: the top card is n + 4 (+ 1 to convert bits into ranks)
+    return mask.bit_length() + 4
+
+
+def _straight_ranks(top: int) -> List[int]:
+    if top == 5:
+        return [5, 4, 3, 2, 14]
+    return list(range(top, top - 5, -1))
+
+
+def _mask_ranks(rank_mask: int) -> List[int]:
+    """Ranks in a 13 bits rank mask in a descending order."""
+    return [rank for rank in range(14, 1, -1) if rank_mask & (1 << (rank - 2))]
+
+
+def flush_strength(rank_mask: int) -> int:
+    """Strength of the best flush (or straight flush) made of the ranks in a suit."""
+    top = straight_top(rank_mask)
+    if top:
+        return pack_strength(STRAIGHT_FLUSH, _straight_ranks(top))
+    return pack_strength(FLUSH, _mask_ranks(rank_mask)[0:5])
+
+
+def multiset_strength(counts: List[int]) -> int:
+    """
+    Strength of the best non-flush hand for a rank multiset.
+    :param counts: number of cards for every rank (list indexed by rank)
+    """
+    ranks = [rank for rank in range(14, 1, -1) if counts[rank]]
+    quads = [rank for rank in ranks if counts[rank] == 4]
+    trips = [rank for rank in ranks if counts[rank] == 3]
+    pairs = [rank for rank in ranks if counts[rank] == 2]
+
+    def kickers(*excluded):
+        return [rank for rank in ranks if rank not in excluded]
+
+    if quads:
+        return pack_strength(QUADS, [quads[0]] * 4 + kickers(quads[0])[0:1])
+    if len(trips) >= 2:
+        return pack_strength(FULL_HOUSE, [trips[0]] * 3 + [trips[1]] * 2)
+    if trips and pairs:
+        return pack_strength(FULL_HOUSE, [trips[0]] * 3 + [pairs[0]] * 2)
+
+    top = straight_top(sum(1 << (rank - 2) for rank in ranks))
+    if top:
+        return pack_strength(STRAIGHT, _straight_ranks(top))
+
+    if trips:
+        return pack_strength(TRIPS, [trips[0]] * 3 + kickers(trips[0])[0:2])
+    if len(pairs) >= 2:
+        return pack_strength(TWO_PAIR, [pairs[0]] * 2 + [pairs[1]] * 2 + kickers(pairs[0], pairs[1])[0:1])
+    if pairs:
+        return pack_strength(PAIR, [pairs[0]] * 2 + kickers(pairs[0])[0:3])
+    return pack_strength(NO_PAIR, ranks[0:5])
+
+
+class BoardState:
+    """
+    Keys of the shared cards, computed once per street and shared by every player.
+    Adding one more card only updates the keys with that card.
+    """
+
+    def __init__(self):
+        self._cards: list = []
+        self._product: int = 1
+        self._suit_masks: List[int] = [0, 0, 0, 0]
+        self._rank_counts: List[int] = [0] * 15
+        self._suit_counts: List[int] = [0, 0, 0, 0]
+        self._max_suit_count: int = 0
+
+    @property
+    def cards(self) -> list:
+        return self._cards
+
+    @property
+    def size(self) -> int:
+        return len(self._cards)
+
+    @property
+    def product(self) -> int:
+        return self._product
+
+    @property
+    def suit_masks(self) -> List[int]:
+        return self._suit_masks
+
+    @property
+    def rank_counts(self) -> List[int]:
+        """Number of shared cards for every rank (list indexed by rank)."""
+        return self._rank_counts
+
+    @property
+    def suit_counts(self) -> List[int]:
+        return self._suit_counts
+
+    @property
+    def max_suit_count(self) -> int:
+        return self._max_suit_count
+
+    def add_cards(self, cards: list):
+        for card in cards:
+            code = int(card)
+            suit = code & 3
+            self._cards.append(card)
+            self._product *= CODE_PRIMES[code]
+            self._suit_masks[suit] |= CODE_RANK_BITS[code]
+            self._rank_counts[code >> 2] += 1
+            self._suit_counts[suit] += 1
+            self._max_suit_count = max(self._max_suit_count, self._suit_counts[suit])
+
+
+class HandEvaluator:
+    """
+    Lookup table evaluator for 5, 6 and 7 cards hands.
+
+    Hands are identified by two keys:
+    - for every suit, a 13 bits mask of the ranks: masks with at least 5 bits are flushes and are looked up
+      straight into the flush table
+    - the product of the rank primes, which identifies the rank multiset of the hand: it is mapped into
+      the rank table with a perfect hash (hash and displace)
+
+    Evaluation returns the strength of the hand, which is the same number computed by HoldemPokerScore.strength.
+    """
+    MIN_CARDS = 5
+    MAX_CARDS = 7
+
+    def __init__(self, flush_table, displacements, rank_table, buffer: Optional[mmap.mmap] = None):
+        # Tables are either arrays or memoryviews of a mapped tables file (kept open in buffer)
+        self._buffer: Optional[mmap.mmap] = buffer
+        self._flush_table = flush_table
+        self._displacements = displacements
+        self._rank_table = rank_table
+        self._num_buckets = len(displacements)
+        self._table_size = len(rank_table)
+
+    @property
+    def flush_table(self):
+        return self._flush_table
+
+    @property
+    def displacements(self):
+        return self._displacements
+
+    @property
+    def rank_table(self):
+        return self._rank_table
+
+    def evaluate(self, codes: Iterable[int]) -> int:
+        """
+        Evaluates between 5 and 7 cards.
+        :param codes: card codes (see Card._value)
+        :return: strength of the hand
+        """
+        product = 1
+        suit_masks = [0, 0, 0, 0]
+        for code in codes:
+            product *= CODE_PRIMES[code]
+            suit_masks[code & 3] |= CODE_RANK_BITS[code]
+        return self.evaluate_keys(product, suit_masks)
+
+    def evaluate_board(self, board: BoardState, codes: Iterable[int]) -> int:
+        """
+        Evaluates the player cards together with the shared cards: only the player cards are added to the board keys.
+        Board and player cards must be between 5 and 7 cards.
+        """
+        codes = list(codes)
+        product = board.product
+        suit_masks = list(board.suit_masks)
+        for code in codes:
+            product *= CODE_PRIMES[code]
+            suit_masks[code & 3] |= CODE_RANK_BITS[code]
+        if board.max_suit_count + len(codes) < HandEvaluator.MIN_CARDS:
+            # Not enough cards of the same suit for a flush
+            return self._rank_table[(product ^ self._displacements[product % self._num_buckets]) % self._table_size]
+        return self.evaluate_keys(product, suit_masks)
+
+    def evaluate_keys(self, product: int, suit_masks: List[int]) -> int:
+        """Evaluates a hand given its rank primes product and its per suit rank masks."""
+        flush_table = self._flush_table
+        for suit_mask in suit_masks:
+            # Flush table only has entries for 5 or more ranks
+            strength = flush_table[suit_mask]
+            if strength:
+                # With 7 cards or less, a full house or quads can't be made together with a flush
+                return strength
+        return self._rank_table[(product ^ self._displacements[product % self._num_buckets]) % self._table_size]
+
+    def evaluate_batch(self, hands):
+        """
+        Vectorized evaluation of many hands at once.
+        numpy is optional (not needed by the game service): without it, hands are evaluated one at a time.
+        :param hands: (N, 5), (N, 6) or (N, 7) integer array of card codes (see Card._value)
+        :return: N-length int64 array of strengths (numpy array, or array.array without numpy)
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            return self._evaluate_batch_python(hands)
+
+        hands = np.asarray(hands, dtype=np.int64)
+        if hands.ndim != 2 or not HandEvaluator.MIN_CARDS <= hands.shape[1] <= HandEvaluator.MAX_CARDS:
+            raise ValueError("Expected a (N, 5), (N, 6) or (N, 7) array of card codes")
+        if hands.size:
+            if hands.min() < 0 or hands.max() >= len(CODE_PRIMES):
+                raise ValueError("Invalid card code")
+            sorted_hands = np.sort(hands, axis=1)
+            if np.any(sorted_hands[:, 1:] == sorted_hands[:, :-1]):
+                raise ValueError("Duplicate cards in a hand")
+
+        code_primes = np.array(CODE_PRIMES, dtype=np.uint64)
+        code_rank_bits = np.array(CODE_RANK_BITS, dtype=np.int64)
+        if np.any(code_primes[hands] == 0):
+            raise ValueError("Invalid card code")
+
+        products = np.prod(code_primes[hands], axis=1, dtype=np.uint64)
+        rank_bits = code_rank_bits[hands]
+        suits = hands & 3
+
+        flush_table = np.frombuffer(self._flush_table, dtype=np.uint32)
+        flushes = np.zeros(len(hands), dtype=np.int64)
+        for suit in range(4):
+            suit_masks = np.bitwise_or.reduce(np.where(suits == suit, rank_bits, 0), axis=1)
+            flushes = np.maximum(flushes, flush_table[suit_masks])
+
+        displacements = np.frombuffer(self._displacements, dtype=np.uint32).astype(np.uint64)
+        rank_table = np.frombuffer(self._rank_table, dtype=np.uint32)
+        buckets = products % np.uint64(self._num_buckets)
+        slots = (products ^ displacements[buckets]) % np.uint64(self._table_size)
+
+        return np.where(flushes > 0, flushes, rank_table[slots].astype(np.int64))
+
+    def _evaluate_batch_python(self, hands) -> array.array:
+        hands = [list(hand) for hand in hands]
+        if any(len(hand) != len(hands[0]) for hand in hands) or \
+                (hands and not HandEvaluator.MIN_CARDS <= len(hands[0]) <= HandEvaluator.MAX_CARDS):
+            raise ValueError("Expected a (N, 5), (N, 6) or (N, 7) array of card codes")
+        for hand in hands:
+            if any(not 0 <= code < len(CODE_PRIMES) or not CODE_PRIMES[code] for code in hand):
+                raise ValueError("Invalid card code")
+            if len(set(hand)) != len(hand):
+                raise ValueError("Duplicate cards in a hand")
+        return array.array("q", [self.evaluate(hand) for hand in hands])
+
+    @staticmethod
+    def build() -> "HandEvaluator":
+        """Generates the lookup tables."""
+        flush_table = array.array("I", [0] * (1 << 13))
+        for rank_mask in range(1 << 13):
+            if bin(rank_mask).count("1") >= HandEvaluator.MIN_CARDS:
+                flush_table[rank_mask] = flush_strength(rank_mask)
+
+        strengths = {}
+
+        def add_multisets(rank, counts, product, size):
+            if rank > 14:
+                if size >= HandEvaluator.MIN_CARDS:
+                    strengths[product] = multiset_strength(counts)
+                return
+            for count in range(0, min(4, HandEvaluator.MAX_CARDS - size) + 1):
+                counts[rank] = count
+                add_multisets(rank + 1, counts, product * (RANK_PRIMES[rank] ** count), size + count)
+            counts[rank] = 0
+
+        add_multisets(2, [0] * 15, 1, 0)
+
+        displacements, slots = HandEvaluator._perfect_hash(list(strengths))
+        rank_table = array.array("I", [0] * len(slots))
+        for slot, product in enumerate(slots):
+            if product is not None:
+                rank_table[slot] = strengths[product]
+
+        return HandEvaluator(flush_table, displacements, rank_table)
+
+    @staticmethod
+    def _perfect_hash(keys: List[int]):
+        """
+        Hash and displace: keys are grouped in buckets, then buckets (biggest first) get the smallest displacement
+        that moves all their keys into free slots.
+        :return: the displacement of every bucket and the key stored in every slot
+        """
+        num_buckets = len(keys) // 5
+        table_size = len(keys) * 5 // 4
+
+        buckets = [[] for _ in range(num_buckets)]
+        for key in keys:
+            buckets[key % num_buckets].append(key)
+
+        displacements = array.array("I", [0] * num_buckets)
+        slots: List[Optional[int]] = [None] * table_size
+
+        for bucket_id in sorted(range(num_buckets), key=lambda bucket: len(buckets[bucket]), reverse=True):
+            bucket = buckets[bucket_id]
+            if not bucket:
+                break
+            displacement = 0
+            while True:
+                bucket_slots = {(key ^ displacement) % table_size for key in bucket}
+                if len(bucket_slots) == len(bucket) and all(slots[slot] is None for slot in bucket_slots):
+                    break
+                displacement += 1
+            for key in bucket:
+                slots[(key ^ displacement) % table_size] = key
+            displacements[bucket_id] = displacement
+
+        return displacements, slots
+
+    def save(self, path: str):
+        """Writes the tables to a file (atomically: processes loading the tables never see a partial file)."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        tables = [array.array("I", table).tobytes() for table in (self._flush_table, self._displacements,
+                                                                  self._rank_table)]
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(TABLES_HEADER.pack(
+                    TABLES_MAGIC,
+                    TABLES_VERSION,
+                    sys.byteorder[0].encode(),
+                    len(self._flush_table),
+                    len(self._displacements),
+                    len(self._rank_table),
+                    self._checksum(tables)
+                ))
+                for table in tables:
+                    f.write(table)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _checksum(tables) -> bytes:
+        checksum = hashlib.sha256()
+        for table in tables:
+            checksum.update(table)
+        return checksum.digest()
+
+    @staticmethod
+    def load(path: str) -> "HandEvaluator":
+        """
+        Maps a tables file in memory (read only): the pages are shared by every process loading the same file.
+        :raises ValueError: if the file was written by a different version or on a different architecture, or if its
+        content doesn't match the checksum of its header
+        """
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, byte_order, *sizes, checksum = TABLES_HEADER.unpack_from(buffer)
+            if magic != TABLES_MAGIC or version != TABLES_VERSION or byte_order != sys.byteorder[0].encode():
+                raise ValueError("Incompatible hand evaluator tables: {}".format(path))
+            if len(buffer) != TABLES_HEADER.size + 4 * sum(sizes):
+                raise ValueError("Corrupted hand evaluator tables: {}".format(path))
+            with memoryview(buffer) as view, view[TABLES_HEADER.size:] as content:
+                if HandEvaluator._checksum([content]) != checksum:
+                    raise ValueError("Corrupted hand evaluator tables: {}".format(path))
+            tables = []
+            offset = TABLES_HEADER.size
+            for size in sizes:
+                tables.append(memoryview(buffer)[offset:offset + 4 * size].cast("I"))
+                offset += 4 * size
+        except (ValueError, struct.error):
+            buffer.close()
+            raise
+        return HandEvaluator(*tables, buffer=buffer)
+
+
+_hand_evaluator: Optional[HandEvaluator] = None
+
+
+def load_hand_evaluator(path: str = TABLES_PATH) -> HandEvaluator:
+    """
+    Loads the tables file, generating it first if it's missing or outdated.
+    Tables are only generated if the file can't be loaded: every other process just maps the file.
+    """
+    try:
+        return HandEvaluator.load(path)
+    except (OSError, ValueError) as e:
+        logging.info("Generating hand evaluator tables ({})".format(e))
+    evaluator = HandEvaluator.build()
+    try:
+        evaluator.save(path)
+        return HandEvaluator.load(path)
+    except OSError as e:
+        logging.warning("Unable to save hand evaluator tables: {}".format(e))
+        return evaluator
+
+
+def get_hand_evaluator() -> HandEvaluator:
+    """Returns the process wide evaluator, loading (or generating) its tables the first time."""
+    global _hand_evaluator
+    if _hand_evaluator is None:
+        _hand_evaluator = load_hand_evaluator()
+    return _hand_evaluator
+
+
+def set_hand_evaluator(evaluator: HandEvaluator):
+    """Sets the process wide evaluator (for instance loaded at startup from a specific tables file)."""
+    global _hand_evaluator
+    _hand_evaluator = evaluator
+
+
+if __name__ == '__main__':
+    # Generating the tables file ahead of the deployment: python -m poker.hand_evaluator [path]
+    logging.basicConfig(level=logging.INFO)
+    tables_path = sys.argv[1] if len(sys.argv) > 1 else TABLES_PATH
+    HandEvaluator.build().save(tables_path)
+    logging.info("Hand evaluator tables saved to {}".format(tables_path))
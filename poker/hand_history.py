@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .poker_game import GameSubscriber
+
+
+SEGMENT_PATTERN = re.compile(r"^hands-(\d{6})\.jsonl$")
+
+
+def segment_paths(directory: str) -> List[str]:
+    """The hand history segment files of a directory, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if SEGMENT_PATTERN.match(name)]
+
+
+class FsyncPolicy:
+    """When the segment files are synced to disk."""
+    NEVER = "never"  # 由操作系统决定何时写入磁盘
+    BATCH = "batch"  # 每批记录写入后同步
+    INTERVAL = "interval"  # 最多每fsync_interval秒同步一次
+
+    ALL = (NEVER, BATCH, INTERVAL)
+
+
+class HandHistoryWriter:
+    """
+    Appends hand records to rotating JSON lines segment files (hands-000001.jsonl, hands-000002.jsonl, ...) from a
+    background thread.
+
+    Records are queued without waiting: the records queued while a batch is written make the next batch (one write
+    and at most one fsync per batch). When the queue is full, new records are dropped rather than waiting for the disk.
+    """
+    SEGMENT_SIZE = 64 * 1024 * 1024
+    BATCH_SIZE = 500
+    QUEUE_SIZE = 10000
+
+    def __init__(self, directory: str, segment_size: Optional[int] = None, batch_size: Optional[int] = None,
+                 queue_size: Optional[int] = None, fsync: str = FsyncPolicy.BATCH, fsync_interval: float = 1.0,
+                 logger=None):
+        if fsync not in FsyncPolicy.ALL:
+            raise ValueError("Unknown fsync policy: {}".format(fsync))
+        self._directory: str = directory
+        self._segment_size: int = segment_size if segment_size else self.SEGMENT_SIZE
+        self._batch_size: int = batch_size if batch_size else self.BATCH_SIZE
+        self._fsync: str = fsync
+        self._fsync_interval: float = fsync_interval
+        self._logger = logger if logger else logging
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size if queue_size else self.QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._closed: bool = False
+        # Writer thread state
+        self._file = None
+        self._segment: int = 0
+        self._segment_bytes: int = 0
+        self._last_fsync: float = 0.0
+        self._unsynced: bool = False
+        # Metrics
+        self._written: int = 0
+        self._dropped: int = 0
+        self._batches: int = 0
+        self._fsyncs: int = 0
+        self._errors: int = 0
+
+    @staticmethod
+    def segment_name(segment: int) -> str:
+        return "hands-{:06d}.jsonl".format(segment)
+
+    def segment_paths(self) -> List[str]:
+        return segment_paths(self._directory)
+
+    def metrics(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self._written,
+            "dropped": self._dropped,
+            "batches": self._batches,
+            "fsyncs": self._fsyncs,
+            "errors": self._errors,
+            "segment": self._segment,
+        }
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self._directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="hand-history-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict) -> bool:
+        """Queues a record, returns False if it was dropped (writer closed or queue full)."""
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            if not self._dropped:
+                self._logger.warning("Hand history queue is full: records dropped")
+            self._dropped += 1
+            return False
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Writes the queued records and stops the writer. Returns False if it didn't finish within the timeout."""
+        if self._closed:
+            return True
+        self._closed = True
+        if self._thread is None:
+            return True
+        # Waits for a free slot: the writer is still consuming the queue
+        self._queue.put(None)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self):
+        try:
+            self._open_segment()
+            while True:
+                try:
+                    batch = [self._queue.get(timeout=self._sync_timeout())]
+                except queue.Empty:
+                    # Synced at most fsync_interval seconds after the write
+                    self._sync()
+                    continue
+                while batch[-1] is not None and len(batch) < self._batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                closing = batch[-1] is None
+                if closing:
+                    batch.pop()
+                if batch:
+                    self._write_batch(batch)
+                if closing:
+                    break
+        except Exception:
+            self._logger.exception("Hand history writer stopped")
+        finally:
+            self._close_segment()
+
+    def _sync_timeout(self) -> Optional[float]:
+        if self._fsync != FsyncPolicy.INTERVAL or not self._unsynced:
+            return None
+        return max(0.0, self._last_fsync + self._fsync_interval - time.time())
+
+    def _write_batch(self, batch: List[dict]):
+        try:
+            if self._file is None:
+                self._open_segment()
+            data = "".join(json.dumps(record) + "\n" for record in batch).encode("utf-8")
+            if self._segment_bytes and self._segment_bytes + len(data) > self._segment_size:
+                self._close_segment()
+                self._segment += 1
+                self._open_segment()
+            self._file.write(data)
+            self._file.flush()
+            self._segment_bytes += len(data)
+            self._unsynced = True
+            self._written += len(batch)
+            self._batches += 1
+            if self._fsync == FsyncPolicy.BATCH:
+                self._sync()
+            elif self._fsync == FsyncPolicy.INTERVAL:
+                self._sync(time.time() - self._last_fsync >= self._fsync_interval)
+        except (OSError, TypeError, ValueError):
+            self._errors += 1
+            self._logger.exception("Unable to write {} hand records".format(len(batch)))
+
+    def _sync(self, force: bool = True):
+        if force and self._unsynced and self._file is not None:
+            os.fsync(self._file.fileno())
+            self._unsynced = False
+            self._last_fsync = time.time()
+            self._fsyncs += 1
+
+    def _open_segment(self):
+        if not self._segment:
+            # Appends to the last segment of the directory
+            paths = self.segment_paths()
+            self._segment = int(SEGMENT_PATTERN.match(os.path.basename(paths[-1])).group(1)) if paths else 1
+        path = os.path.join(self._directory, self.segment_name(self._segment))
+        self._file = open(path, "ab")
+        self._segment_bytes = self._file.tell()
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        try:
+            if self._fsync != FsyncPolicy.NEVER:
+                self._sync()
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class HandHistoryRecorder(GameSubscriber):
+    """
+    Records the event stream of every hand (blinds, actions, cards, showdown, pot splits) and hands it to a
+    HandHistoryWriter when the hand is over. Events of concurrent games are told apart by their game id.
+    """
+    HAND_TIMEOUT = 3600  # 超过这个时间没有结束的牌局被丢弃（游戏出错）
+
+    def __init__(self, writer: HandHistoryWriter):
+        self._writer: HandHistoryWriter = writer
+        self._hands: Dict[str, dict] = {}
+
+    def game_event(self, event, event_data):
+        game_id = event_data.get("game_id")
+        if event == "new-game":
+            self._drop_stale_hands()
+            self._hands[game_id] = {"game_id": game_id, "room_id": event_data.get("room_id"), "start": time.time(),
+                                    "events": []}
+        hand = self._hands.get(game_id)
+        if hand is None:
+            return
+        hand["events"].append({key: value for key, value in event_data.items() if key != "game_id"})
+        if event == "game-over":
+            del self._hands[game_id]
+            hand["end"] = time.time()
+            self._writer.write(hand)
+
+    def _drop_stale_hands(self):
+        expired = time.time() - self.HAND_TIMEOUT
+        for game_id in [game_id for game_id, hand in self._hands.items() if hand["start"] < expired]:
+            del self._hands[game_id]
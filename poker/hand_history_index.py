@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .hand_history import segment_paths
+
+
+def summarize_hand(record: dict) -> Tuple[int, Dict[str, dict]]:
+    """
+    Pot size (chips won in the hand) and result of every player of a hand history record:
+    {player id: {"net": chips won or lost, "category": showdown score category or None}}
+    """
+    events = record["events"]
+    money: Dict[str, int] = {player["id"]: player["money"] for player in events[0]["players"]}
+    start_money = dict(money)
+    categories: Dict[str, Optional[int]] = {}
+    pot = 0
+    for event in events[1:]:
+        if "player" in event:
+            players = [event["player"]]
+        elif isinstance(event.get("players"), dict):
+            players = [player for player in event["players"].values() if "money" in player]
+        else:
+            players = []
+        for player in players:
+            if player["id"] in money:
+                money[player["id"]] = player["money"]
+        if event["event"] == "showdown":
+            for player_id, player in event["players"].items():
+                categories[player_id] = player["score"]["category"]
+        elif event["event"] == "winner-designation":
+            pot += event["pot"]["money"]
+    return pot, {
+        player_id: {"net": money[player_id] - start_money[player_id], "category": categories.get(player_id)}
+        for player_id in money
+    }
+
+
+class HandHistoryIndex:
+    """
+    SQLite index of the hand history segment files written by HandHistoryWriter: hands can be searched by player,
+    date, room, pot size, showdown score category and result. Indexes only store the position of every hand in the
+    segment files, the matching records are read one at a time while iterating the query results.
+    """
+
+    def __init__(self, directory: str, index_path: Optional[str] = None):
+        self._directory: str = directory
+        self._index_path: str = index_path if index_path else os.path.join(directory, "index.db")
+        self._conn = sqlite3.connect(self._index_path)
+        self._create_tables()
+
+    def _create_tables(self):
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS segments (
+                name TEXT PRIMARY KEY,
+                indexed_bytes INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS hands (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                game_id TEXT NOT NULL UNIQUE,
+                room_id TEXT,
+                start REAL NOT NULL,
+                pot INTEGER NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS hand_players (
+                hand_id INTEGER NOT NULL,
+                player_id TEXT NOT NULL,
+                net INTEGER NOT NULL,
+                category INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS hands_start ON hands (start);
+            CREATE INDEX IF NOT EXISTS hands_room ON hands (room_id, start);
+            CREATE INDEX IF NOT EXISTS hands_pot ON hands (pot);
+            CREATE INDEX IF NOT EXISTS hand_players_player ON hand_players (player_id, category, hand_id);
+            CREATE INDEX IF NOT EXISTS hand_players_category ON hand_players (category, hand_id);
+        """)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def update(self) -> int:
+        """Indexes the hands appended to the segment files since the last update, returns the number of new hands."""
+        indexed = 0
+        for path in segment_paths(self._directory):
+            indexed += self._update_segment(path)
+        return indexed
+
+    def _update_segment(self, path: str) -> int:
+        name = os.path.basename(path)
+        row = self._conn.execute("SELECT indexed_bytes FROM segments WHERE name = ?", (name,)).fetchone()
+        offset = row[0] if row else 0
+        if os.path.getsize(path) <= offset:
+            return 0
+
+        indexed = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Record being written: indexed next time
+                    break
+                if line.strip():
+                    indexed += self._index_hand(json.loads(line), name, offset, len(line))
+                offset += len(line)
+        self._conn.execute("INSERT OR REPLACE INTO segments (name, indexed_bytes) VALUES (?, ?)", (name, offset))
+        self._conn.commit()
+        return indexed
+
+    def _index_hand(self, record: dict, segment: str, offset: int, length: int) -> int:
+        pot, players = summarize_hand(record)
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO hands (game_id, room_id, start, pot, segment, offset, length) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (record["game_id"], record.get("room_id"), record["start"], pot, segment, offset, length)
+        )
+        if not cursor.rowcount:
+            # Already indexed
+            return 0
+        self._conn.executemany(
+            "INSERT INTO hand_players (hand_id, player_id, net, category) VALUES (?, ?, ?, ?)",
+            [(cursor.lastrowid, player_id, player["net"], player["category"]) for player_id, player in players.items()]
+        )
+        return 1
+
+    def _where(self, player_id: Optional[str], room_id: Optional[str], since: Optional[float],
+               until: Optional[float], min_pot: Optional[int], max_pot: Optional[int], category: Optional[int],
+               result: Optional[str]) -> Tuple[str, str, list]:
+        if result not in (None, "won", "lost"):
+            raise ValueError("Unknown result: {}".format(result))
+
+        joins = ""
+        conditions: List[str] = []
+        params: list = []
+        if player_id is not None or category is not None or result is not None:
+            joins = " JOIN hand_players p ON p.hand_id = h.id"
+            if player_id is not None:
+                conditions.append("p.player_id = ?")
+                params.append(player_id)
+            if category is not None:
+                conditions.append("p.category = ?")
+                params.append(category)
+            if result == "won":
+                conditions.append("p.net > 0")
+            elif result == "lost":
+                conditions.append("p.net < 0")
+        for condition, value in (("h.room_id = ?", room_id), ("h.start >= ?", since), ("h.start < ?", until),
+                                 ("h.pot >= ?", min_pot), ("h.pot <= ?", max_pot)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return joins, where, params
+
+    def query(self, player_id: Optional[str] = None, room_id: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, min_pot: Optional[int] = None, max_pot: Optional[int] = None,
+              category: Optional[int] = None, result: Optional[str] = None,
+              limit: Optional[int] = None) -> Iterator[dict]:
+        """
+        Hand history records matching every criterion given, oldest first.
+        category (showdown score category, HoldemPokerScore constants) and result ("won" or "lost": net result in the
+        hand) are those of the player, or of any player when no player is given.
+        """
+        joins, where, params = self._where(player_id, room_id, since, until, min_pot, max_pot, category, result)
+        sql = "SELECT DISTINCT h.segment, h.offset, h.length, h.start, h.id FROM hands h" + joins + where + \
+              " ORDER BY h.start, h.id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._read_hands(sql, params)
+
+    def _read_hands(self, sql: str, params: list) -> Iterator[dict]:
+        files = {}
+        try:
+            for segment, offset, length, _, _ in self._conn.execute(sql, params):
+                f = files.get(segment)
+                if f is None:
+                    f = files[segment] = open(os.path.join(self._directory, segment), "rb")
+                f.seek(offset)
+                yield json.loads(f.read(length))
+        finally:
+            for f in files.values():
+                f.close()
+
+    def count(self, player_id: Optional[str] = None, room_id: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, min_pot: Optional[int] = None, max_pot: Optional[int] = None,
+              category: Optional[int] = None, result: Optional[str] = None) -> int:
+        joins, where, params = self._where(player_id, room_id, since, until, min_pot, max_pot, category, result)
+        return self._conn.execute("SELECT COUNT(DISTINCT h.id) FROM hands h" + joins + where, params).fetchone()[0]
+
+
+if __name__ == '__main__':
+    # Hands of a player in the last days: python -m poker.hand_history_index directory player_id [category] [days]
+    history_directory = sys.argv[1]
+    index = HandHistoryIndex(history_directory)
+    print("{} new hands indexed".format(index.update()))
+    if len(sys.argv) > 2:
+        for hand in index.query(
+                player_id=sys.argv[2],
+                category=int(sys.argv[3]) if len(sys.argv) > 3 else None,
+                since=time.time() - 86400 * float(sys.argv[4]) if len(sys.argv) > 4 else None):
+            print(json.dumps(hand))
+    index.close()
@@ -0,0 +1,295 @@
+import json
+import logging
+import random
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .card import Card
+from .deck import CompactDeck, DeckFactory
+from .player import Player
+from .poker_game import GameBetHandler, GameBetRounder, GameError, GamePlayers, GameSubscriber
+from .poker_game_holdem import HoldemPokerGame, HoldemPokerGameEventDispatcher
+from .score_detector import HoldemPokerScoreDetector
+
+
+class ReplayError(GameError):
+    pass
+
+
+class HandRecord:
+    """
+    A texas holdem hand that can be played again.
+
+    The deck is either a seed (for games dealt by a DeckFactory using random.Random(seed)) or the card codes in the
+    order they were dealt. Actions are the (player id, bet) answers to the bet requests, in order: -1 is a fold and
+    None a player who left the game. The result (money of every player at the end of the hand) is optional.
+    """
+
+    def __init__(self, players: List[Tuple[str, str, int, int]], dealer_id: str, big_blind: int,
+                 small_blind: int, actions: List[Tuple[str, Optional[int]]], seed: Optional[int] = None,
+                 cards: Optional[List[int]] = None, result: Optional[Dict[str, int]] = None):
+        if (seed is None) == (cards is None):
+            raise ValueError("A hand record needs either a deck seed or the dealt cards")
+        self.players: List[Tuple[str, str, int, int]] = players
+        self.dealer_id: str = dealer_id
+        self.big_blind: int = big_blind
+        self.small_blind: int = small_blind
+        self.actions: List[Tuple[str, Optional[int]]] = actions
+        self.seed: Optional[int] = seed
+        self.cards: Optional[List[int]] = cards
+        self.result: Optional[Dict[str, int]] = result
+
+    def dto(self):
+        return {
+            "players": [list(player) for player in self.players],
+            "dealer_id": self.dealer_id,
+            "big_blind": self.big_blind,
+            "small_blind": self.small_blind,
+            "actions": [list(action) for action in self.actions],
+            "seed": self.seed,
+            "cards": self.cards,
+            "result": self.result,
+        }
+
+    @staticmethod
+    def from_dto(dto: dict) -> "HandRecord":
+        return HandRecord(
+            players=[tuple(player) for player in dto["players"]],
+            dealer_id=dto["dealer_id"],
+            big_blind=dto["big_blind"],
+            small_blind=dto["small_blind"],
+            actions=[tuple(action) for action in dto["actions"]],
+            seed=dto.get("seed"),
+            cards=dto.get("cards"),
+            result=dto.get("result"),
+        )
+
+
+def load_hand_records(path: str) -> Iterator[HandRecord]:
+    """Reads hand records from a JSON lines file."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield HandRecord.from_dto(json.loads(line))
+
+
+def save_hand_records(path: str, records: Iterable[HandRecord]):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record.dto()) + "\n")
+
+
+class ReplayDeck:
+    """Deals the recorded cards in order."""
+
+    def __init__(self, codes: List[int]):
+        self._codes: List[int] = codes
+        self._next: int = 0
+
+    def pop_cards(self, num_cards=1) -> List[Card]:
+        if self._next + num_cards > len(self._codes):
+            raise ReplayError("Not enough recorded cards")
+        cards = [Card.from_code(code) for code in self._codes[self._next:self._next + num_cards]]
+        self._next += num_cards
+        return cards
+
+    def push_cards(self, discard: List[Card]):
+        pass
+
+
+class ReplayDeckFactory:
+    def __init__(self, codes: List[int]):
+        self._codes: List[int] = codes
+
+    def create_deck(self):
+        return ReplayDeck(self._codes)
+
+
+class ReplayEventDispatcher(HoldemPokerGameEventDispatcher):
+    """Drops every event: replays have no subscribers."""
+
+    def raise_event(self, event: str, event_data: dict):
+        pass
+
+
+class ReplayBetHandler(GameBetHandler):
+    """Answers the bet requests with the recorded actions."""
+
+    def __init__(self, game_players: GamePlayers, bet_rounder: GameBetRounder,
+                 event_dispatcher: HoldemPokerGameEventDispatcher, actions: List[Tuple[str, Optional[int]]]):
+        GameBetHandler.__init__(self, game_players, bet_rounder, event_dispatcher,
+                                bet_timeout=0, timeout_tolerance=0, wait_after_round=0)
+        self._actions: Iterator[Tuple[str, Optional[int]]] = iter(actions)
+        self._num_actions: int = len(actions)
+        self._played: int = 0
+
+    @property
+    def remaining_actions(self) -> int:
+        return self._num_actions - self._played
+
+    def get_bet(self, player, min_bet: int, max_bet: int, bets: Dict[str, int]) -> Optional[int]:
+        try:
+            player_id, bet = next(self._actions)
+        except StopIteration:
+            raise ReplayError("No recorded action for {}".format(player))
+        self._played += 1
+        self._event_dispatcher.bet_action_event(
+            player=player,
+            min_bet=min_bet,
+            max_bet=max_bet,
+            bets=bets,
+            timeout=0,
+            timeout_epoch=0
+        )
+        if player_id != player.id:
+            raise ReplayError("Action {} expected from {}, not {}".format(self._played, player_id, player.id))
+        if bet is not None and bet != -1 and (bet < min_bet or bet > max_bet):
+            raise ReplayError("Action {} out of range: {} (min: {}, max: {})".format(
+                self._played, bet, min_bet, max_bet))
+        return bet
+
+
+class ReplayHoldemPokerGame(HoldemPokerGame):
+    """
+    Plays a recorded hand through the regular game logic, without channels, waits or database.
+    Events are dropped unless an event dispatcher is given.
+    """
+    WAIT_AFTER_CARDS_ASSIGNMENT = 0
+    WAIT_AFTER_BET_ROUND = 0
+    WAIT_AFTER_SHOWDOWN = 0
+    WAIT_AFTER_WINNER_DESIGNATION = 0
+    WAIT_AFTER_FLOP_TURN_RIVER = 0
+
+    def __init__(self, record: HandRecord, score_detector: Optional[HoldemPokerScoreDetector] = None,
+                 event_dispatcher: Optional[HoldemPokerGameEventDispatcher] = None):
+        self._record: HandRecord = record
+        if record.seed is not None:
+            deck_factory = DeckFactory(2, CompactDeck, random.Random(record.seed))
+        else:
+            deck_factory = ReplayDeckFactory(record.cards)
+        HoldemPokerGame.__init__(
+            self,
+            record.big_blind,
+            record.small_blind,
+            id="replay",
+            game_players=GamePlayers([
+                Player(player_id, name, money, loan, True) for player_id, name, money, loan in record.players
+            ]),
+            event_dispatcher=event_dispatcher if event_dispatcher else ReplayEventDispatcher(
+                game_id="replay", logger=logging.getLogger()),
+            deck_factory=deck_factory,
+            score_detector=score_detector if score_detector else HoldemPokerScoreDetector()
+        )
+
+    def _create_bet_handler(self) -> ReplayBetHandler:
+        return ReplayBetHandler(
+            game_players=self._game_players,
+            bet_rounder=GameBetRounder(self._game_players),
+            event_dispatcher=self._event_dispatcher,
+            actions=self._record.actions
+        )
+
+    def replay(self) -> Dict[str, int]:
+        """Plays the hand and returns the money of every player at the end of it."""
+        self.play_hand(self._record.dealer_id)
+        if self._bet_handler.remaining_actions:
+            raise ReplayError("{} recorded actions were not played".format(self._bet_handler.remaining_actions))
+        result = {player.id: player.money for player in self._game_players.all + self._game_players.dead}
+        if self._record.result is not None and result != self._record.result:
+            raise ReplayError("Replay result {} differs from the recorded one {}".format(result, self._record.result))
+        return result
+
+
+def replay_hands(records: Iterable[HandRecord], score_detector: Optional[HoldemPokerScoreDetector] = None) -> dict:
+    """Replays hands (checking their results when recorded) and returns the replay speed."""
+    score_detector = score_detector if score_detector else HoldemPokerScoreDetector()
+    hands = 0
+    start = time.perf_counter()
+    for record in records:
+        ReplayHoldemPokerGame(record, score_detector).replay()
+        hands += 1
+    seconds = time.perf_counter() - start
+    return {
+        "hands": hands,
+        "seconds": seconds,
+        "hands_per_sec": hands / seconds if seconds else 0.0,
+    }
+
+
+class HandRecorder(GameSubscriber):
+    """
+    Records the hands of a game from its events, so they can be replayed.
+    Dealt cards are recorded rather than a deck seed, as game decks use the system random generator.
+    """
+
+    def __init__(self):
+        self._records: List[HandRecord] = []
+        self._hand: Optional[dict] = None
+
+    @property
+    def records(self) -> List[HandRecord]:
+        return self._records
+
+    def game_event(self, event, event_data):
+        if event == "new-game":
+            self._hand = {
+                "players": [(player["id"], player["name"], player["money"], player["loan"])
+                            for player in event_data["players"]],
+                "dealer_id": event_data["dealer_id"],
+                "big_blind": event_data["big_blind"],
+                "small_blind": event_data["small_blind"],
+                "cards": [],
+                "actions": [],
+                # Player asked to bet
+                "pending": None,
+                "money": {player["id"]: player["money"] for player in event_data["players"]},
+            }
+            return
+
+        hand = self._hand
+        if hand is None:
+            return
+
+        for player in self._event_players(event_data):
+            if player["id"] in hand["money"]:
+                hand["money"][player["id"]] = player["money"]
+
+        if event == "cards-assignment":
+            hand["cards"] += [(rank << 2) + suit for rank, suit in event_data["cards"]]
+        elif event == "shared-cards":
+            hand["cards"] += [(rank << 2) + suit for rank, suit in event_data["cards"]]
+        elif event == "player-action":
+            hand["pending"] = event_data["player"]["id"]
+        elif event in ("bet", "fold", "dead-player"):
+            # Bets that weren't requested (blinds, checks of all-in players) are played by the game itself
+            player_id = event_data["player"]["id"]
+            if hand["pending"] == player_id:
+                bet = event_data["bet"] if event == "bet" else (-1 if event == "fold" else None)
+                hand["actions"].append((player_id, bet))
+                hand["pending"] = None
+        elif event == "game-over":
+            self._records.append(HandRecord(
+                players=hand["players"],
+                dealer_id=hand["dealer_id"],
+                big_blind=hand["big_blind"],
+                small_blind=hand["small_blind"],
+                actions=hand["actions"],
+                cards=hand["cards"],
+                result=hand["money"],
+            ))
+            self._hand = None
+
+    @staticmethod
+    def _event_players(event_data: dict) -> List[dict]:
+        if "player" in event_data:
+            return [event_data["player"]]
+        if isinstance(event_data.get("players"), dict):
+            return [player for player in event_data["players"].values() if "money" in player]
+        return []
+
+
+if __name__ == '__main__':
+    # Replays the hands of JSON lines files: python -m poker.hand_replay hands.jsonl [...]
+    for hands_path in sys.argv[1:]:
+        print("{}: {}".format(hands_path, replay_hands(load_hand_records(hands_path))))
@@ -1,10 +1,24 @@
+from typing import Optional
+
+
+def to_chips(money) -> int:
+    """
+    Converts an amount of money coming from outside the game (JSON messages, database, redis) to chips.
+    Money is accounted in whole chips: fractions left by old float balances are rounded to the nearest chip.
+    """
+    return int(round(float(money)))
+
+
 class Player:
-    def __init__(self, id: str, name: str, money: float, loan: int, ready: bool):
+    def __init__(self, id: str, name: str, money: int, loan: int, ready: bool):
         self._id: str = id
         self._name: str = name
-        self._money: float = money
+        self._money: int = to_chips(money)
         self._loan: int = loan
         self._ready: bool = ready
+        # DTO cache, rebuilt when money or loan change
+        self._dto: Optional[dict] = None
+        self._dto_dirty: bool = True
 
     @property
     def id(self) -> str:
@@ -15,7 +29,7 @@ class Player:
         return self._name
 
     @property
-    def money(self) -> float:
+    def money(self) -> int:
         return self._money
 
     @property
@@ -26,25 +40,39 @@ class Player:
     def ready(self) -> bool:
         return self._ready
 
+    @property
+    def dto_dirty(self) -> bool:
+        return self._dto_dirty
+
     def dto(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "money": self.money,
-            "loan": self.loan,
-        }
-
-    def take_money(self, money: float):
+        """Cached: the same dict is returned until the player changes, it must not be modified."""
+        if self._dto_dirty:
+            self._dto = {
+                "id": self.id,
+                "name": self.name,
+                "money": self.money,
+                "loan": self.loan,
+            }
+            self._dto_dirty = False
+        return self._dto
+
+    def take_money(self, money: int):
         if money > self._money:
             raise ValueError("Player does not have enough money")
-        if money < 0.0:
+        if money < 0:
             raise ValueError("Money has to be a positive amount")
-        self._money -= money
+        if money != int(money):
+            raise ValueError("Money has to be a whole number of chips")
+        self._money -= int(money)
+        self._dto_dirty = True
 
-    def add_money(self, money: float):
-        if money <= 0.0:
+    def add_money(self, money: int):
+        if money <= 0:
             raise ValueError("Money has to be a positive amount")
-        self._money += money
+        if money != int(money):
+            raise ValueError("Money has to be a whole number of chips")
+        self._money += int(money)
+        self._dto_dirty = True
 
     def refund_money(self, times: int):
         # 还钱
@@ -52,10 +80,12 @@ class Player:
             raise ValueError("Player does not have enough loan")
         self._money -= times * 1000
         self._loan -= times
+        self._dto_dirty = True
 
     def add_loan(self):
         self.add_money(1000)
         self._loan += 1
+        self._dto_dirty = True
 
     def __str__(self):
         return "player {}".format(self._id)
@@ -1,17 +1,30 @@
 import logging
 import time
-from typing import Any, Optional
+from collections import deque
+from typing import Any, Deque, Optional
+
+from gevent.lock import Semaphore
 
 from .channel import MessageFormatError, ChannelError, MessageTimeout, Channel
 from .player import Player
 
 
 class PlayerServer(Player):
+    # 两次读取状态确认之间的最短时间（秒）：不在每次状态更新时都访问通道
+    STATE_ACK_POLL_INTERVAL = 1.0
+
     def __init__(self, channel: Channel, logger, *args, **kwargs):
         Player.__init__(self, *args, **kwargs)
         self._channel: Channel = channel
         self._connected: bool = True
         self._logger = logger if logger else logging
+        # Last table state version acknowledged by the client (None: the whole state must be sent)
+        self._state_version: Optional[int] = None
+        # Messages read while looking for state acknowledgements, returned by the next recv_message
+        self._received: Deque[Any] = deque()
+        self._recv_lock: Semaphore = Semaphore()
+        # Last time the acknowledgements received were read (by recv_message or receive_state_acks)
+        self._acks_read: float = 0.0
 
     def disconnect(self):
         """Disconnect the client"""
@@ -28,10 +41,17 @@ class PlayerServer(Player):
     def connected(self) -> bool:
         return self._connected
 
+    @property
+    def state_version(self) -> Optional[int]:
+        return self._state_version
+
     def update_channel(self, new_player):
         self.disconnect()
         self._channel = new_player.channel
         self._connected = new_player.connected
+        # The new client has no table state yet
+        self._state_version = None
+        self._received.clear()
 
     def ping(self) -> bool:
         try:
@@ -66,9 +86,64 @@ class PlayerServer(Player):
         # 从O队列的左端推入消息   O队列   msg5 ---> [msg4, msg3, msg2, msg1]
         return self._channel.send_message(message)
 
+    def try_send_encoded(self, data: bytes, message: Any = None) -> bool:
+        try:
+            self.send_encoded(data, message)
+            return True
+        except ChannelError:
+            return False
+
+    def send_encoded(self, data: bytes, message: Any = None):
+        # 发送已经序列化的消息（广播时每条消息只序列化一次）
+        return self._channel.send_encoded(data, message)
+
     def recv_message(self, timeout_epoch: Optional[float] = None) -> Any:
         # I队列   [msg5, msg4, msg3, msg2] ---> msg1
-        message = self._channel.recv_message(timeout_epoch)
-        if "message_type" in message and message["message_type"] == "disconnect":
-            raise ChannelError("Client disconnected")
-        return message
+        timeout = None if timeout_epoch is None else max(0.0, timeout_epoch - time.time())
+        if not self._recv_lock.acquire(timeout=timeout):
+            raise MessageTimeout("Timed out")
+        try:
+            while True:
+                message = self._received.popleft() if self._received else self._channel.recv_message(timeout_epoch)
+                if self._handle_state_ack(message):
+                    continue
+                if "message_type" in message and message["message_type"] == "disconnect":
+                    raise ChannelError("Client disconnected")
+                # Acknowledgements sent before this message have been read
+                self._acks_read = time.time()
+                return message
+        finally:
+            self._recv_lock.release()
+
+    def receive_state_acks(self):
+        """
+        Handles the table state acknowledgements already received, without waiting, so that the state changes are
+        computed from the last version the client has (the other messages are kept for the next recv_message).
+        Does nothing while a recv_message is in progress (it handles the acknowledgements as they arrive), and the
+        channel is read at most once every STATE_ACK_POLL_INTERVAL seconds.
+        """
+        if not self._connected or time.time() - self._acks_read < self.STATE_ACK_POLL_INTERVAL:
+            return
+        if not self._recv_lock.acquire(blocking=False):
+            return
+        self._acks_read = time.time()
+        try:
+            while True:
+                message = self._channel.poll_message()
+                if message is None:
+                    break
+                if not self._handle_state_ack(message):
+                    self._received.append(message)
+        except (ChannelError, MessageFormatError) as e:
+            self._logger.error("Unable to receive state acknowledgements from {}: {}".format(self, e))
+        finally:
+            self._recv_lock.release()
+
+    def _handle_state_ack(self, message: Any) -> bool:
+        # Table state acknowledgements can arrive any time: they are not answers to the server messages
+        if not isinstance(message, dict) or message.get("message_type") != "state-ack":
+            return False
+        # A version null (or invalid) asks for the whole state
+        version = message.get("version")
+        self._state_version = version if isinstance(version, int) and not isinstance(version, bool) else None
+        return True
@@ -0,0 +1,169 @@
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+import gevent
+from gevent.lock import Semaphore
+
+from .database import PLAYER_STATS_COLUMNS, add_player_stats, compute_player_stats
+from .poker_game import GameSubscriber
+
+
+class PlayerStats:
+    """
+    Running counters of a player:
+    - hands: hands dealt
+    - vpip_hands: hands where the player put money in the pot pre-flop voluntarily (call or raise, not the blinds)
+    - pfr_hands: hands where the player raised pre-flop
+    - aggressive_actions / calls: raises and calls on every street (aggression factor)
+    - showdowns / showdowns_won: showdowns, and those where the player won (part of) a pot
+    - net_chips: chips won or lost
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {column: 0 for column in PLAYER_STATS_COLUMNS}
+
+    def add(self, counters: Dict[str, int]):
+        for column, value in counters.items():
+            self.counters[column] += value
+
+    def dto(self) -> dict:
+        return compute_player_stats(self.counters)
+
+
+class PlayerStatsRecorder(GameSubscriber):
+    """
+    Folds the events of every hand into per-player counters, added to the player_stats table in batches (every
+    FLUSH_HANDS hands or FLUSH_INTERVAL seconds). Statistics are read from the counters: history is never scanned.
+    Events of concurrent games are told apart by their game id.
+    Batches are saved from a thread of the gevent threadpool: the database calls never block the other greenlets.
+    """
+    FLUSH_HANDS = 50
+    FLUSH_INTERVAL = 60.0
+    HAND_TIMEOUT = 3600  # 超过这个时间没有结束的牌局被丢弃（游戏出错）
+
+    def __init__(self, save: Optional[Callable[[Dict[str, Dict[str, int]]], bool]] = None, logger=None):
+        self._save: Callable[[Dict[str, Dict[str, int]]], bool] = save if save else add_player_stats
+        self._logger = logger if logger else logging
+        self._hands: Dict[str, dict] = {}
+        # Counters not saved yet
+        self._pending: Dict[str, PlayerStats] = {}
+        self._pending_hands: int = 0
+        self._last_flush: float = time.time()
+        # One flush at a time (hands keep ending while a batch is saved)
+        self._flush_lock: Semaphore = Semaphore()
+
+    @property
+    def pending(self) -> Dict[str, PlayerStats]:
+        return self._pending
+
+    def game_event(self, event, event_data):
+        game_id = event_data.get("game_id")
+        if event == "new-game":
+            self._drop_stale_hands()
+            self._hands[game_id] = self._new_hand(event_data)
+            return
+
+        hand = self._hands.get(game_id)
+        if hand is None:
+            return
+
+        for player in self._event_players(event_data):
+            if player["id"] in hand["money"]:
+                hand["money"][player["id"]] = player["money"]
+
+        if event == "player-action":
+            hand["min_bet"] = (event_data["player"]["id"], event_data["min_bet"])
+        elif event == "bet":
+            self._bet(hand, event_data)
+        elif event == "shared-cards":
+            hand["preflop"] = False
+        elif event == "showdown":
+            hand["showdown"].update(player_id for player_id in event_data["players"] if player_id in hand["money"])
+        elif event == "winner-designation":
+            hand["winners"].update(event_data["pot"]["winner_ids"])
+        elif event == "game-over":
+            del self._hands[game_id]
+            self._end_hand(hand)
+
+    @staticmethod
+    def _new_hand(event_data: dict) -> dict:
+        money = {player["id"]: player["money"] for player in event_data["players"]}
+        return {
+            "start": time.time(),
+            "start_money": dict(money),
+            "money": money,
+            "preflop": True,
+            "min_bet": (None, 0),
+            "counters": {player_id: {"hands": 1} for player_id in money},
+            "showdown": set(),
+            "winners": set(),
+        }
+
+    @staticmethod
+    def _event_players(event_data: dict):
+        if "player" in event_data:
+            return [event_data["player"]]
+        if isinstance(event_data.get("players"), dict):
+            return [player for player in event_data["players"].values() if "money" in player]
+        return []
+
+    @staticmethod
+    def _bet(hand: dict, event_data: dict):
+        player_id = event_data["player"]["id"]
+        counters = hand["counters"].get(player_id)
+        bet = event_data["bet"]
+        if counters is None or event_data["bet_type"] == "blind" or bet <= 0:
+            return
+        # Classified from the amounts: bet types say all-in whenever the player has no money left, calls included
+        min_bet_player_id, min_bet = hand["min_bet"]
+        if min_bet_player_id != player_id:
+            # No bet request for this bet: amount needed to call from the bets of the round
+            bets = event_data["bets"]
+            highest_bet = max([amount for bet_player_id, amount in bets.items() if bet_player_id != player_id],
+                              default=0)
+            min_bet = max(0, highest_bet - (bets.get(player_id, bet) - bet))
+        aggressive = bet > min_bet
+        if aggressive:
+            counters["aggressive_actions"] = counters.get("aggressive_actions", 0) + 1
+        else:
+            counters["calls"] = counters.get("calls", 0) + 1
+        if hand["preflop"]:
+            counters["vpip_hands"] = 1
+            if aggressive:
+                counters["pfr_hands"] = 1
+
+    def _end_hand(self, hand: dict):
+        for player_id, counters in hand["counters"].items():
+            counters["net_chips"] = hand["money"][player_id] - hand["start_money"][player_id]
+            if player_id in hand["showdown"]:
+                counters["showdowns"] = 1
+                if player_id in hand["winners"]:
+                    counters["showdowns_won"] = 1
+            self._pending.setdefault(player_id, PlayerStats()).add(counters)
+        self._pending_hands += 1
+        if self._pending_hands >= self.FLUSH_HANDS or time.time() - self._last_flush >= self.FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> bool:
+        """Saves the pending counters (kept for the next flush if they couldn't be saved)."""
+        with self._flush_lock:
+            self._last_flush = time.time()
+            if not self._pending:
+                return True
+            # Hands ending while the batch is saved are added to a new batch
+            pending, self._pending, pending_hands, self._pending_hands = self._pending, {}, self._pending_hands, 0
+            counters = {player_id: dict(stats.counters) for player_id, stats in pending.items()}
+            if gevent.get_hub().threadpool.apply(self._save, (counters,)):
+                return True
+            self._logger.error("Unable to save the stats of {} players".format(len(pending)))
+            for player_id, stats in self._pending.items():
+                pending.setdefault(player_id, PlayerStats()).add(stats.counters)
+            self._pending = pending
+            self._pending_hands += pending_hands
+            return False
+
+    def _drop_stale_hands(self):
+        expired = time.time() - self.HAND_TIMEOUT
+        for game_id in [game_id for game_id, hand in self._hands.items() if hand["start"] < expired]:
+            del self._hands[game_id]
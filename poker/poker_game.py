@@ -1,3 +1,5 @@
+import bisect
+import functools
 import time
 from typing import List, Dict, Set, Generator, Optional
 
@@ -6,7 +8,8 @@ import gevent
 from .card import Card
 from .channel import ChannelError, MessageTimeout, MessageFormatError
 from .deck import DeckFactory, Deck
-from .player import Player
+from .event_bus import GameEventBus
+from .player import Player, to_chips
 from .player_server import PlayerServer
 from .score_detector import Score, ScoreDetector
 
@@ -24,7 +27,7 @@ class EndRoundException(Exception):
 
 
 class GameFactory:
-    def create_game(self, players: List[PlayerServer]):
+    def create_game(self, players: List[PlayerServer], room_id: Optional[str] = None):
         raise NotImplemented
 
 
@@ -35,44 +38,102 @@ class GameSubscriber:
 
 
 class GamePlayers:
+    """
+    Seat ring of the players.
+    Active (not folded) seats are linked by next/previous pointers and tracked, as well as the folded and dead seats,
+    in bitmasks (bit i for the i-th seat), so the next active player and the number of active players are O(1).
+    """
     def __init__(self, players: List[Player]):
         # Dictionary of players keyed by their ids
         self._players: Dict[str, Player] = {player.id: player for player in players}  # 玩家id-Player字典
         # List of player ids sorted according to the original players list
         self._player_ids: List[str] = [player.id for player in players]  # 玩家id列表
-        # List of folder ids
-        self._folder_ids: Set[str] = set()  # 弃牌玩家
-        # Dead players
-        self._dead_player_ids: Set[str] = set()  # 出局玩家
+        # Seat of each player id and player of each seat
+        self._seats: Dict[str, int] = {player_id: seat for seat, player_id in enumerate(self._player_ids)}
+        self._seat_players: List[Player] = [self._players[player_id] for player_id in self._player_ids]
+        # Folded seats (dead players are folded too) and dead seats
+        self._folded_mask: int = 0  # 弃牌玩家
+        self._dead_mask: int = 0  # 出局玩家
+        # Ring of the active seats
+        self._next_seats: List[int] = []
+        self._previous_seats: List[int] = []
+        self._active_count: int = 0
+        self._link_active_seats()
+
+    def _link_active_seats(self):
+        # 重建未弃牌座位的环
+        active_seats = [seat for seat in range(len(self._player_ids)) if not self._folded_mask >> seat & 1]
+        self._next_seats = list(range(len(self._player_ids)))
+        self._previous_seats = list(range(len(self._player_ids)))
+        for i, seat in enumerate(active_seats):
+            self._next_seats[seat] = active_seats[(i + 1) % len(active_seats)]
+            self._previous_seats[seat] = active_seats[i - 1]
+        self._active_count = len(active_seats)
+
+    def _seat(self, player_id: str) -> int:
+        try:
+            return self._seats[player_id]
+        except KeyError:
+            raise ValueError("Unknown player id")
+
+    @property
+    def _active_mask(self) -> int:
+        return ((1 << len(self._player_ids)) - 1) & ~self._folded_mask
+
+    def _first_active_seat(self, seat: int, reverse=False) -> Optional[int]:
+        """First active seat from the given one (included), going forward or backward around the table."""
+        active_mask = self._active_mask
+        if not active_mask:
+            return None
+        if reverse:
+            mask = active_mask & ((2 << seat) - 1)
+            return (mask if mask else active_mask).bit_length() - 1
+        mask = active_mask >> seat << seat
+        mask = mask if mask else active_mask
+        return (mask & -mask).bit_length() - 1
 
     def fold(self, player_id: str):
-        # 弃牌玩家加入弃牌集合
-        if player_id not in self._player_ids:
-            raise ValueError("Unknown player id")
-        self._folder_ids.add(player_id)
+        # 弃牌玩家从环中移除
+        seat = self._seat(player_id)
+        if self._folded_mask >> seat & 1:
+            return
+        self._folded_mask |= 1 << seat
+        next_seat = self._next_seats[seat]
+        previous_seat = self._previous_seats[seat]
+        self._next_seats[previous_seat] = next_seat
+        self._previous_seats[next_seat] = previous_seat
+        self._active_count -= 1
 
     def remove(self, player_id: str):
         # 移除玩家，同事标记为弃牌和已出局
         self.fold(player_id)
-        self._dead_player_ids.add(player_id)
+        self._dead_mask |= 1 << self._seats[player_id]
 
     def reset(self):
         # 在游戏的某些环节（如新的一轮开始之前），需要清除上一轮中未出局玩家的弃牌状态，但保留已出局玩家的状态。
-        self._folder_ids = set(self._dead_player_ids)
+        self._folded_mask = self._dead_mask
+        self._link_active_seats()
 
     def round(self, dealer_id: str, reverse=False) -> Generator[Player, None, None]:
         """
         a,b,c,d,e 如果dealer_id是b，那么迭代器返回的结果为c, d, e, a, b
         列表第一位是小盲第二位是大盲最后一位是庄家
         """
-        # 按顺序遍历未弃牌玩家
-        start_item = (self._player_ids.index(dealer_id) + 1) % len(self._player_ids)  # 保证循环列表中在最后一位时也能取得小盲位索引
-        step_multiplier = -1 if reverse else 1  # 根据方向确定步进值
-        for i in range(len(self._player_ids)):
-            next_item = (start_item + (i * step_multiplier)) % len(self._player_ids)
-            player_id = self._player_ids[next_item]
-            if player_id not in self._folder_ids:
-                yield self._players[player_id]
+        num_seats = len(self._player_ids)
+        start_seat = (self._seat(dealer_id) + 1) % num_seats  # 保证循环列表中在最后一位时也能取得小盲位索引
+        seat = self._first_active_seat(start_seat, reverse)
+        links = self._previous_seats if reverse else self._next_seats
+        distance = -1
+        while seat is not None:
+            # Seats are visited once, in order: stopping when the ring goes back to the start seat
+            seat_distance = (start_seat - seat if reverse else seat - start_seat) % num_seats
+            if seat_distance <= distance:
+                return
+            distance = seat_distance
+            # Players folding during the round are skipped
+            if not self._folded_mask >> seat & 1:
+                yield self._seat_players[seat]
+            seat = links[seat]
 
     def get(self, player_id: str) -> Player:
         # 根据玩家id获取对象
@@ -83,51 +144,50 @@ class GamePlayers:
 
     def get_next(self, dealer_id: str) -> Optional[Player]:
         # 获取下一个未弃牌玩家
-        if dealer_id not in self._player_ids:
-            raise ValueError("Unknown player id")
-        if dealer_id in self._folder_ids:
+        seat = self._seat(dealer_id)
+        if self._folded_mask >> seat & 1:
             raise ValueError("Inactive player")
-        start_item = self._player_ids.index(dealer_id)
-        for i in range(len(self._player_ids) - 1):
-            next_index = (start_item + i + 1) % len(self._player_ids)
-            next_id = self._player_ids[next_index]
-            if next_id not in self._folder_ids:
-                return self._players[next_id]
-        return None
+        next_seat = self._next_seats[seat]
+        return self._seat_players[next_seat] if next_seat != seat else None
 
     def is_active(self, player_id: str) -> bool:
         # 检查玩家是否弃牌
-        if player_id not in self._player_ids:
+        try:
+            return not self._folded_mask >> self._seats[player_id] & 1
+        except KeyError:
             raise ValueError("Unknown player id")
-        return player_id not in self._folder_ids
 
     def count_active(self) -> int:
         # 获取未弃牌玩家数量
-        return len(self._player_ids) - len(self._folder_ids)
+        return self._active_count
 
     def count_active_with_money(self) -> int:
         # 获取未弃牌且有金钱的玩家数量
         return len([player for player in self.active if player.money > 0])
 
+    def _masked_players(self, mask: int) -> List[Player]:
+        # 按座位顺序返回 mask 中的玩家
+        return [player for seat, player in enumerate(self._seat_players) if mask >> seat & 1]
+
     @property
     def all(self) -> List[Player]:
         # 获取所有未出局玩家
-        return [self._players[player_id] for player_id in self._player_ids if player_id not in self._dead_player_ids]
+        return self._masked_players(((1 << len(self._player_ids)) - 1) & ~self._dead_mask)
 
     @property
     def folders(self) -> List[Player]:
         # 获取所有弃牌玩家
-        return [self._players[player_id] for player_id in self._folder_ids]
+        return self._masked_players(self._folded_mask)
 
     @property
     def dead(self) -> List[Player]:
         # 获取所有出局玩家
-        return [self._players[player_id] for player_id in self._dead_player_ids]
+        return self._masked_players(self._dead_mask)
 
     @property
     def active(self) -> List[Player]:
         #
-        return [self._players[player_id] for player_id in self._player_ids if player_id not in self._folder_ids]
+        return self._masked_players(self._active_mask)
 
 
 class GameScores:
@@ -135,27 +195,59 @@ class GameScores:
         self._score_detector: ScoreDetector = score_detector
         self._players_cards: Dict[str, List[Card]] = {}
         self._shared_cards: List[Card] = []
+        # Scores are only computed again after cards are assigned or shared cards are added
+        self._players_scores: Dict[str, Score] = {}
+        self._cache_hits: int = 0
+        self._cache_misses: int = 0
+        # Shared cards keys updated street by street and shared by every player (if the detector supports it)
+        create_board = getattr(score_detector, "create_board", None)
+        self._board = create_board() if create_board else None
 
     @property
     def shared_cards(self):
         # 获取公共牌
         return self._shared_cards
 
+    @property
+    def cache_hits(self) -> int:
+        # 命中缓存的计分次数
+        return self._cache_hits
+
+    @property
+    def cache_misses(self) -> int:
+        # 实际调用计分器的次数
+        return self._cache_misses
+
     def player_cards(self, player_id: str):
         # 获取玩家手牌
         return self._players_cards[player_id]
 
     def player_score(self, player_id: str):
         # 计分
-        return self._score_detector.get_score(self._players_cards[player_id] + self._shared_cards)
+        try:
+            score = self._players_scores[player_id]
+        except KeyError:
+            if self._board is not None:
+                score = self._score_detector.get_board_score(self._board, self._players_cards[player_id])
+            else:
+                score = self._score_detector.get_score(self._players_cards[player_id] + self._shared_cards)
+            self._players_scores[player_id] = score
+            self._cache_misses += 1
+        else:
+            self._cache_hits += 1
+        return score
 
     def assign_cards(self, player_id: str, cards: List[Card]):
         # 分配手牌
         self._players_cards[player_id] = self._score_detector.get_score(cards).cards
+        self._players_scores.pop(player_id, None)
 
     def add_shared_cards(self, cards):
         # 添加公共牌
         self._shared_cards += cards
+        if self._board is not None:
+            self._board.add_cards(cards)
+        self._players_scores = {}
 
 
 class GamePots:
@@ -166,17 +258,20 @@ class GamePots:
         """
 
         def __init__(self):
-            self._money = 0.0
+            self._money = 0
             self._players: List[Player] = []
 
-        def add_money(self, money: float):
+        def add_money(self, money: int):
             self._money += money
 
         def add_player(self, player: Player):
             self._players.append(player)
 
+        def set_players(self, players: List[Player]):
+            self._players = players
+
         @property
-        def money(self) -> float:
+        def money(self) -> int:
             return self._money
 
         @property
@@ -194,86 +289,83 @@ class GamePots:
 
     def __init__(self, game_players: GamePlayers):
         self._game_players = game_players
-        self._pots = []
-        self._bets = {player.id: 0.0 for player in game_players.all}
-
-    def add_bets(self, bets: Dict[str, float]):
-        for player in self._game_players.all:  # self._game_players.all所有未出局玩家的Player列表
-            self._bets[player.id] += bets[player.id] if player.id in bets else 0.0
+        self._pots: List[GamePots.GamePot] = []
+        self._bets = {player.id: 0 for player in game_players.all}
+        # Ledger: the i-th pot holds the contributions of every player between levels[i - 1] and levels[i]
+        self._levels: List[int] = []  # 每个奖金池的下注上限
+        # Active players sorted by their bets (then by seat): the players of a pot are the ones who bet up to its level
+        self._ranking: List[Player] = []
+        self._num_players: int = len(self._bets)
+
+    def add_bets(self, bets: Dict[str, int]):
+        """
+        奖金池按下注层级划分：每个未弃牌玩家的累计下注金额是一个层级，第 i 个奖金池包含所有玩家在
+        levels[i - 1] 和 levels[i] 之间的下注（弃牌玩家的下注计入其所在层级的奖金池，出局玩家的下注不计入）。
+        Only the pots from the lowest level changed since the last update are rebuilt:
+        - the previous bet of a player who bet again (the level may move up),
+        - the bet of a player who folded (the level may disappear),
+        - everything when a player left the game.
+
+            玩家 ID	活跃状态	下注金额
+            P1	活跃	100
+            P2	弃牌	50
+            P3	活跃	200
+            P4	活跃	100
+
+            奖金池编号	层级	金额	参与玩家
+            1	100	100 + 50 + 100 + 100 = 350	P1、P4、P3
+            2	200	100	P3
+        """
+        players = self._game_players.all  # 所有未出局玩家的Player列表
+        changed_level: Optional[int] = None  # 需要重建的最低层级
 
-        bets = dict(self._bets)  # 浅拷贝，保证不直接修改self._bets
+        if len(players) != self._num_players:
+            # Bets of the dead players are dropped
+            self._num_players = len(players)
+            changed_level = 0
 
-        # List of players sorted by their bets
-        # 按照玩家下注金额从低到高排序
-        players = sorted(
-            self._game_players.all,
-            key=lambda player: bets[player.id]
-        )
+        for player in players:
+            bet = bets[player.id] if player.id in bets else 0
+            if bet:
+                current_bet = self._bets[player.id]
+                changed_level = current_bet if changed_level is None else min(changed_level, current_bet)
+                self._bets[player.id] = current_bet + bet
 
-        self._pots = []  # 清空当前的奖金池
-
-        spare_money = 0.0  # 用于存储未分配的金额（通常来自非活动玩家）
-
-        '''
-        处理逻辑
-        玩家 ID	活跃状态	下注金额
-        P1	活跃	100
-        P2	非活动	50
-        P3	活跃	200
-        P4	活跃	100
-        执行逻辑
-        
-            1.	第一轮：处理 P1 的下注金额 100
-            •	当前活跃玩家：P1、P3、P4。
-            •	创建一个奖金池，金额为 100 * 3 = 300。
-            •	参与玩家：P1、P3、P4。
-            •	更新玩家下注金额：
-            •	P1：0
-            •	P3：100
-            •	P4：0
-            2.	第二轮：处理 P3 的剩余下注金额 100
-            •	当前活跃玩家：P3。
-            •	创建一个新的奖金池，金额为 100。
-            •	参与玩家：P3。
-            •	更新玩家下注金额：
-            •	P3：0
-            3.	处理非活动玩家 P2 的金额
-            •	P2 的 50 会被加入 spare_money，在下一次活跃玩家奖金池分配中使用。
-            •	如果所有玩家的下注金额已匹配完毕，spare_money 应为 0。
-        
-        最终奖金池结果
-        奖金池编号	金额	参与玩家
-        1	300	P1、P3、P4
-        2	100	P3
-        '''
-
-        for i, player in enumerate(players):
+        for player in self._ranking:
             if not self._game_players.is_active(player.id):
-                # 如果玩家处于非活动状态（例如弃牌或出局），他们的下注金额不会参与任何后续奖金池的分配
-                # 这些金额被加入spare_money，作为后续奖金池的补充资金
-                spare_money += bets[player.id]
-                bets[player.id] = 0.0
-            elif bets[player.id] > 0.0:
-                # 如果玩家仍然活跃且有下注金额
-                pot_bet = bets[player.id]  # 当前玩家下注值
-                current_pot = GamePots.GamePot()  # 创建一个新的奖金池
-                # 将 spare_money（来自之前非活动玩家的资金）加入当前奖金池
-                current_pot.add_money(spare_money)
-                spare_money = 0.0  # 重置spare_money为 0，因为它已被分配到当前奖金池
-                for j in range(i, len(players)):
-                    # 从当前玩家开始，检查后续玩家是否活跃
-                    if self._game_players.is_active(players[j].id):
-                        # 如果玩家活跃，将其加入当前奖金池的参与者列表
-                        current_pot.add_player(players[j])
-                    # 每个活跃玩家都需要匹配当前的下注金额（pot_bet）
-                    current_pot.add_money(pot_bet)
-                    bets[players[j].id] -= pot_bet  # 减少玩家的下注金额，记录匹配的部分
-                self._pots.append(current_pot)
-
-        if spare_money:
+                # 新的弃牌玩家
+                current_bet = self._bets[player.id]
+                changed_level = current_bet if changed_level is None else min(changed_level, current_bet)
+
+        if changed_level is None and self._ranking:
+            return
+
+        # 按照玩家下注金额从低到高排序
+        self._ranking = sorted(self._game_players.active, key=lambda player: self._bets[player.id])
+        ranking_bets = [self._bets[player.id] for player in self._ranking]
+
+        # Pots below the changed level are kept, the ones above are rebuilt
+        kept = bisect.bisect_left(self._levels, changed_level) if changed_level is not None else 0
+        del self._levels[kept:]
+        del self._pots[kept:]
+
+        previous_level = self._levels[-1] if self._levels else 0
+        contributions = [self._bets[player.id] for player in players if self._bets[player.id] > previous_level]
+        for level in sorted(set(bet for bet in ranking_bets if bet > previous_level)):
+            pot = GamePots.GamePot()
+            pot.add_money(sum(min(bet, level) - previous_level for bet in contributions if bet > previous_level))
+            self._levels.append(level)
+            self._pots.append(pot)
+            previous_level = level
+
+        if any(bet > previous_level for bet in contributions):
             # The players who bet more is actually inactive
             raise ValueError("Invalid bets")
 
+        # 奖金池的参与玩家：下注达到该层级的未弃牌玩家
+        for level, pot in zip(self._levels, self._pots):
+            pot.set_players(self._ranking[bisect.bisect_left(ranking_bets, level):])
+
 
 class GameEventDispatcher:
     """
@@ -282,21 +374,30 @@ class GameEventDispatcher:
     2.触发事件，为每个玩家广播事件
     """
     def __init__(self, game_id: str, logger):
-        self._subscribers: List[GameSubscriber] = []  # 所有订阅者
+        # 每个订阅者有自己的事件队列和消费协程，游戏不会等待订阅者处理事件
+        self._event_bus: GameEventBus = GameEventBus(logger)
         self._game_id: str = game_id
         self._logger = logger
 
-    def subscribe(self, subscriber: GameSubscriber):
+    def subscribe(self, subscriber: GameSubscriber, queue_size: Optional[int] = None, overflow: Optional[str] = None):
         # 添加订阅者
-        self._subscribers.append(subscriber)
+        self._event_bus.subscribe(subscriber, queue_size, overflow)
 
     def unsubscribe(self, subscriber: GameSubscriber):
-        # 移除订阅者
-        self._subscribers.remove(subscriber)
+        # 移除订阅者（先投递完队列中的事件）
+        self._event_bus.unsubscribe(subscriber)
+
+    def close(self):
+        # 投递所有订阅者队列中的事件后停止消费协程
+        self._event_bus.close()
+
+    def queue_metrics(self) -> Dict[str, dict]:
+        return self._event_bus.metrics()
 
     def raise_event(self, event: str, event_data: dict):
         """
         将事件名称与内容传给每个玩家（订阅者，GameSubscriber）
+        Events are queued: the event data must not change after the event is raised.
         """
         # 触发事件
         event_data["event"] = event
@@ -308,10 +409,7 @@ class GameEventDispatcher:
             str(event_data) + "\n" +
             ("-" * 80) + "\n"
         )
-        gevent.joinall([
-            gevent.spawn(subscriber.game_event, event, event_data)
-            for subscriber in self._subscribers
-        ])
+        self._event_bus.publish(event, event_data)
 
     def cards_assignment_event(self, player: Player, cards: List[Card], score: Score):
         # 发牌
@@ -341,7 +439,7 @@ class GameEventDispatcher:
         )
 
     def winner_designation_event(self, players: List[Player], pot: GamePots.GamePot, winners: List[Player],
-                                 money_split: float, upcoming_pots: GamePots):
+                                 money_split: int, upcoming_pots: GamePots):
         # 赢家判定
         self.raise_event(
             "winner-designation",
@@ -363,7 +461,7 @@ class GameEventDispatcher:
             }
         )
 
-    def bet_action_event(self, player: Player, min_bet: float, max_bet: float, bets: Dict[str, float], timeout: int,
+    def bet_action_event(self, player: Player, min_bet: int, max_bet: int, bets: Dict[str, int], timeout: int,
                          timeout_epoch: float):
         # 下注动作
         self.raise_event(
@@ -373,13 +471,13 @@ class GameEventDispatcher:
                 "player": player.dto(),
                 "min_bet": min_bet,
                 "max_bet": max_bet,
-                "bets": bets,
+                "bets": dict(bets),
                 "timeout": timeout,
                 "timeout_date": time.strftime("%Y-%m-%d %H:%M:%S+0000", time.gmtime(timeout_epoch))
             }
         )
 
-    def bet_event(self, player: Player, bet: float, bet_type: str, bets: Dict[str, float]):
+    def bet_event(self, player: Player, bet: int, bet_type: str, bets: Dict[str, int]):
         # 完成下注
         self.raise_event(
             "bet",
@@ -387,7 +485,7 @@ class GameEventDispatcher:
                 "player": player.dto(),
                 "bet": bet,
                 "bet_type": bet_type,
-                "bets": bets
+                "bets": dict(bets)
             }
         )
 
@@ -445,9 +543,83 @@ class GameWinnersDetector:
     - 根据玩家的牌组得分判定赢家。
     - 支持多个赢家（如果得分相同，则平分奖金）。
     """
+    class PotWinners:
+        """
+        奖金池的赢家以及每位赢家分得的金额。
+        money_split 是平分的整数部分，prizes 包含零头筹码（odd chips）。
+        """
+
+        def __init__(self, pot: "GamePots.GamePot", winners: List[Player], money_split: int,
+                     prizes: Dict[str, int]):
+            self._pot: GamePots.GamePot = pot
+            self._winners: List[Player] = winners
+            self._money_split: int = money_split
+            self._prizes: Dict[str, int] = prizes
+
+        @property
+        def pot(self) -> "GamePots.GamePot":
+            return self._pot
+
+        @property
+        def winners(self) -> List[Player]:
+            return self._winners
+
+        @property
+        def money_split(self) -> int:
+            return self._money_split
+
+        @property
+        def prizes(self) -> Dict[str, int]:
+            return self._prizes
+
     def __init__(self, game_players: GamePlayers):
         self._game_players: GamePlayers = game_players
 
+    def get_pots_winners(self, pots: GamePots, scores: GameScores,
+                         dealer_id: Optional[str] = None) -> List["GameWinnersDetector.PotWinners"]:
+        """
+        Resolves the winners of every pot in a single pass.
+        Active players are ranked by score once, then each pot goes to its best ranked players.
+        Pots are split in whole chips: every winner gets the floor of the split and the remaining chips are given one
+        each to the winners in seat order starting from the left of the dealer (from the first seat with no dealer).
+        """
+        # 庄家左手边开始的座位顺序
+        seated = list(self._game_players.round(dealer_id)) if dealer_id is not None else self._game_players.active
+        seats = {player.id: seat for seat, player in enumerate(seated)}
+
+        player_scores = {player.id: scores.player_score(player.id) for player in seated}
+        ranked = sorted(
+            seated,
+            key=functools.cmp_to_key(lambda p1, p2: player_scores[p2.id].cmp(player_scores[p1.id]))
+        )
+
+        # 名次：得分相同的玩家名次相同，0 为最好
+        ranks = {}
+        for i, player in enumerate(ranked):
+            if i > 0 and player_scores[player.id].cmp(player_scores[ranked[i - 1].id]) == 0:
+                ranks[player.id] = ranks[ranked[i - 1].id]
+            else:
+                ranks[player.id] = i
+
+        pots_winners = []
+        for pot in pots:
+            contenders = [player for player in pot.players if player.id in ranks]
+            if not contenders:
+                pots_winners.append(GameWinnersDetector.PotWinners(pot, [], 0, {}))
+                continue
+            best_rank = min(ranks[player.id] for player in contenders)
+            winners = sorted(
+                (player for player in contenders if ranks[player.id] == best_rank),
+                key=lambda player: seats[player.id]
+            )
+            money_split, odd_chips = divmod(pot.money, len(winners))
+            prizes = {
+                winner.id: money_split + (1 if i < odd_chips else 0)
+                for i, winner in enumerate(winners)
+            }
+            pots_winners.append(GameWinnersDetector.PotWinners(pot, winners, money_split, prizes))
+        return pots_winners
+
     def get_winners(self, players: List[Player], scores: GameScores) -> List[Player]:
         winners = []
 
@@ -478,55 +650,81 @@ class GameBetRounder:
     属性：
     - _game_players (GamePlayers): 管理游戏玩家的对象，用于获取当前活跃玩家信息。
     """
-    def __init__(self, game_players: GamePlayers):
-        self._game_players: GamePlayers = game_players
-
-    def _get_max_bet(self, dealer: Player, bets: Dict[str, float]) -> float:
+    class BetState:
         """
-        计算当前玩家（dealer）的最大可下注金额。
-
-        参数：
-        - dealer (Player): 当前轮到的玩家。
-        - bets (Dict[str, float]): 玩家当前的下注状态，键为玩家 ID，值为已下注金额。
-
-        返回：
-        - float: 当前玩家的最大可下注金额。
+        下注轮的状态，每次下注后更新，使最小和最大可下注金额的计算为 O(1)：
+        - 当前最高下注
+        - 未弃牌玩家中最高的两个筹码量（money + bets，在一轮下注中保持不变）
+        - 最后加注的玩家
         """
-        # Max raise:
-        # Maximum amount of money that other players bet (or can still bet) during this round
-        try:
-            # 计算其他玩家的最大可下注金额
-            highest_stake = max(
-                player.money + bets[player.id]
-                for player in self._game_players.round(dealer.id)
-                if player is not dealer
-            )
-        except ValueError:
-            return 0.0
 
-        # 最大下注金额取决于其他玩家的下注金额差和当前玩家的剩余金额
-        return min(
-            highest_stake - bets[dealer.id],
-            dealer.money
-        )
+        def __init__(self, bets: Dict[str, int]):
+            self._bets: Dict[str, int] = bets
+            self._highest_bet: int = max(bets.values()) if bets else 0
+            # Stakes of the active players
+            self._players: Dict[str, Player] = {}
+            self._stakes: Dict[str, int] = {}
+            # The two active players with the highest stakes, highest first
+            self._top_players: List[Player] = []
+            self._last_aggressor: Optional[Player] = None
 
-    def _get_min_bet(self, dealer: Player, bets: Dict[str, float]) -> float:
-        """
-        计算当前玩家（dealer）的最小可下注金额。
+        @property
+        def highest_bet(self) -> int:
+            return self._highest_bet
 
-        参数：
-        - dealer (Player): 当前轮到的玩家。
-        - bets (Dict[str, float]): 玩家当前的下注状态，键为玩家 ID，值为已下注金额。
+        @property
+        def last_aggressor(self) -> Optional[Player]:
+            return self._last_aggressor
 
-        返回：
-        - float: 当前玩家的最小可下注金额。
-        """
-        return min(
-            max(bets.values()) - bets[dealer.id],
-            dealer.money
-        )
+        def add_player(self, player: Player):
+            bet = self._bets[player.id]
+            self._players[player.id] = player
+            self._stakes[player.id] = player.money + bet
+            if bet > self._highest_bet:
+                self._highest_bet = bet
+            self._add_top_player(player)
+
+        def _add_top_player(self, player: Player):
+            stake = self._stakes[player.id]
+            if not self._top_players or stake > self._stakes[self._top_players[0].id]:
+                self._top_players = [player] + self._top_players[:1]
+            elif len(self._top_players) < 2 or stake > self._stakes[self._top_players[1].id]:
+                self._top_players = [self._top_players[0], player]
+
+        def fold(self, player: Player):
+            del self._players[player.id]
+            del self._stakes[player.id]
+            if player in self._top_players:
+                # 最高筹码量的玩家弃牌时才重新计算
+                self._top_players = []
+                for active_player in self._players.values():
+                    self._add_top_player(active_player)
+
+        def bet(self, player: Player, bet: int, min_bet: int):
+            if self._bets[player.id] > self._highest_bet:
+                self._highest_bet = self._bets[player.id]
+            if self._last_aggressor is None or bet > min_bet:
+                self._last_aggressor = player
+
+        def min_bet(self, dealer: Player) -> int:
+            """当前玩家（dealer）的最小可下注金额：跟注到最高下注，或者全押。"""
+            return min(self._highest_bet - self._bets[dealer.id], dealer.money)
+
+        def max_bet(self, dealer: Player) -> int:
+            """当前玩家（dealer）的最大可下注金额：不超过其他玩家在这一轮中最多能下注的金额。"""
+            # Maximum amount of money that other players bet (or can still bet) during this round
+            if self._top_players and self._top_players[0] is not dealer:
+                highest_stake = self._stakes[self._top_players[0].id]
+            elif len(self._top_players) > 1:
+                highest_stake = self._stakes[self._top_players[1].id]
+            else:
+                return 0
+            return min(highest_stake - self._bets[dealer.id], dealer.money)
 
-    def bet_round(self, dealer_id: str, bets: Dict[str, float], get_bet_function, on_bet_function=None, blind_bet: bool=False) -> Optional[
+    def __init__(self, game_players: GamePlayers):
+        self._game_players: GamePlayers = game_players
+
+    def bet_round(self, dealer_id: str, bets: Dict[str, int], get_bet_function, on_bet_function=None, blind_bet: bool=False) -> Optional[
         PlayerServer]:
         """
         performs a complete bet round
@@ -548,26 +746,29 @@ class GameBetRounder:
         # 盲注轮第一位和第二位的大小盲注都已完成下注，比较当前玩家金额比上家大的时候就不需要比较大盲下一位和大盲，所以跳过大小盲和大盲+1位
         offset = 2 if blind_bet else 0
 
+        # 下注状态在校验下注的同时建立
+        state = GameBetRounder.BetState(bets)
+        previous_bet = None
         for k, player in enumerate(players_round):
             if player.id not in bets:
                 bets[player.id] = 0
             # 检查当前下注是否比上家下注小
-            if bets[player.id] < 0 or (k > offset and bets[player.id] < bets[players_round[k - 1].id]):
+            if bets[player.id] < 0 or (k > offset and bets[player.id] < previous_bet):
                 # Ensuring the bets dictionary makes sense
                 raise ValueError("Invalid bets dictionary")
+            previous_bet = bets[player.id]
+            state.add_player(player)
 
-        best_player = None  # 最后加注的玩家
-
-        while starting_player is not None and starting_player != best_player:
+        while starting_player is not None and starting_player != state.last_aggressor:
             next_player = self._game_players.get_next(starting_player.id)
 
             # 计算当前玩家下注的上下限
-            max_bet = self._get_max_bet(starting_player, bets)
-            min_bet = self._get_min_bet(starting_player, bets)
+            max_bet = state.max_bet(starting_player)
+            min_bet = state.min_bet(starting_player)
 
-            if max_bet == 0.0:
+            if max_bet == 0:
                 # No bet required to this player (either he is all-in or all other players are all-in)
-                bet = 0.0
+                bet = 0
             else:
                 # This player isn't all in, and there's at least one other player who is not all-in
                 # 接收下注数据
@@ -575,15 +776,17 @@ class GameBetRounder:
 
             if bet is None:
                 self._game_players.remove(starting_player.id)
+                state.fold(starting_player)
             elif bet == -1:
                 self._game_players.fold(starting_player.id)
+                state.fold(starting_player)
             else:
-                if bet < min_bet or bet > max_bet:
+                if bet < min_bet or bet > max_bet or bet != int(bet):
                     raise ValueError("Invalid bet")
+                bet = int(bet)  # 整数筹码
                 starting_player.take_money(bet)
                 bets[starting_player.id] += bet
-                if best_player is None or bet > min_bet:
-                    best_player = starting_player
+                state.bet(starting_player, bet, min_bet)
 
             if on_bet_function:
                 on_bet_function(starting_player, bet, min_bet, max_bet, bets)
@@ -591,7 +794,7 @@ class GameBetRounder:
             starting_player = next_player  # 移动到下一个玩家
 
         # 返回最后一个加注的玩家，如果没有返回第一个过牌的玩家
-        return best_player
+        return state.last_aggressor
 
 
 class GameBetHandler:
@@ -621,25 +824,25 @@ class GameBetHandler:
         self._timeout_tolerance: int = timeout_tolerance
         self._wait_after_round: int = wait_after_round
 
-    def any_bet(self, bets: Dict[str, float]) -> bool:
+    def any_bet(self, bets: Dict[str, int]) -> bool:
         """
         检查当前是否有任何玩家下注。
 
         参数：
-        - bets (Dict[str, float]): 玩家当前的下注状态。
+        - bets (Dict[str, int]): 玩家当前的下注状态。
 
         返回：
         - bool: 如果至少有一名玩家下注金额大于零，则返回 True。
         """
         return any(k for k in bets if bets[k] > 0)
 
-    def bet_round(self, dealer_id: str, bets: Dict[str, float], pots: GamePots, blind_bet: bool = False):
+    def bet_round(self, dealer_id: str, bets: Dict[str, int], pots: GamePots, blind_bet: bool = False):
         """
         执行一轮下注操作。
 
         参数：
         - dealer_id (str): 当前庄家的玩家 ID。
-        - bets (Dict[str, float]): 玩家当前的下注状态。
+        - bets (Dict[str, int]): 玩家当前的下注状态。
         - pots (GamePots): 当前奖金池对象。
 
         返回：
@@ -647,21 +850,22 @@ class GameBetHandler:
         """
         # 调用 bet_rounder 执行下注轮次逻辑
         best_player = self._bet_rounder.bet_round(dealer_id, bets, self.get_bet, self.on_bet, blind_bet)  # [b,c,d,e,a]
-        gevent.sleep(self._wait_after_round)
+        if self._wait_after_round:
+            gevent.sleep(self._wait_after_round)
         if self.any_bet(bets):
             pots.add_bets(bets)
             self._event_dispatcher.pots_update_event(self._game_players.active, pots)
         return best_player
 
-    def get_bet(self, player, min_bet: float, max_bet: float, bets: Dict[str, float]) -> Optional[int]:
+    def get_bet(self, player, min_bet: int, max_bet: int, bets: Dict[str, int]) -> Optional[int]:
         """
         获取玩家的下注金额。
 
         参数：
         - player (Player): 当前下注的玩家。
-        - min_bet (float): 当前最小下注金额。
-        - max_bet (float): 当前最大下注金额。
-        - bets (Dict[str, float]): 玩家当前的下注状态。
+        - min_bet (int): 当前最小下注金额。
+        - max_bet (int): 当前最大下注金额。
+        - bets (Dict[str, int]): 玩家当前的下注状态。
 
         返回：
         - Optional[int]: 玩家下注的金额。如果返回 None，表示玩家未下注或超时。
@@ -683,8 +887,8 @@ class GameBetHandler:
 
         参数：
         - player (Player): 当前下注的玩家。
-        - min_bet (float): 当前最小下注金额。
-        - max_bet (float): 当前最大下注金额。
+        - min_bet (int): 当前最小下注金额。
+        - max_bet (int): 当前最大下注金额。
         - timeout_epoch (float): 超时时间点（UNIX 时间戳）。
 
         返回：
@@ -702,9 +906,9 @@ class GameBetHandler:
                 raise MessageFormatError(attribute="bet", desc="Attribute is missing")
 
             try:
-                bet = round(float(message["bet"]))  # Strip decimals
-            except ValueError:
-                raise MessageFormatError(attribute="bet", desc="'{}' is not a number".format(message.bet))
+                bet = to_chips(message["bet"])  # Strip decimals
+            except (TypeError, ValueError):
+                raise MessageFormatError(attribute="bet", desc="'{}' is not a number".format(message["bet"]))
             else:
                 # Validating bet
                 if bet != -1 and (bet < min_bet or bet > max_bet):
@@ -718,16 +922,16 @@ class GameBetHandler:
             player.send_message({"message_type": "error", "error": e.args[0]})
             return None
 
-    def on_bet(self, player: Player, bet: float, min_bet: float, max_bet: float, bets: Dict[str, float]):
+    def on_bet(self, player: Player, bet: int, min_bet: int, max_bet: int, bets: Dict[str, int]):
         """
         处理玩家的下注事件并触发相关事件。
 
         参数：
         - player (Player): 当前下注的玩家。
-        - bet (float): 玩家下注的金额。
-        - min_bet (float): 当前最小下注金额。
-        - max_bet (float): 当前最大下注金额。
-        - bets (Dict[str, float]): 玩家当前的下注状态。
+        - bet (int): 玩家下注的金额。
+        - min_bet (int): 当前最小下注金额。
+        - max_bet (int): 当前最大下注金额。
+        - bets (Dict[str, int]): 玩家当前的下注状态。
         """
         def get_bet_type(bet):
             if bet == 0:
@@ -794,6 +998,11 @@ class PokerGame:
     def save_player_data(self):
         raise NotImplemented
 
+    def _wait(self, seconds: float):
+        # 等待时间为 0 时（例如回放牌局）不切换协程
+        if seconds:
+            gevent.sleep(seconds)
+
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     # Factory methods
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -857,7 +1066,7 @@ class PokerGame:
             # Distribute cards
             scores.assign_cards(player.id, deck.pop_cards(number_of_cards))
             self._send_player_score(player, scores)
-        gevent.sleep(self.WAIT_AFTER_CARDS_ASSIGNMENT)
+        self._wait(self.WAIT_AFTER_CARDS_ASSIGNMENT)
 
     def _send_player_score(self, player: Player, scores: GameScores):
         """
@@ -887,36 +1096,35 @@ class PokerGame:
         if self._game_players.count_active() < 2:
             raise EndGameException
 
-    def _detect_winners(self, pots: GamePots, scores: GameScores):
+    def _detect_winners(self, pots: GamePots, scores: GameScores, dealer_id: Optional[str] = None):
         """
         检测并分配赢家。
 
         参数：
         - pots (GamePots): 当前游戏的奖金池管理器。
         - scores (GameScores): 管理玩家得分的组件。
+        - dealer_id (str): 庄家，零头筹码从庄家左手边的赢家开始分配。
 
         异常：
         - GameError: 如果没有玩家可以分配奖金。
         """
-        for i, pot in enumerate(reversed(pots)):
-            winners = self._winners_detector.get_winners(pot.players, scores)
-            try:
-                money_split = round(pot.money / len(winners))  # Strip decimals
-            except ZeroDivisionError:
+        pots_winners = self._winners_detector.get_pots_winners(pots, scores, dealer_id)
+        for i, pot_winners in enumerate(reversed(pots_winners)):
+            if not pot_winners.winners:
                 raise GameError("No players left")
-            else:
-                for winner in winners:
-                    winner.add_money(money_split)
 
-                self._event_dispatcher.winner_designation_event(
-                    players=self._game_players.active,
-                    pot=pot,
-                    winners=winners,
-                    money_split=money_split,
-                    upcoming_pots=pots[(i + 1):]
-                )
+            for winner in pot_winners.winners:
+                winner.add_money(pot_winners.prizes[winner.id])
+
+            self._event_dispatcher.winner_designation_event(
+                players=self._game_players.active,
+                pot=pot_winners.pot,
+                winners=pot_winners.winners,
+                money_split=pot_winners.money_split,
+                upcoming_pots=pots[(i + 1):]
+            )
 
-                gevent.sleep(self.WAIT_AFTER_WINNER_DESIGNATION)
+            self._wait(self.WAIT_AFTER_WINNER_DESIGNATION)
 
     def _showdown(self, scores: GameScores):
         """
@@ -926,4 +1134,4 @@ class PokerGame:
         - scores (GameScores): 管理玩家得分的组件。
         """
         self._event_dispatcher.showdown_event(self._game_players.active, scores)
-        gevent.sleep(self.WAIT_AFTER_SHOWDOWN)
+        self._wait(self.WAIT_AFTER_SHOWDOWN)
@@ -1,10 +1,8 @@
 import uuid
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
-import gevent
-
-from .deck import DeckFactory
-from .player import Player
+from .deck import DeckFactory, CompactDeck
+from .player import Player, to_chips
 from .poker_game import PokerGame, GameFactory, GameError, EndGameException, GamePlayers, \
     GameEventDispatcher, GameSubscriber
 from .score_detector import HoldemPokerScoreDetector
@@ -13,17 +11,19 @@ import logging
 
 
 class HoldemPokerGameFactory(GameFactory):
-    def __init__(self, big_blind: float, small_blind: float, logger,
-                 game_subscribers: Optional[List[GameSubscriber]] = None):
-        self._big_blind: float = big_blind
-        self._small_blind: float = small_blind
+    def __init__(self, big_blind: int, small_blind: int, logger,
+                 game_subscribers: Optional[List[GameSubscriber]] = None, persistent: bool = True):
+        self._big_blind: int = to_chips(big_blind)
+        self._small_blind: int = to_chips(small_blind)
         self._logger = logger
         self._game_subscribers: List[GameSubscriber] = [] if game_subscribers is None else game_subscribers
+        # False for games that must not touch the database (load tests)
+        self._persistent: bool = persistent
 
-    def create_game(self, players: List[Player]):
+    def create_game(self, players: List[Player], room_id: Optional[str] = None):
         game_id = str(uuid.uuid4())
 
-        event_dispatcher = HoldemPokerGameEventDispatcher(game_id=game_id, logger=self._logger)
+        event_dispatcher = HoldemPokerGameEventDispatcher(game_id=game_id, logger=self._logger, room_id=room_id)
         # 游戏管理器中添加订阅者
         for subscriber in self._game_subscribers:
             event_dispatcher.subscribe(subscriber)
@@ -34,8 +34,9 @@ class HoldemPokerGameFactory(GameFactory):
             id=game_id,
             game_players=GamePlayers(players),
             event_dispatcher=event_dispatcher,
-            deck_factory=DeckFactory(2),  # 指定2为最小牌面
-            score_detector=HoldemPokerScoreDetector()
+            deck_factory=DeckFactory(2, CompactDeck),  # 指定2为最小牌面
+            score_detector=HoldemPokerScoreDetector(),
+            persistent=self._persistent
         )
 
 
@@ -47,18 +48,23 @@ class HoldemPokerGameEventDispatcher(GameEventDispatcher):
     3.发公共牌
     """
 
+    def __init__(self, game_id: str, logger, room_id: Optional[str] = None):
+        GameEventDispatcher.__init__(self, game_id, logger)
+        # 游戏所在的房间（新游戏事件中发送）
+        self._room_id: Optional[str] = room_id
+
     def new_game_event(self, game_id, players, dealer_id, big_blind, small_blind):
-        self.raise_event(
-            "new-game",
-            {
-                "game_id": game_id,
-                "game_type": "texas-holdem",
-                "players": [player.dto() for player in players],
-                "dealer_id": dealer_id,
-                "big_blind": big_blind,
-                "small_blind": small_blind
-            }
-        )
+        event_data = {
+            "game_id": game_id,
+            "game_type": "texas-holdem",
+            "players": [player.dto() for player in players],
+            "dealer_id": dealer_id,
+            "big_blind": big_blind,
+            "small_blind": small_blind
+        }
+        if self._room_id is not None:
+            event_data["room_id"] = self._room_id
+        self.raise_event("new-game", event_data)
 
     def game_over_event(self):
         self.raise_event(
@@ -100,11 +106,13 @@ class HoldemPokerGame(PokerGame):
 
     WAIT_AFTER_FLOP_TURN_RIVER = 1
 
-    def __init__(self, big_blind, small_blind, *args, **kwargs):
+    def __init__(self, big_blind, small_blind, *args, persistent: bool = True, **kwargs):
         PokerGame.__init__(self, *args, **kwargs)
-        self._big_blind = big_blind
-        self._small_blind = small_blind
+        self._big_blind: int = to_chips(big_blind)
+        self._small_blind: int = to_chips(small_blind)
         self._logger = logging.getLogger()
+        # 是否将玩家数据保存到数据库（压测机器人和模拟牌局只在内存中结算贷款）
+        self._persistent: bool = persistent
 
     def __check_no_money_players(self):
         # 没钱的自动贷款
@@ -122,11 +130,29 @@ class HoldemPokerGame(PokerGame):
             loan_times = query_player_msg_in_db(player.name, 'loan')  # 贷款次数
             if loan_times > 0:
                 current_money = query_player_msg_in_db(player.name, 'money')  # 当前积分
-                refund_times = (current_money - 1000) // 1000 if current_money > 1000 else 0  # 超过1000部分如果超过1000的整数倍就归还
+                refund_times = self._refund_loan(player, loan_times, current_money)
                 if refund_times > 0:
-                    player.refund_money(min(refund_times, loan_times))  # 赢的太多只还贷的部分
                     print(f'玩家{player.name}归还贷款{refund_times}次')
 
+    @staticmethod
+    def _refund_loan(player: Player, loan_times: int, current_money: int) -> int:
+        # 超过1000部分如果超过1000的整数倍就归还，返回归还次数
+        refund_times = int((current_money - 1000) // 1000) if current_money > 1000 else 0
+        if refund_times > 0:
+            player.refund_money(min(refund_times, loan_times))  # 赢的太多只还贷的部分
+        return refund_times
+
+    def _update_loans(self) -> Tuple[int, int]:
+        """Grants and refunds the loans in memory, returns the number of loans and refunds."""
+        loans = refunds = 0
+        for player in self._game_players.all:
+            if player.money < self._big_blind:
+                player.add_loan()
+                loans += 1
+            elif player.loan > 0:
+                refunds += self._refund_loan(player, player.loan, player.money)
+        return loans, refunds
+
     def _save_player_data(self):
         # 将玩家数据保存到数据库
         for player in self._game_players.all:
@@ -136,6 +162,8 @@ class HoldemPokerGame(PokerGame):
         update_daily_ranking()
 
     def update_ranking_list(self):
+        if not self._persistent:
+            return
         total_ranking_data = get_ranking_list()
         self._event_dispatcher.update_ranking_event(total_ranking_data)
 
@@ -198,6 +226,9 @@ class HoldemPokerGame(PokerGame):
         """
         保存游戏数据，包括玩家数据、游戏状态等。
         """
+        if not self._persistent:
+            self._update_loans()
+            return
         self.__check_no_money_players()  # 检查是否有玩家没钱了
         self.__loan_refunding()  # 自动归还贷款
         self._save_player_data()  # 保存用户数据
@@ -265,21 +296,21 @@ class HoldemPokerGame(PokerGame):
 
             # Flop
             self._add_shared_cards(deck.pop_cards(3), scores)
-            gevent.sleep(self.WAIT_AFTER_FLOP_TURN_RIVER)
+            self._wait(self.WAIT_AFTER_FLOP_TURN_RIVER)
 
             # Flop bet round
             bet_rounds.__next__()
 
             # Turn
             self._add_shared_cards(deck.pop_cards(1), scores)
-            gevent.sleep(self.WAIT_AFTER_FLOP_TURN_RIVER)
+            self._wait(self.WAIT_AFTER_FLOP_TURN_RIVER)
 
             # Turn bet round
             bet_rounds.__next__()
 
             # River
             self._add_shared_cards(deck.pop_cards(1), scores)
-            gevent.sleep(self.WAIT_AFTER_FLOP_TURN_RIVER)
+            self._wait(self.WAIT_AFTER_FLOP_TURN_RIVER)
 
             # River bet round
             if bet_rounds.__next__() and self._game_players.count_active() > 1:
@@ -289,7 +320,7 @@ class HoldemPokerGame(PokerGame):
             raise EndGameException
 
         except EndGameException:
-            self._detect_winners(pots, scores)
+            self._detect_winners(pots, scores, dealer_id)
             self._reset_ready_state()  # 重置准备状态
 
         finally:
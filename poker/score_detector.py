@@ -1,7 +1,9 @@
+import array
 import collections
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Type
 
 from .card import Card
+from .hand_evaluator import HandEvaluator, BoardState, get_hand_evaluator, unpack_ranks
 
 
 class Cards:
@@ -56,7 +58,8 @@ class Cards:
         return None
 
     def _merge_with_cards(self, score_cards: List[Card]):
-        return score_cards + [card for card in self._sorted if card not in score_cards]
+        score_cards_set = set(score_cards)
+        return score_cards + [card for card in self._sorted if card not in score_cards_set]
 
     def quads(self):
         quads_list = self._x_sorted_list(4)
@@ -124,6 +127,205 @@ class Cards:
         return self._sorted[0:5]
 
 
+class CardSet:
+    """
+    Set of cards packed in a 64 bits integer: bit n is set when the card whose value is n (rank << 2 | suit) is in
+    the set, so the 4 bits of a rank are a nibble.
+    A 15 bits mask of the ranks (bit n is rank n) is also kept for every suit.
+    """
+    RANK_NIBBLE = 0xF
+
+    def __init__(self, cards: Iterable[Card] = ()):
+        self._bits: int = 0
+        self._suit_masks: List[int] = [0, 0, 0, 0]
+        for card in cards:
+            self.add(card)
+
+    @property
+    def bits(self) -> int:
+        return self._bits
+
+    @property
+    def suit_masks(self) -> List[int]:
+        return self._suit_masks
+
+    def add(self, card: Card):
+        value = int(card)
+        self._bits |= 1 << value
+        self._suit_masks[value & 3] |= 1 << (value >> 2)
+
+    def __contains__(self, card: Card) -> bool:
+        return bool((self._bits >> int(card)) & 1)
+
+    def __len__(self) -> int:
+        return bin(self._bits).count("1")
+
+    @property
+    def rank_mask(self) -> int:
+        """Ranks with at least one card."""
+        s0, s1, s2, s3 = self._suit_masks
+        return s0 | s1 | s2 | s3
+
+    @property
+    def pairs_mask(self) -> int:
+        """Ranks with at least two cards."""
+        s0, s1, s2, s3 = self._suit_masks
+        return (s0 & s1) | (s0 & s2) | (s0 & s3) | (s1 & s2) | (s1 & s3) | (s2 & s3)
+
+    @property
+    def trips_mask(self) -> int:
+        """Ranks with at least three cards."""
+        s0, s1, s2, s3 = self._suit_masks
+        return (s0 & s1 & s2) | (s0 & s1 & s3) | (s0 & s2 & s3) | (s1 & s2 & s3)
+
+    @property
+    def quads_mask(self) -> int:
+        """Ranks with four cards."""
+        s0, s1, s2, s3 = self._suit_masks
+        return s0 & s1 & s2 & s3
+
+    def rank_bits(self, rank: int) -> int:
+        """Subset of the cards with the given rank."""
+        return self._bits & (CardSet.RANK_NIBBLE << (rank << 2))
+
+    @staticmethod
+    def to_cards(bits: int, limit: int = 64) -> List[Card]:
+        """Cards of a 64 bits set sorted in a descending order (only the first `limit` ones)."""
+        cards = []
+        while bits and len(cards) < limit:
+            value = bits.bit_length() - 1
+            bits ^= 1 << value
+            cards.append(Card.from_code(value))
+        return cards
+
+
+class BitCards:
+    """
+    Same interface as Cards, working on a CardSet: ranks multiplicities, straights and flushes are detected with bit
+    operations on the rank masks.
+    """
+
+    def __init__(self, cards: List[Card], lowest_rank=2):
+        self._set = CardSet(cards)
+        self._lowest_rank: int = lowest_rank
+
+    @staticmethod
+    def _ranks(mask: int) -> List[int]:
+        # Ranks of a mask in a descending order (at most 4 groups are ever needed)
+        ranks = []
+        while mask:
+            rank = mask.bit_length() - 1
+            mask ^= 1 << rank
+            ranks.append(rank)
+        return ranks
+
+    def _straight_top(self, rank_mask: int) -> int:
+        # The Ace can go under the lowest rank card
+        if rank_mask & (1 << 14):
+            rank_mask |= 1 << (self._lowest_rank - 1)
+        runs = rank_mask & (rank_mask >> 1)
+        runs &= runs >> 1
+        runs &= runs >> 2
+        if not runs:
+            return 0
+        # Bit n is set when ranks n, n + 1, ..., n + 4 are all there
+        return runs.bit_length() + 3
+
+    def _straight_bits(self, top: int, bits: int) -> List[Card]:
+        straight = []
+        for rank in range(top, top - 5, -1):
+            rank_bits = bits & (CardSet.RANK_NIBBLE << ((rank if rank >= self._lowest_rank else 14) << 2))
+            straight += CardSet.to_cards(rank_bits, 1)
+        return straight
+
+    def _merge_with_cards(self, score_bits: List[int]) -> List[Card]:
+        # Score cards (group by group) followed by the highest cards left
+        score_cards = []
+        left = self._set.bits
+        for bits in score_bits:
+            score_cards += CardSet.to_cards(bits)
+            left &= ~bits
+        return score_cards + CardSet.to_cards(left, 5 - len(score_cards))
+
+    def _exact_masks(self):
+        card_set = self._set
+        pairs = card_set.pairs_mask
+        trips = card_set.trips_mask
+        quads = card_set.quads_mask
+        return trips & ~quads, pairs & ~trips
+
+    def quads(self) -> Optional[List[Card]]:
+        quads = self._set.quads_mask
+        if not quads:
+            return None
+        return self._merge_with_cards([self._set.rank_bits(quads.bit_length() - 1)])[0:5]
+
+    def full_house(self) -> Optional[List[Card]]:
+        trips_mask, pairs_mask = self._exact_masks()
+        trips = self._ranks(trips_mask)
+        if len(trips) >= 2:
+            second = CardSet.to_cards(self._set.rank_bits(trips[1]), 2)
+            return self._merge_with_cards([self._set.rank_bits(trips[0])])[0:3] + second
+        if not trips or not pairs_mask:
+            return None
+        pair = pairs_mask.bit_length() - 1
+        return self._merge_with_cards([self._set.rank_bits(trips[0]), self._set.rank_bits(pair)])[0:5]
+
+    def trips(self) -> Optional[List[Card]]:
+        trips_mask, _ = self._exact_masks()
+        if not trips_mask:
+            return None
+        return self._merge_with_cards([self._set.rank_bits(trips_mask.bit_length() - 1)])[0:5]
+
+    def two_pair(self) -> Optional[List[Card]]:
+        _, pairs_mask = self._exact_masks()
+        pairs = self._ranks(pairs_mask)
+        if len(pairs) < 2:
+            return None
+        return self._merge_with_cards([self._set.rank_bits(pairs[0]), self._set.rank_bits(pairs[1])])[0:5]
+
+    def pair(self) -> Optional[List[Card]]:
+        _, pairs_mask = self._exact_masks()
+        if not pairs_mask:
+            return None
+        return self._merge_with_cards([self._set.rank_bits(pairs_mask.bit_length() - 1)])[0:5]
+
+    def straight(self) -> Optional[List[Card]]:
+        top = self._straight_top(self._set.rank_mask)
+        if not top:
+            return None
+        return self._straight_bits(top, self._set.bits)
+
+    def _suit_bits(self, suit: int) -> int:
+        # Every 4th bit starting from the suit one
+        return self._set.bits & (0x1111111111111111 << suit)
+
+    def flush(self) -> Optional[List[Card]]:
+        # The best flush is the one which gets its 5th card first when going through the cards from the highest
+        best = None
+        for suit, suit_mask in enumerate(self._set.suit_masks):
+            if bin(suit_mask).count("1") >= 5:
+                flush = CardSet.to_cards(self._suit_bits(suit), 5)
+                if best is None or int(flush[4]) > int(best[4]):
+                    best = flush
+        return best
+
+    def straight_flush(self) -> Optional[List[Card]]:
+        best = None
+        for suit, suit_mask in enumerate(self._set.suit_masks):
+            top = self._straight_top(suit_mask)
+            if top:
+                straight = self._straight_bits(top, self._suit_bits(suit))
+                # The lowest straight card is the one completing the straight when going through the sorted cards
+                lowest = straight[4] if top - 4 >= self._lowest_rank else straight[3]
+                if best is None or int(lowest) > best[0]:
+                    best = (int(lowest), straight)
+        return best[1] if best else None
+
+    def no_pair(self) -> List[Card]:
+        return CardSet.to_cards(self._set.bits, 5)
+
+
 class Score:
     def __init__(self, category: int, cards: List[Card]):
         self._category: int = category
@@ -164,8 +366,17 @@ class HoldemPokerScore(Score):
     QUADS = 7
     STRAIGHT_FLUSH = 8
 
+    def __init__(self, category: int, cards: List[Card], strength: Optional[int] = None):
+        Score.__init__(self, category, cards)
+        self._strength: Optional[int] = strength
+
     @property
     def strength(self):
+        if self._strength is None:
+            self._strength = self._get_strength()
+        return self._strength
+
+    def _get_strength(self):
         strength = self.category
         for offset in range(5):
             strength <<= 4
@@ -185,13 +396,95 @@ class HoldemPokerScore(Score):
 
 
 class ScoreDetector:
+    def __init__(self, cards_type: Type = Cards):
+        # Cards backend used to detect the scores: Cards or BitCards
+        self._cards_type: Type = cards_type
+
     def get_score(self, cards: List[Card]):
         raise NotImplemented
 
+    def get_scores_batch(self, hands):
+        """
+        Evaluates many hands at once.
+        :param hands: (N, 7) integer array of card codes (see Card._value)
+        :return: N-length numpy array of the score strengths (array.array if numpy isn't installed)
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            return array.array("q", [self.get_score([Card.from_code(code) for code in hand]).strength
+                                     for hand in hands])
+
+        return np.array(
+            [self.get_score([Card.from_code(code) for code in hand]).strength for hand in np.asarray(hands).tolist()],
+            dtype=np.int64
+        )
+
+    def create_board(self) -> Optional[BoardState]:
+        """Shared cards state for incremental scoring, None if the detector always works on the whole hand."""
+        return None
+
+    def get_board_score(self, board: BoardState, cards: List[Card]):
+        return self.get_score(cards + board.cards)
+
 
 class HoldemPokerScoreDetector(ScoreDetector):
+    def __init__(self, evaluator: Optional[HandEvaluator] = None, cards_type: Type = BitCards):
+        # Hands of 5 to 7 cards are scored by the lookup tables, the other ones (pre-flop hands for instance) by the
+        # cards backend
+        ScoreDetector.__init__(self, cards_type)
+        # Lookup tables are shared by every detector unless a specific evaluator is given
+        self._evaluator: Optional[HandEvaluator] = evaluator
+
+    @property
+    def evaluator(self) -> HandEvaluator:
+        if self._evaluator is None:
+            self._evaluator = get_hand_evaluator()
+        return self._evaluator
+
     def get_score(self, cards):
-        cards = Cards(cards, 2)
+        if HandEvaluator.MIN_CARDS <= len(cards) <= HandEvaluator.MAX_CARDS:
+            return self._get_table_score(cards)
+        return self._get_cards_score(cards)
+
+    def get_scores_batch(self, hands):
+        # One vectorized lookup for every hand
+        return self.evaluator.evaluate_batch(hands)
+
+    def create_board(self) -> BoardState:
+        return BoardState()
+
+    def get_board_score(self, board: BoardState, cards: List[Card]) -> HoldemPokerScore:
+        # Only the player cards are evaluated on top of the shared cards keys
+        if HandEvaluator.MIN_CARDS <= board.size + len(cards) <= HandEvaluator.MAX_CARDS:
+            strength = self.evaluator.evaluate_board(board, [int(card) for card in cards])
+            return self._get_strength_score(cards + board.cards, strength)
+        return self.get_score(cards + board.cards)
+
+    def _get_table_score(self, cards: List[Card]) -> HoldemPokerScore:
+        return self._get_strength_score(cards, self.evaluator.evaluate([int(card) for card in cards]))
+
+    def _get_strength_score(self, cards: List[Card], strength: int) -> HoldemPokerScore:
+        category = strength >> 20
+
+        sorted_cards = sorted(cards, key=int, reverse=True)
+        if category == HoldemPokerScore.FLUSH or category == HoldemPokerScore.STRAIGHT_FLUSH:
+            suits = collections.Counter(card.suit for card in sorted_cards)
+            flush_suit = suits.most_common(1)[0][0]
+            sorted_cards = [card for card in sorted_cards if card.suit == flush_suit]
+
+        # Picking, for every rank of the score, the highest card left with that rank
+        score_cards = []
+        for rank in unpack_ranks(strength):
+            for i, card in enumerate(sorted_cards):
+                if card.rank == rank:
+                    score_cards.append(sorted_cards.pop(i))
+                    break
+
+        return HoldemPokerScore(category, score_cards, strength)
+
+    def _get_cards_score(self, cards: List[Card]) -> HoldemPokerScore:
+        cards = self._cards_type(cards, 2)
         score_functions = [
             (HoldemPokerScore.STRAIGHT_FLUSH, cards.straight_flush),
             (HoldemPokerScore.QUADS, cards.quads),
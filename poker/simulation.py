@@ -0,0 +1,247 @@
+import logging
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from .deck import CompactDeck, DeckFactory
+from .hand_replay import ReplayEventDispatcher
+from .player import Player
+from .poker_game import GameBetHandler, GameBetRounder, GamePlayers, GameScores
+from .poker_game_holdem import HoldemPokerGame
+from .score_detector import HoldemPokerScore, HoldemPokerScoreDetector
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Strategies
+#
+# A strategy is a callable answering the bet requests of a player with the same values a client sends:
+#   strategy(player=..., min_bet=..., max_bet=..., bets=..., cards=..., shared_cards=..., score=...) -> bet
+# where -1 folds, min_bet checks or calls and anything up to max_bet raises.
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class CallStrategy:
+    """Always checks or calls."""
+
+    def __call__(self, player, min_bet, max_bet, bets, cards, shared_cards, score):
+        return min_bet
+
+
+class RandomStrategy:
+    """Folds, calls or raises at random, whatever the cards."""
+
+    def __init__(self, rand: random.Random, fold: float = 0.1, raise_: float = 0.1, raise_amount: int = 20):
+        self._rand: random.Random = rand
+        self._fold: float = fold
+        self._raise: float = raise_
+        self._raise_amount: int = raise_amount
+
+    def __call__(self, player, min_bet, max_bet, bets, cards, shared_cards, score):
+        choice = self._rand.random()
+        if choice < self._fold and min_bet > 0:
+            return -1
+        if choice > 1.0 - self._raise:
+            return min(max_bet, min_bet + self._raise_amount)
+        return min_bet
+
+
+class ScoreStrategy:
+    """
+    Plays according to the score category of the player: raises with `raise_category` or better, folds to any bet
+    below `call_category` (only after the flop, every hand is called pre-flop).
+    """
+
+    def __init__(self, call_category: int = HoldemPokerScore.PAIR, raise_category: int = HoldemPokerScore.TRIPS,
+                 raise_amount: int = 20):
+        self._call_category: int = call_category
+        self._raise_category: int = raise_category
+        self._raise_amount: int = raise_amount
+
+    def __call__(self, player, min_bet, max_bet, bets, cards, shared_cards, score):
+        if score.category >= self._raise_category:
+            return min(max_bet, min_bet + self._raise_amount)
+        if shared_cards and min_bet > 0 and score.category < self._call_category:
+            return -1
+        return min_bet
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Game
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class SimulationBetHandler(GameBetHandler):
+    """Asks the bets to the strategies of the players."""
+
+    def __init__(self, game_players: GamePlayers, bet_rounder: GameBetRounder, event_dispatcher,
+                 strategies: Dict[str, Callable], get_scores: Callable[[], GameScores]):
+        GameBetHandler.__init__(self, game_players, bet_rounder, event_dispatcher,
+                                bet_timeout=0, timeout_tolerance=0, wait_after_round=0)
+        self._strategies: Dict[str, Callable] = strategies
+        self._get_scores: Callable[[], GameScores] = get_scores
+
+    def get_bet(self, player, min_bet: int, max_bet: int, bets: Dict[str, int]) -> Optional[int]:
+        scores = self._get_scores()
+        return self._strategies[player.id](
+            player=player,
+            min_bet=min_bet,
+            max_bet=max_bet,
+            bets=bets,
+            cards=scores.player_cards(player.id),
+            shared_cards=scores.shared_cards,
+            score=scores.player_score(player.id)
+        )
+
+
+class SimulationHoldemPokerGame(HoldemPokerGame):
+    """
+    Texas holdem hands played by strategies: no channels, waits, events or database.
+    Loans are granted and refunded in memory after every hand, with the same rules as the game service.
+    """
+    WAIT_AFTER_CARDS_ASSIGNMENT = 0
+    WAIT_AFTER_BET_ROUND = 0
+    WAIT_AFTER_SHOWDOWN = 0
+    WAIT_AFTER_WINNER_DESIGNATION = 0
+    WAIT_AFTER_FLOP_TURN_RIVER = 0
+
+    def __init__(self, big_blind: int, small_blind: int, players: List[Player], strategies: Dict[str, Callable],
+                 deck_factory: DeckFactory, score_detector: HoldemPokerScoreDetector):
+        self._strategies: Dict[str, Callable] = strategies
+        self._scores: Optional[GameScores] = None
+        self._loans: int = 0
+        self._refunds: int = 0
+        HoldemPokerGame.__init__(
+            self,
+            big_blind,
+            small_blind,
+            id="simulation",
+            game_players=GamePlayers(players),
+            event_dispatcher=ReplayEventDispatcher(game_id="simulation", logger=logging.getLogger()),
+            deck_factory=deck_factory,
+            score_detector=score_detector
+        )
+
+    @property
+    def loans(self) -> int:
+        return self._loans
+
+    @property
+    def refunds(self) -> int:
+        return self._refunds
+
+    def _create_scores(self) -> GameScores:
+        self._scores = HoldemPokerGame._create_scores(self)
+        return self._scores
+
+    def _create_bet_handler(self) -> SimulationBetHandler:
+        return SimulationBetHandler(
+            game_players=self._game_players,
+            bet_rounder=GameBetRounder(self._game_players),
+            event_dispatcher=self._event_dispatcher,
+            strategies=self._strategies,
+            get_scores=lambda: self._scores
+        )
+
+    def save_player_data(self):
+        loans, refunds = self._update_loans()
+        self._loans += loans
+        self._refunds += refunds
+
+
+class SimulationReport:
+    def __init__(self, hands: int, seconds: float, players: List[Player], initial_money: int, loans: int,
+                 refunds: int):
+        self.hands: int = hands
+        self.seconds: float = seconds
+        self.players: List[Player] = players
+        self.initial_money: int = initial_money
+        self.loans: int = loans
+        self.refunds: int = refunds
+
+    @property
+    def hands_per_sec(self) -> float:
+        return self.hands / self.seconds if self.seconds else 0.0
+
+    def dto(self):
+        return {
+            "hands": self.hands,
+            "seconds": self.seconds,
+            "hands_per_sec": self.hands_per_sec,
+            "loans": self.loans,
+            "refunds": self.refunds,
+            "players": [
+                {
+                    "id": player.id,
+                    "money": player.money,
+                    "loan": player.loan,
+                    # Winnings net of the outstanding loans
+                    "net": player.money - 1000 * player.loan - self.initial_money,
+                }
+                for player in self.players
+            ]
+        }
+
+
+class HoldemSimulation:
+    """
+    Plays hands in a loop at one table, moving the dealer button after every hand like a game room.
+    Hands are reproducible given a seed.
+    """
+
+    def __init__(self, strategies: List[Callable], money: int = 1000, big_blind: int = 10,
+                 small_blind: int = 5, seed: Optional[int] = None,
+                 score_detector: Optional[HoldemPokerScoreDetector] = None):
+        if len(strategies) < 2:
+            raise ValueError("At least two players needed")
+        self._initial_money: int = money
+        self._players: List[Player] = [
+            Player("player-{}".format(i), "Player {}".format(i), money, 0, True) for i in range(len(strategies))
+        ]
+        self._game = SimulationHoldemPokerGame(
+            big_blind,
+            small_blind,
+            players=self._players,
+            strategies={player.id: strategy for player, strategy in zip(self._players, strategies)},
+            deck_factory=DeckFactory(2, CompactDeck, random.Random(seed)),
+            score_detector=score_detector if score_detector else HoldemPokerScoreDetector()
+        )
+        self._dealer_key: int = -1
+        self._hands: int = 0
+        self._seconds: float = 0.0
+
+    @property
+    def players(self) -> List[Player]:
+        return self._players
+
+    def play_hand(self):
+        self._dealer_key = (self._dealer_key + 1) % len(self._players)  # 更新庄家位置
+        self._game.play_hand(self._players[self._dealer_key].id)
+        self._game.save_player_data()
+        self._hands += 1
+
+    def run(self, hands: int) -> SimulationReport:
+        start = time.perf_counter()
+        for _ in range(hands):
+            self.play_hand()
+        self._seconds += time.perf_counter() - start
+        return self.report()
+
+    def report(self) -> SimulationReport:
+        return SimulationReport(self._hands, self._seconds, self._players, self._initial_money, self._game.loans,
+                                self._game.refunds)
+
+
+if __name__ == '__main__':
+    # python -m poker.simulation [hands] [players] [seed]
+    num_hands = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    num_players = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    simulation_seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    rand = random.Random(simulation_seed)
+    simulation = HoldemSimulation(
+        [ScoreStrategy() if i % 2 else RandomStrategy(rand) for i in range(num_players)],
+        seed=simulation_seed
+    )
+    report = simulation.run(num_hands)
+    print("{} hands in {:.2f}s: {:,.0f} hands/s, {} loans, {} refunds".format(
+        report.hands, report.seconds, report.hands_per_sec, report.loans, report.refunds))
+    for player_report in report.dto()["players"]:
+        print("{id}: money {money}, loan {loan}, net {net:+d}".format(**player_report))
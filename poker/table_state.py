@@ -0,0 +1,216 @@
+from typing import Dict, Iterable, List, Optional
+
+
+class TableState:
+    """
+    Versioned state of a table: the seats and the DTOs of the seated players.
+
+    Every change increments the version. Clients acknowledge the versions they applied ("state-ack" messages) and are
+    sent the fields changed since then (delta), or the whole state when they acknowledged nothing yet or a version
+    too old to compute a delta from.
+    """
+    MAX_REMOVED = 100  # 记录的已离开玩家数量，更早的版本只能发送完整状态
+
+    def __init__(self, room_id: str, room_size: int):
+        self._room_id: str = room_id
+        self._version: int = 0
+        # Deltas can only be computed from this version on
+        self._base_version: int = 0
+        self._seats: List[Optional[str]] = [None] * room_size
+        self._seats_version: int = 0
+        self._players: Dict[str, dict] = {}
+        # Version of the last change of every field of every player
+        self._field_versions: Dict[str, Dict[str, int]] = {}
+        # Version every player left the table, in order
+        self._removed: Dict[str, int] = {}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def seats(self) -> List[Optional[str]]:
+        return list(self._seats)
+
+    @property
+    def players(self) -> Dict[str, dict]:
+        return dict(self._players)
+
+    def update(self, players: Iterable[dict] = (), seats: Optional[List[Optional[str]]] = None) -> bool:
+        """
+        Applies the seats and player DTOs given, players no longer seated are removed.
+        Returns True if anything changed (a new version).
+        """
+        version = self._version + 1
+        changed = False
+
+        if seats is not None and seats != self._seats:
+            self._seats = list(seats)
+            self._seats_version = version
+            changed = True
+            seated = set(player_id for player_id in seats if player_id is not None)
+            for player_id in [player_id for player_id in self._players if player_id not in seated]:
+                self._remove_player(player_id, version)
+
+        for dto in players:
+            player_id = dto["id"]
+            if player_id not in self._seats:
+                continue
+            if self._update_player(dto, version):
+                changed = True
+
+        if changed:
+            self._version = version
+        return changed
+
+    def _update_player(self, dto: dict, version: int) -> bool:
+        player_id = dto["id"]
+        current = self._players.get(player_id)
+        if current is dto:
+            # Cached DTO of an unchanged player
+            return False
+        if current is None:
+            self._removed.pop(player_id, None)
+            self._field_versions[player_id] = {field: version for field in dto}
+        else:
+            field_versions = self._field_versions[player_id]
+            changed_fields = [field for field in dto if current.get(field) != dto[field]]
+            if not changed_fields:
+                self._players[player_id] = dto
+                return False
+            for field in changed_fields:
+                field_versions[field] = version
+        self._players[player_id] = dto
+        return True
+
+    def _remove_player(self, player_id: str, version: int):
+        del self._players[player_id]
+        del self._field_versions[player_id]
+        self._removed[player_id] = version
+        if len(self._removed) > self.MAX_REMOVED:
+            oldest = next(iter(self._removed))
+            self._base_version = self._removed.pop(oldest)
+
+    def snapshot(self) -> dict:
+        """The whole state."""
+        return {
+            "message_type": "table-state",
+            "room_id": self._room_id,
+            "version": self._version,
+            "full": True,
+            "players": dict(self._players),
+            "player_ids": list(self._seats),
+        }
+
+    def delta(self, since: Optional[int]) -> dict:
+        """
+        The changes made after a version: changed fields of the players (None for players who left the table) and
+        the seats if they changed. The whole state if no delta can be computed from the version.
+        """
+        if since is None or since < self._base_version or since > self._version:
+            return self.snapshot()
+
+        players = {}
+        for player_id, field_versions in self._field_versions.items():
+            dto = self._players[player_id]
+            fields = {field: dto[field] for field, version in field_versions.items() if version > since}
+            if fields:
+                players[player_id] = fields
+        for player_id, version in self._removed.items():
+            if version > since:
+                players[player_id] = None
+
+        message = {
+            "message_type": "table-state",
+            "room_id": self._room_id,
+            "version": self._version,
+            "base_version": since,
+            "players": players,
+        }
+        if self._seats_version > since:
+            message["player_ids"] = list(self._seats)
+        return message
+
+
+class HandSnapshot:
+    """
+    The hand being played at a table, updated from its game-update messages: what a player joining (or rejoining)
+    the table needs to see the hand as the other players do, sent in a single message.
+    """
+
+    def __init__(self):
+        self._new_game: Optional[dict] = None
+        self._shared_cards: List[list] = []
+        self._pots: List[dict] = []
+        self._bets: Dict[str, int] = {}
+        self._folded_ids: List[str] = []
+        # Hole cards and score of every player
+        self._cards: Dict[str, dict] = {}
+        self._player_action: Optional[dict] = None
+        self._showdown: Optional[dict] = None
+        self._winner_pot: Optional[dict] = None
+
+    @property
+    def playing(self) -> bool:
+        return self._new_game is not None
+
+    def reset(self, new_game: Optional[dict] = None):
+        self._new_game = new_game
+        self._shared_cards = []
+        self._pots = []
+        self._bets = {}
+        self._folded_ids = []
+        self._cards = {}
+        self._player_action = None
+        self._showdown = None
+        self._winner_pot = None
+
+    def update(self, message: dict):
+        """Applies a game-update message."""
+        event = message["event"]
+        if event == "new-game":
+            self.reset(message)
+        elif not self.playing:
+            return
+        elif event == "game-over":
+            self.reset()
+        elif event == "cards-assignment":
+            self._cards[message["target"]] = {"cards": message["cards"], "score": message["score"]}
+        elif event == "shared-cards":
+            self._shared_cards = self._shared_cards + message["cards"]
+        elif event == "player-action":
+            self._player_action = message
+        elif event == "bet":
+            self._bets = message["bets"]
+            self._player_action = None
+        elif event in ("fold", "dead-player"):
+            self._folded_ids.append(message["player"]["id"])
+            self._player_action = None
+        elif event == "pots-update":
+            self._pots = message["pots"]
+            self._bets = {}
+        elif event == "showdown":
+            self._showdown = message["players"]
+        elif event == "winner-designation":
+            self._pots = message["pots"]
+            self._winner_pot = message["pot"]
+
+    def snapshot(self, player_id: str) -> Optional[dict]:
+        """The hand as seen by a player (with only their own hole cards), None between hands."""
+        if not self.playing:
+            return None
+        message = {
+            "message_type": "game-update",
+            "event": "hand-snapshot",
+            "new_game": self._new_game,
+            "shared_cards": self._shared_cards,
+            "pots": self._pots,
+            "bets": self._bets,
+            "folded_ids": list(self._folded_ids),
+            "player_action": self._player_action,
+            "showdown": self._showdown,
+            "winner_pot": self._winner_pot,
+        }
+        if player_id in self._cards:
+            message.update(self._cards[player_id])
+        return message
@@ -223,6 +223,43 @@ PyPoker = {
             $cards.slideUp(1000).slideDown(1000);
         },
 
+        assignCards: function (cards, score) {
+            $cards = $('#current-player .cards');
+            $cards.empty();
+            for (i = 0; i < PyPoker.Game.numCards; i++) {
+                $cards.append($('<div class="card large" data-key="' + i + '"></div>'));
+            }
+            $('.card', $cards).click(function () {
+                if (PyPoker.Player.cardsChangeMode) {
+                    $(this).toggleClass('selected');
+                }
+            });
+            PyPoker.Game.updateCurrentPlayerCards(cards, score);
+        },
+
+        restoreHand: function (message) {
+            // Current hand, sent when joining (or rejoining) a room
+            PyPoker.Game.newGame(message.new_game);
+            if (message.cards !== undefined) {
+                PyPoker.Game.assignCards(message.cards, message.score);
+            }
+            PyPoker.Game.addSharedCards(message.shared_cards);
+            PyPoker.Game.updatePots(message.pots);
+            PyPoker.Game.updatePlayersBet(message.bets);
+            for (k in message.folded_ids) {
+                PyPoker.Game.playerFold({id: message.folded_ids[k]});
+            }
+            if (message.showdown) {
+                PyPoker.Game.updatePlayersCards(message.showdown);
+            }
+            if (message.winner_pot) {
+                PyPoker.Game.setWinners(message.winner_pot);
+            }
+            if (message.player_action) {
+                PyPoker.Player.onPlayerAction(message.player_action);
+            }
+        },
+
         onGameUpdate: function (message) {
             PyPoker.Player.resetControls();
             PyPoker.Player.resetTimers();
@@ -232,17 +269,10 @@ PyPoker = {
                     PyPoker.Game.newGame(message);
                     break;
                 case 'cards-assignment':
-                    $cards = $('#current-player .cards');
-                    $cards.empty();
-                    for (i = 0; i < PyPoker.Game.numCards; i++) {
-                        $cards.append($('<div class="card large" data-key="' + i + '"></div>'));
-                    }
-                    $('.card', $cards).click(function () {
-                        if (PyPoker.Player.cardsChangeMode) {
-                            $(this).toggleClass('selected');
-                        }
-                    });
-                    PyPoker.Game.updateCurrentPlayerCards(message.cards, message.score);
+                    PyPoker.Game.assignCards(message.cards, message.score);
+                    break;
+                case 'hand-snapshot':
+                    PyPoker.Game.restoreHand(message);
                     break;
                 case 'game-over':
                     PyPoker.Game.gameOver();
@@ -256,7 +286,7 @@ PyPoker = {
                     PyPoker.Game.updatePlayersBet(message.bets);
                     break;
                 case 'pots-update':
-                    PyPoker.Game.updatePlayers(message.players);
+                    // Players are updated by the table-state message
                     PyPoker.Game.updatePots(message.pots);
                     PyPoker.Game.updatePlayersBet();  // Reset the bets
                     break;
@@ -273,7 +303,6 @@ PyPoker = {
                     PyPoker.Game.addSharedCards(message.cards);
                     break;
                 case 'winner-designation':
-                    PyPoker.Game.updatePlayers(message.players);
                     PyPoker.Game.updatePots(message.pots);
                     PyPoker.Game.setWinners(message.pot);
                     break;
@@ -287,7 +316,8 @@ PyPoker = {
         },
 
         updateRankingList: function (message) {
-            //message为有序的玩家数据元组列表 [(player_name, player_total_money, avg_profit), (player_name, player_total_money, avg_profit)]
+            //message为有序的玩家数据元组列表 [(player_name, player_total_money, avg_profit, daily_profit, stats), ...]
+            //stats为玩家统计数据 {vpip, pfr, af, wsd, net_per_100}，没有统计时为null
             const rankingTableBody = document.querySelector('#ranking-table tbody');
 
             // 清空当前表格内容
@@ -295,7 +325,7 @@ PyPoker = {
 
             // 遍历 message 数据，填充表格行
             message.forEach((player, index) => {
-                const [playerName, totalMoney, avgProfit, dailyProfit] = player;
+                const [playerName, totalMoney, avgProfit, dailyProfit, stats] = player;
 
                 // 创建表格行
                 const row = document.createElement('tr');
@@ -307,6 +337,9 @@ PyPoker = {
                     <td>$${totalMoney}</td> <!-- 总金额 -->
                     <td>${avgProfit.toFixed(2)}</td> <!-- 平均收益 -->
                     <td>${dailyProfit.toFixed(2)}</td> <!-- mei日 -->
+                    <td>${stats ? stats.vpip.toFixed(1) : '-'}</td> <!-- VPIP -->
+                    <td>${stats ? stats.pfr.toFixed(1) : '-'}</td> <!-- PFR -->
+                    <td>${stats && stats.af !== null ? stats.af.toFixed(2) : '-'}</td> <!-- AF -->
                 `;
 
                 // 添加行到表格
@@ -607,6 +640,58 @@ PyPoker = {
     Room: {
         roomId: null,
 
+        // Table state (seats and players), kept up to date by the table-state messages
+        state: {
+            version: null,
+            players: {},
+            player_ids: []
+        },
+
+        ackState: function (version) {
+            // version null asks for the whole state
+            PyPoker.socket.send(JSON.stringify({
+                'message_type': 'state-ack',
+                'version': version
+            }));
+        },
+
+        onTableState: function (message) {
+            state = PyPoker.Room.state;
+            if (message.full) {
+                state.players = message.players;
+                state.player_ids = message.player_ids;
+            } else if (state.version === null || message.base_version > state.version) {
+                // Changes made to a state we don't have
+                PyPoker.Room.ackState(null);
+                return;
+            } else if (message.version <= state.version) {
+                return;
+            } else {
+                for (playerId in message.players) {
+                    if (message.players[playerId] === null) {
+                        delete state.players[playerId];
+                    } else {
+                        state.players[playerId] = $.extend({}, state.players[playerId], message.players[playerId]);
+                    }
+                }
+                if (message.player_ids !== undefined) {
+                    state.player_ids = message.player_ids;
+                }
+            }
+            state.version = message.version;
+            PyPoker.Room.ackState(state.version);
+
+            if (PyPoker.Room.roomId == null) {
+                PyPoker.Room.initRoom(message);
+            } else {
+                for (playerId in message.players) {
+                    if (state.players[playerId] !== undefined) {
+                        PyPoker.Game.updatePlayer(state.players[playerId]);
+                    }
+                }
+            }
+        },
+
         createPlayer: function (player = undefined) {
             if (player === undefined) {
                 return $('<div class="player"><div class="player-info"></div></div>');
@@ -636,22 +721,24 @@ PyPoker = {
         destroyRoom: function () {
             PyPoker.Game.gameOver();
             PyPoker.Room.roomId = null;
+            PyPoker.Room.state = {version: null, players: {}, player_ids: []};
             $('#players').empty();
         },
 
         initRoom: function (message) {
             PyPoker.Room.roomId = message.room_id;
+            state = PyPoker.Room.state;
             // Initializing the room
             $('#players').empty();
-            for (k in message.player_ids) {
+            for (k in state.player_ids) {
                 $seat = $('<div class="seat"></div>');
                 $seat.attr('data-key', k);
 
-                playerId = message.player_ids[k];
+                playerId = state.player_ids[k];
 
                 if (playerId) {
                     // This seat is taken
-                    $seat.append(PyPoker.Room.createPlayer(message.players[playerId]));
+                    $seat.append(PyPoker.Room.createPlayer(state.players[playerId]));
                     $seat.attr('data-player-id', playerId);
                 } else {
                     $seat.append(PyPoker.Room.createPlayer());
@@ -667,15 +754,17 @@ PyPoker = {
                 PyPoker.Room.initRoom(message);
             }
 
+            // Seats and players come with the table-state message sent before
+            state = PyPoker.Room.state;
             switch (message.event) {
                 case 'player-added':
                     playerId = message.player_id;
-                    player = message.players[playerId]
+                    player = state.players[playerId]
                     playerName = playerId == $('#current-player').attr('data-player-id') ? 'You' : player.name;
                     // Go through every available seat, find the one where the new player should sat and seated him
                     $('.seat').each(function () {
                         seat = $(this).attr('data-key');
-                        if (message.player_ids[seat] == playerId) {
+                        if (state.player_ids[seat] == playerId) {
                             $(this).empty();
                             $(this).append(PyPoker.Room.createPlayer(player));
                             $(this).attr('data-player-id', playerId);
@@ -732,6 +821,9 @@ PyPoker = {
                 case 'disconnect':
                     PyPoker.onDisconnect(data);
                     break;
+                case 'table-state':
+                    PyPoker.Room.onTableState(data);
+                    break;
                 case 'room-update':
                     PyPoker.Room.onRoomUpdate(data);
                     break;
@@ -0,0 +1,275 @@
+"""
+Benchmarks of the score detector and of the game engine.
+
+    python -m test.benchmark                        # prints the results
+    python -m test.benchmark --save baseline.json   # writes the results to a baseline file
+    python -m test.benchmark --compare baseline.json [--tolerance 0.2]
+
+The comparison mode exits with status 1 when a benchmark is slower than the baseline by more than the tolerance
+(a fraction of the baseline throughput).
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from poker.card import Card
+from poker.hand_evaluator import get_hand_evaluator
+from poker.player import Player
+from poker.poker_game import GameBetRounder, GamePlayers, GamePots
+from poker.score_detector import HoldemPokerScore, HoldemPokerScoreDetector
+
+CATEGORIES = {
+    HoldemPokerScore.NO_PAIR: "high_card",
+    HoldemPokerScore.PAIR: "pair",
+    HoldemPokerScore.TWO_PAIR: "two_pair",
+    HoldemPokerScore.TRIPS: "trips",
+    HoldemPokerScore.STRAIGHT: "straight",
+    HoldemPokerScore.FLUSH: "flush",
+    HoldemPokerScore.FULL_HOUSE: "full_house",
+    HoldemPokerScore.QUADS: "quads",
+    HoldemPokerScore.STRAIGHT_FLUSH: "straight_flush",
+}
+
+
+class Benchmark:
+    """
+    A function timed over a number of iterations.
+    `setup` is called (untimed) before every iteration and its result is passed to `function`.
+    """
+
+    def __init__(self, name: str, function: Callable, setup: Optional[Callable] = None, iterations: int = 1000):
+        self.name: str = name
+        self.function: Callable = function
+        self.setup: Optional[Callable] = setup
+        self.iterations: int = iterations
+
+    def run(self, repeat: int = 3) -> Dict[str, float]:
+        # Best of `repeat` runs, to filter out the noise of other processes
+        best = None
+        for _ in range(repeat):
+            elapsed = 0.0
+            for _ in range(self.iterations):
+                args = self.setup() if self.setup else ()
+                start = time.perf_counter()
+                self.function(*args)
+                elapsed += time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return {
+            "iterations": self.iterations,
+            "seconds": best,
+            "ops_per_sec": self.iterations / best if best else float("inf"),
+        }
+
+
+def _create_players(money: List[float]) -> List[Player]:
+    return [Player("player-{}".format(i), "Player {}".format(i), m, 0, True) for i, m in enumerate(money)]
+
+
+def _category_hands(rand: random.Random, count: int) -> Dict[int, List[List[Card]]]:
+    """Random 7 card hands for every category."""
+    evaluator = get_hand_evaluator()
+    codes = [int(card) for card in Card.all_cards()]
+    hands = {category: [] for category in CATEGORIES}
+
+    for _ in range(count * 2000):
+        hand = rand.sample(codes, 7)
+        category_hands = hands[evaluator.evaluate(hand) >> 20]
+        if len(category_hands) < count:
+            category_hands.append([Card.from_code(code) for code in hand])
+        if all(len(category_hands) == count for category_hands in hands.values()):
+            break
+
+    # Straight flushes are too rare to be sampled
+    while len(hands[HoldemPokerScore.STRAIGHT_FLUSH]) < count:
+        top, suit = rand.randint(5, 14), rand.randint(0, 3)
+        cards = [Card(14 if rank == 1 else rank, suit) for rank in range(top - 4, top + 1)]
+        cards += rand.sample([card for card in Card.all_cards() if card not in cards], 2)
+        rand.shuffle(cards)
+        hands[HoldemPokerScore.STRAIGHT_FLUSH].append(cards)
+    return hands
+
+
+def score_benchmarks(rand: random.Random, hands_per_category: int = 500) -> List[Benchmark]:
+    detector = HoldemPokerScoreDetector()
+    detector.get_score(Card.all_cards()[0:7])  # Loading the tables before timing
+
+    def get_score(hand):
+        detector.get_score(hand)
+
+    return [
+        Benchmark(
+            "score.{}".format(CATEGORIES[category]),
+            get_score,
+            setup=lambda hands=itertools.cycle(hands): (next(hands),),
+            iterations=len(hands),
+        )
+        for category, hands in _category_hands(rand, hands_per_category).items()
+    ]
+
+
+def pots_benchmarks(rand: random.Random, iterations: int = 1000) -> List[Benchmark]:
+    def scenario(num_players):
+        # Uneven all-ins: every player bets a different amount, about a third of them folded
+        bets = [float(rand.randint(1, 100) * 10) for _ in range(num_players)]
+        # The player who bets the most must be active
+        bets[0] = max(bets)
+        folded = [i for i in range(1, num_players) if rand.random() < 0.3]
+        return bets, folded
+
+    def setup(scenarios):
+        bets, folded = next(scenarios)
+        players = _create_players([0.0] * len(bets))
+        game_players = GamePlayers(players)
+        for i in folded:
+            game_players.fold(players[i].id)
+        return GamePots(game_players), {player.id: bet for player, bet in zip(players, bets)}
+
+    def add_bets(pots, bets):
+        pots.add_bets(bets)
+
+    return [
+        Benchmark(
+            "pots.add_bets.{}_players".format(num_players),
+            add_bets,
+            setup=lambda scenarios=itertools.cycle([scenario(num_players) for _ in range(iterations)]):
+                setup(scenarios),
+            iterations=iterations,
+        )
+        for num_players in range(2, 11)
+    ]
+
+
+def bet_round_benchmarks(rand: random.Random, iterations: int = 500) -> List[Benchmark]:
+    def scenario(num_players):
+        money = [float(rand.randint(50, 200) * 10) for _ in range(num_players)]
+        # Scripted bettors: raise, call, check or fold with fixed odds
+        script = [[rand.random() for _ in range(20)] for _ in range(num_players)]
+        return money, script
+
+    def setup(scenarios):
+        money, script = next(scenarios)
+        players = _create_players(money)
+        script = {player.id: list(choices) for player, choices in zip(players, script)}
+        return GameBetRounder(GamePlayers(players)), players[-1].id, script
+
+    def bet_round(bet_rounder, dealer_id, script):
+        def get_bet(player, min_bet, max_bet, bets):
+            choice = script[player.id].pop() if script[player.id] else 0.5
+            if choice < 0.15 and min_bet > 0:
+                return -1
+            if choice > 0.85:
+                return min(max_bet, min_bet + 20.0)
+            return min_bet
+
+        bet_rounder.bet_round(dealer_id, {}, get_bet)
+
+    return [
+        Benchmark(
+            "bet_rounder.bet_round.{}_players".format(num_players),
+            bet_round,
+            setup=lambda scenarios=itertools.cycle([scenario(num_players) for _ in range(iterations)]):
+                setup(scenarios),
+            iterations=iterations,
+        )
+        for num_players in (2, 6, 10)
+    ]
+
+
+def players_round_benchmarks(rand: random.Random, iterations: int = 5000) -> List[Benchmark]:
+    def create_game_players(num_players):
+        players = _create_players([1000.0] * num_players)
+        game_players = GamePlayers(players)
+        for player in players:
+            if rand.random() < 0.3:
+                game_players.fold(player.id)
+        return game_players, rand.choice(players).id
+
+    def players_round(game_players, dealer_id):
+        for _ in game_players.round(dealer_id):
+            pass
+
+    # round() doesn't change the players, so they are created once
+    return [
+        Benchmark(
+            "players.round.{}_players".format(num_players),
+            players_round,
+            setup=lambda games=itertools.cycle([create_game_players(num_players) for _ in range(100)]): next(games),
+            iterations=iterations,
+        )
+        for num_players in (2, 6, 10)
+    ]
+
+
+def all_benchmarks(seed: int = 0, scale: float = 1.0) -> List[Benchmark]:
+    rand = random.Random(seed)
+    benchmarks = score_benchmarks(rand, max(1, int(500 * scale))) \
+        + pots_benchmarks(rand, max(1, int(1000 * scale))) \
+        + bet_round_benchmarks(rand, max(1, int(500 * scale))) \
+        + players_round_benchmarks(rand, max(1, int(5000 * scale)))
+    return benchmarks
+
+
+def run_benchmarks(benchmarks: List[Benchmark], repeat: int = 3, pattern: Optional[str] = None) -> dict:
+    results = {}
+    for benchmark in benchmarks:
+        if pattern is None or pattern in benchmark.name:
+            results[benchmark.name] = benchmark.run(repeat)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "benchmarks": results,
+    }
+
+
+def compare_results(baseline: dict, results: dict, tolerance: float = 0.2) -> List[Tuple[str, float, float]]:
+    """Returns the name, baseline and current throughput of the benchmarks slower than the baseline."""
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        try:
+            expected = baseline["benchmarks"][name]["ops_per_sec"]
+        except KeyError:
+            continue
+        if result["ops_per_sec"] < expected * (1.0 - tolerance):
+            regressions.append((name, expected, result["ops_per_sec"]))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Score detector and game engine benchmarks")
+    parser.add_argument("--save", metavar="FILE", help="write the results to a JSON baseline file")
+    parser.add_argument("--compare", metavar="FILE", help="compare the results with a JSON baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="accepted slowdown (default: 0.2)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every benchmark, the best is kept")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier of the number of iterations")
+    parser.add_argument("--filter", metavar="PATTERN", help="only run benchmarks whose name contains PATTERN")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(all_benchmarks(args.seed, args.scale), args.repeat, args.filter)
+
+    for name, result in results["benchmarks"].items():
+        print("{:<40} {:>14,.0f} ops/s".format(name, result["ops_per_sec"]))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.tolerance)
+        for name, expected, actual in regressions:
+            print("REGRESSION {}: {:,.0f} ops/s (baseline {:,.0f} ops/s)".format(name, actual, expected))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
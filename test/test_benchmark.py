@@ -0,0 +1,25 @@
+import unittest
+
+from test.benchmark import all_benchmarks, compare_results, run_benchmarks
+
+
+class BenchmarkTests(unittest.TestCase):
+    def test_run_benchmarks(self):
+        results = run_benchmarks(all_benchmarks(scale=0.01), repeat=1)
+        names = list(results["benchmarks"].keys())
+        self.assertIn("score.straight_flush", names)
+        self.assertIn("pots.add_bets.10_players", names)
+        self.assertIn("bet_rounder.bet_round.6_players", names)
+        self.assertIn("players.round.2_players", names)
+        for result in results["benchmarks"].values():
+            self.assertGreater(result["ops_per_sec"], 0)
+
+    def test_compare_results(self):
+        baseline = {"benchmarks": {"a": {"ops_per_sec": 100.0}, "b": {"ops_per_sec": 100.0}}}
+        results = {"benchmarks": {"a": {"ops_per_sec": 85.0}, "b": {"ops_per_sec": 75.0}, "c": {"ops_per_sec": 1.0}}}
+        self.assertEqual([("b", 100.0, 75.0)], compare_results(baseline, results, tolerance=0.2))
+        self.assertEqual([], compare_results(baseline, results, tolerance=0.3))
+
+
+if __name__ == '__main__':
+    unittest.main()
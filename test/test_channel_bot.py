@@ -0,0 +1,93 @@
+import logging
+import random
+import time
+import unittest
+from unittest import mock
+
+import gevent
+
+from poker.channel import ChannelError, MessageTimeout
+from poker.channel_bot import ChannelBot, create_bot, fixed_think_time
+from poker.game_room import GameRoomFactory
+from poker.game_server import GameServer
+from poker.poker_game import GameSubscriber
+from poker.poker_game_holdem import HoldemPokerGame, HoldemPokerGameFactory
+from poker.simulation import RandomStrategy
+
+
+class ChannelBotTests(unittest.TestCase):
+    def _bet_request(self, player_id):
+        return {
+            "message_type": "game-update",
+            "event": "player-action",
+            "action": "bet",
+            "player": {"id": player_id, "name": player_id, "money": 1000.0, "loan": 0},
+            "min_bet": 10.0,
+            "max_bet": 1000.0,
+            "bets": {},
+        }
+
+    def test_ping(self):
+        channel = ChannelBot("bot-1")
+        channel.send_message({"message_type": "ping"})
+        self.assertEqual({"message_type": "pong"}, channel.recv_message(time.time() + 1))
+        channel.send_message({"message_type": "ping-state"})
+        self.assertEqual({"message_type": "ready-state-change", "ready": True}, channel.recv_message(time.time() + 1))
+
+    def test_bet(self):
+        channel = ChannelBot("bot-1", think_time=fixed_think_time(0.05))
+        channel.send_message(self._bet_request("bot-2"))
+        channel.send_message(self._bet_request("bot-1"))
+        self.assertRaises(MessageTimeout, channel.recv_message, time.time() + 0.01)
+        self.assertEqual({"message_type": "bet", "bet": 10.0}, channel.recv_message(time.time() + 1))
+        self.assertRaises(MessageTimeout, channel.recv_message, time.time() + 0.1)
+
+    def test_closed(self):
+        channel = ChannelBot("bot-1")
+        channel.close()
+        channel.send_message({"message_type": "ping"})
+        self.assertRaises(ChannelError, channel.recv_message)
+
+    def test_close_while_receiving(self):
+        channel = ChannelBot("bot-1")
+        gevent.spawn_later(0.01, channel.close)
+        self.assertRaises(ChannelError, channel.recv_message, time.time() + 1)
+
+
+class BotGameServerTests(unittest.TestCase):
+    class GameOverCounter(GameSubscriber):
+        def __init__(self):
+            self.hands = 0
+
+        def game_event(self, event, event_data):
+            if event == "game-over":
+                self.hands += 1
+
+    def test_bots_play(self):
+        counter = BotGameServerTests.GameOverCounter()
+        server = GameServer(
+            GameRoomFactory(
+                room_size=3,
+                game_factory=HoldemPokerGameFactory(10.0, 5.0, logging.getLogger(), [counter], persistent=False)
+            ),
+            logger=mock.Mock()
+        )
+        rand = random.Random(0)
+        bots = [create_bot(strategy=RandomStrategy(rand), logger=mock.Mock()) for _ in range(6)]
+
+        waits = {name: 0 for name in dir(HoldemPokerGame) if name.startswith("WAIT_")}
+        with mock.patch.multiple(HoldemPokerGame, **waits):
+            rooms = server.add_bots(bots)
+            self.assertEqual(2, len(rooms))
+            gevent.sleep(0.5)
+            self.assertGreater(counter.hands, 0)
+
+            # Disconnected bots are removed from the rooms, which stop
+            for bot in bots:
+                bot.channel.close()
+            gevent.sleep(0.1)
+            self.assertFalse(any(room.active for room in rooms))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import json
+import unittest
+
+try:
+    from poker.channel_websocket import ChannelWebSocket
+except ImportError:
+    ChannelWebSocket = None
+from poker.channel import ChannelError, encode_message
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.closed = False
+        self.frames = []
+
+    def send(self, message, binary=None):
+        self.frames.append((message, binary))
+
+    def close(self):
+        self.closed = True
+
+
+@unittest.skipIf(ChannelWebSocket is None, "gevent-websocket is not installed")
+class ChannelWebSocketTest(unittest.TestCase):
+    def test_send_message(self):
+        ws = FakeWebSocket()
+        ChannelWebSocket(ws).send_message({"message_type": "ping", "name": "Amélie"})
+        self.assertListEqual([('{"message_type": "ping", "name": "Am\\u00e9lie"}', False)], ws.frames)
+        self.assertDictEqual({"message_type": "ping", "name": "Amélie"}, json.loads(ws.frames[0][0]))
+
+    def test_send_encoded(self):
+        ws = FakeWebSocket()
+        ChannelWebSocket(ws).send_encoded(encode_message({"message_type": "ping"}))
+        message, binary = ws.frames[0]
+        self.assertIsInstance(message, str)
+        self.assertEqual('{"message_type": "ping"}', message)
+        self.assertFalse(binary)
+
+    def test_broadcast_not_decoded_per_player(self):
+        data = encode_message({"message_type": "ping"})
+        frames = []
+        for _ in range(3):
+            ws = FakeWebSocket()
+            ChannelWebSocket(ws).send_encoded(data)
+            frames.append(ws.frames[0][0])
+        for frame in frames:
+            self.assertIs(data.text, frame)
+
+    def test_send_closed(self):
+        ws = FakeWebSocket()
+        ws.close()
+        self.assertRaises(ChannelError, ChannelWebSocket(ws).send_message, {"message_type": "ping"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import random
+import unittest
+
+from poker.card import Card
+from poker.deck import Deck, CompactDeck, DeckFactory
+
+
+class CompactDeckTests(unittest.TestCase):
+    def test_pop_all_cards(self):
+        deck = CompactDeck(2, rand=random.Random(0))
+        cards = deck.pop_cards(52)
+        self.assertEqual(0, len(deck))
+        self.assertEqual(set(Card.all_cards()), set(cards))
+        self.assertRaises(IndexError, deck.pop_cards)
+
+    def test_lowest_rank(self):
+        deck = CompactDeck(7, rand=random.Random(0))
+        self.assertEqual(32, len(deck))
+        self.assertTrue(all(card.rank >= 7 for card in deck.pop_cards(32)))
+
+    def test_seeded_decks(self):
+        deck1 = CompactDeck(2, rand=random.Random(1))
+        deck2 = CompactDeck(2, rand=random.Random(1))
+        self.assertListEqual(deck1.pop_cards(9), deck2.pop_cards(9))
+        self.assertListEqual(deck1.pop_cards(3), deck2.pop_cards(3))
+
+    def test_discard(self):
+        deck = CompactDeck(2, rand=random.Random(0))
+        cards = deck.pop_cards(50)
+        deck.push_cards(cards[0:10])
+        # 2 cards left in the deck then 3 from the discard
+        new_cards = deck.pop_cards(5)
+        self.assertEqual(5, len(set(new_cards)))
+        self.assertEqual(3, len(set(new_cards) & set(cards[0:10])))
+        self.assertEqual(7, len(deck))
+
+    def test_uniform_draw(self):
+        rand = random.Random(0)
+        counts = {}
+        for _ in range(5200):
+            card = CompactDeck(2, rand=rand).pop_cards(1)[0]
+            counts[card] = counts.get(card, 0) + 1
+        self.assertEqual(52, len(counts))
+        self.assertTrue(all(50 <= count <= 160 for count in counts.values()))
+
+
+class DeckFactoryTests(unittest.TestCase):
+    def test_create_deck(self):
+        self.assertIsInstance(DeckFactory(2).create_deck(), Deck)
+        self.assertIsInstance(DeckFactory(2, CompactDeck).create_deck(), CompactDeck)
+
+    def test_seeded_factory(self):
+        for deck_type in (Deck, CompactDeck):
+            deck1 = DeckFactory(2, deck_type, random.Random(5)).create_deck()
+            deck2 = DeckFactory(2, deck_type, random.Random(5)).create_deck()
+            self.assertListEqual(deck1.pop_cards(52), deck2.pop_cards(52))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from poker.card import Card
+from poker.equity import EquityCalculator
+
+
+class EquityCalculatorTest(unittest.TestCase):
+    def test_river(self):
+        # Only one board left: player 1 wins with a pair of aces
+        with EquityCalculator(processes=1) as calculator:
+            result = calculator.calculate(
+                [[Card(14, 0), Card(3, 1)], [Card(13, 2), Card(4, 3)]],
+                board=[Card(14, 2), Card(9, 1), Card(7, 0), Card(5, 3), Card(2, 2)]
+            )
+        self.assertTrue(result.exact)
+        self.assertEqual(1, result.boards)
+        self.assertEqual(100.0, result.win(0))
+        self.assertEqual(0.0, result.win(1))
+
+    def test_tie(self):
+        # Royal flush on the board
+        with EquityCalculator(processes=1) as calculator:
+            result = calculator.calculate(
+                [[Card(2, 0), Card(3, 1)], [Card(2, 2), Card(4, 3)], [Card(5, 0), Card(7, 1)]],
+                board=[Card(14, 3), Card(13, 3), Card(12, 3), Card(11, 3), Card(10, 3)]
+            )
+        for player in range(3):
+            self.assertEqual(0.0, result.win(player))
+            self.assertEqual(100.0, result.tie(player))
+            self.assertAlmostEqual(100.0 / 3, result.equity(player))
+
+    def test_turn_enumeration(self):
+        # 44 rivers left, player 2 needs one of the 2 remaining queens
+        players_cards = [[Card(14, 0), Card(14, 1)], [Card(12, 2), Card(12, 3)]]
+        board = [Card(14, 2), Card(12, 0), Card(7, 0), Card(2, 1)]
+        with EquityCalculator(processes=1) as calculator:
+            result = calculator.calculate(players_cards, board=board)
+        self.assertTrue(result.exact)
+        self.assertEqual(44, result.boards)
+        self.assertAlmostEqual(100.0 * 1 / 44, result.win(1))
+
+    def test_dead_cards(self):
+        players_cards = [[Card(14, 0), Card(14, 1)], [Card(12, 2), Card(12, 3)]]
+        board = [Card(14, 2), Card(12, 0), Card(7, 0), Card(2, 1)]
+        with EquityCalculator(processes=1) as calculator:
+            result = calculator.calculate(players_cards, board=board, dead_cards=[Card(12, 1)])
+        self.assertEqual(43, result.boards)
+        self.assertEqual(0.0, result.win(1))
+
+    def test_monte_carlo(self):
+        players_cards = [[Card(14, 0), Card(14, 1)], [Card(13, 2), Card(13, 3)]]
+        with EquityCalculator(processes=1, exact_limit=0, max_samples=20000, seed=1) as calculator:
+            result = calculator.calculate(players_cards)
+        self.assertFalse(result.exact)
+        self.assertEqual(20000, result.boards)
+        # AA vs KK is about 82% vs 18%
+        self.assertAlmostEqual(82.0, result.equity(0), delta=2.0)
+        self.assertAlmostEqual(100.0, result.equity(0) + result.equity(1))
+
+    def test_process_pool(self):
+        players_cards = [[Card(14, 0), Card(13, 0)], [Card(9, 2), Card(9, 3)], [Card(5, 1), Card(6, 1)]]
+        board = [Card(2, 0), Card(7, 1), Card(9, 0)]
+        with EquityCalculator(processes=1) as calculator:
+            expected = calculator.calculate(players_cards, board=board)
+        with EquityCalculator(processes=2) as calculator:
+            result = calculator.calculate(players_cards, board=board)
+        self.assertEqual(expected.boards, result.boards)
+        for player in range(3):
+            self.assertEqual(expected.win(player), result.win(player))
+            self.assertEqual(expected.tie(player), result.tie(player))
+            self.assertAlmostEqual(expected.equity(player), result.equity(player))
+
+    def test_invalid_hands(self):
+        calculator = EquityCalculator(processes=1)
+        self.assertRaises(ValueError, calculator.calculate, [[Card(14, 0), Card(14, 1)]])
+        self.assertRaises(ValueError, calculator.calculate, [[Card(14, 0), Card(14, 1)], [Card(14, 0), Card(13, 1)]])
+        self.assertRaises(ValueError, calculator.calculate, [[Card(14, 0)], [Card(13, 0), Card(13, 1)]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import logging
+import time
+import unittest
+
+import gevent
+
+from poker.event_bus import GameEventBus, OverflowPolicy
+from poker.poker_game import GameSubscriber
+
+
+class RecordingSubscriber(GameSubscriber):
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.events = []
+
+    def game_event(self, event, event_data):
+        if self.delay:
+            gevent.sleep(self.delay)
+        if event == "error":
+            raise RuntimeError("Subscriber error")
+        self.events.append((event, event_data["n"]))
+
+
+class GameEventBusTests(unittest.TestCase):
+    def _publish(self, bus, count, start=0):
+        for n in range(start, start + count):
+            bus.publish("bet", {"n": n})
+
+    def test_ordered_delivery(self):
+        bus = GameEventBus(logging.getLogger())
+        subscribers = [RecordingSubscriber(), RecordingSubscriber(0.001)]
+        for subscriber in subscribers:
+            bus.subscribe(subscriber)
+        self._publish(bus, 50)
+        bus.close()
+        for subscriber in subscribers:
+            self.assertListEqual([("bet", n) for n in range(50)], subscriber.events)
+
+    def test_publish_does_not_wait_for_subscribers(self):
+        bus = GameEventBus(logging.getLogger())
+        slow = RecordingSubscriber(0.05)
+        fast = RecordingSubscriber()
+        bus.subscribe(slow)
+        bus.subscribe(fast)
+        start = time.time()
+        self._publish(bus, 20)
+        self.assertLess(time.time() - start, 0.05)
+        gevent.sleep(0.01)
+        self.assertEqual(20, len(fast.events))
+        self.assertLess(len(slow.events), 20)
+        self.assertGreater(bus.metrics()[str(slow)]["depth"], 0)
+        bus.unsubscribe(slow)
+        self.assertEqual(20, len(slow.events))
+        self.assertListEqual([fast], bus.subscribers)
+
+    def test_drop_oldest(self):
+        bus = GameEventBus(logging.getLogger())
+        subscriber = RecordingSubscriber()
+        bus.subscribe(subscriber, queue_size=5, overflow=OverflowPolicy.DROP_OLDEST)
+        self._publish(bus, 8)
+        metrics = bus.metrics()[str(subscriber)]
+        self.assertEqual(5, metrics["max_depth"])
+        self.assertEqual(3, metrics["dropped"])
+        bus.close()
+        self.assertListEqual([("bet", n) for n in range(3, 8)], subscriber.events)
+
+    def test_drop_newest(self):
+        bus = GameEventBus(logging.getLogger())
+        subscriber = RecordingSubscriber()
+        bus.subscribe(subscriber, queue_size=5, overflow=OverflowPolicy.DROP_NEWEST)
+        self._publish(bus, 8)
+        bus.close()
+        self.assertListEqual([("bet", n) for n in range(5)], subscriber.events)
+
+    def test_unsubscribe_on_overflow(self):
+        bus = GameEventBus(logging.getLogger())
+        subscriber = RecordingSubscriber()
+        bus.subscribe(subscriber, queue_size=5, overflow=OverflowPolicy.UNSUBSCRIBE)
+        self._publish(bus, 8)
+        self.assertListEqual([], bus.subscribers)
+        gevent.sleep(0.01)
+        self._publish(bus, 2, start=8)
+        self.assertListEqual([], subscriber.events)
+
+    def test_unknown_overflow_policy(self):
+        bus = GameEventBus(logging.getLogger())
+        self.assertRaises(ValueError, bus.subscribe, RecordingSubscriber(), overflow="ignore")
+
+    def test_subscriber_errors(self):
+        bus = GameEventBus(logging.getLogger())
+        subscriber = RecordingSubscriber()
+        bus.subscribe(subscriber)
+        bus.publish("bet", {"n": 0})
+        bus.publish("error", {"n": 1})
+        bus.publish("bet", {"n": 2})
+        gevent.sleep(0.01)
+        metrics = bus.metrics()[str(subscriber)]
+        self.assertEqual(1, metrics["errors"])
+        self.assertEqual(2, metrics["delivered"])
+        self.assertListEqual([("bet", 0), ("bet", 2)], subscriber.events)
+        bus.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import random
 import unittest
 
 from poker.card import Card
@@ -108,6 +109,65 @@ class GamePlayersTest(unittest.TestCase):
         game_players.reset()
         self.assertTrue(game_players.is_active("player-2"))
 
+    def test_reset_keeps_dead_players(self):
+        game_players = self._create_game_players()
+        game_players.fold("player-2")
+        game_players.remove("player-3")
+        game_players.reset()
+        self.assertEqual(["player-1", "player-2", "player-4"], [player.id for player in game_players.active])
+        self.assertEqual(["player-4", "player-1", "player-2"], [player.id for player in game_players.round("player-3")])
+        self.assertEqual("player-4", game_players.get_next("player-2").id)
+
+    def test_round_reverse(self):
+        game_players = self._create_game_players()
+        game_players.fold("player-4")
+        self.assertEqual(["player-3", "player-2", "player-1"],
+                         [player.id for player in game_players.round("player-2", reverse=True)])
+
+    def test_round_with_fold_during_round(self):
+        game_players = self._create_game_players()
+        round_ids = []
+        for player in game_players.round("player-2"):
+            round_ids.append(player.id)
+            if player.id == "player-3":
+                game_players.fold("player-4")
+        self.assertEqual(["player-3", "player-1", "player-2"], round_ids)
+
+    def test_random_folds_and_removes(self):
+        # 与逐个座位遍历的实现比较
+        rand = random.Random(0)
+        for _ in range(200):
+            num_players = rand.randint(2, 10)
+            players = [Player("player-{}".format(i), "Player", 1000.0, 0, True) for i in range(num_players)]
+            player_ids = [player.id for player in players]
+            game_players = GamePlayers(players)
+            folder_ids, dead_ids = set(), set()
+            for _ in range(20):
+                player_id = rand.choice(player_ids)
+                action = rand.random()
+                if action < 0.5:
+                    game_players.fold(player_id)
+                    folder_ids.add(player_id)
+                elif action < 0.7:
+                    game_players.remove(player_id)
+                    folder_ids.add(player_id)
+                    dead_ids.add(player_id)
+                elif action < 0.8:
+                    game_players.reset()
+                    folder_ids = set(dead_ids)
+
+                start = player_ids.index(player_id) + 1
+                expected = [player_ids[(start + i) % num_players] for i in range(num_players)]
+                expected = [expected_id for expected_id in expected if expected_id not in folder_ids]
+                self.assertEqual(expected, [player.id for player in game_players.round(player_id)])
+                self.assertEqual(len(expected), game_players.count_active())
+                self.assertEqual([i for i in player_ids if i not in folder_ids],
+                                 [player.id for player in game_players.active])
+                if player_id not in folder_ids:
+                    next_ids = [expected_id for expected_id in expected if expected_id != player_id]
+                    next_player = game_players.get_next(player_id)
+                    self.assertEqual(next_ids[0] if next_ids else None, next_player.id if next_player else None)
+
     def test_reset_with_remove(self):
         game_players = self._create_game_players()
         game_players.remove("player-2")
@@ -236,6 +296,57 @@ class GamePotsTest(unittest.TestCase):
         game_players.fold("player-4")
         self.assertRaises(ValueError, game_pots.add_bets, {"player-3": 200.0, "player-4": 400.0})
 
+    @staticmethod
+    def _rebuild_pots(game_players, total_bets):
+        # 原来的实现：每次根据累计下注重建所有奖金池
+        bets = {player.id: total_bets[player.id] for player in game_players.all}
+        players = sorted(game_players.all, key=lambda player: bets[player.id])
+        pots = []
+        spare_money = 0.0
+        for i, player in enumerate(players):
+            if not game_players.is_active(player.id):
+                spare_money += bets[player.id]
+                bets[player.id] = 0.0
+            elif bets[player.id] > 0.0:
+                pot_bet = bets[player.id]
+                money, pot_players = spare_money, []
+                spare_money = 0.0
+                for j in range(i, len(players)):
+                    if game_players.is_active(players[j].id):
+                        pot_players.append(players[j].id)
+                    money += pot_bet
+                    bets[players[j].id] -= pot_bet
+                pots.append((money, pot_players))
+        if spare_money:
+            raise ValueError("Invalid bets")
+        return pots
+
+    def test_add_bets_random_rounds(self):
+        # 与每次重建奖金池的实现比较
+        rand = random.Random(0)
+        for _ in range(500):
+            players = [Player("player-{}".format(i), "Player", 1000, 0, True) for i in range(rand.randint(2, 10))]
+            game_players = GamePlayers(players)
+            game_pots = GamePots(game_players)
+            total_bets = {player.id: 0.0 for player in players}
+            for _ in range(rand.randint(1, 4)):
+                bets = {}
+                for player in game_players.active:
+                    bets[player.id] = float(rand.choice([0, 0, 5, 10, 20, 50, 100]))
+                    total_bets[player.id] += bets[player.id]
+                    action = rand.random()
+                    if action < 0.2:
+                        game_players.fold(player.id)
+                    elif action < 0.25:
+                        game_players.remove(player.id)
+                try:
+                    expected = self._rebuild_pots(game_players, total_bets)
+                except ValueError:
+                    self.assertRaises(ValueError, game_pots.add_bets, bets)
+                    break
+                game_pots.add_bets(bets)
+                self.assertEqual(expected, [(pot.money, [player.id for player in pot.players]) for pot in game_pots])
+
 
 class GameScoresTest(unittest.TestCase):
     class ScoreMock:
@@ -293,6 +404,59 @@ class GameScoresTest(unittest.TestCase):
         self.assertEquals(123, scores.player_score("player-1").category)
         self.assertListEqual(["5", "4", "3", "2", "1"], scores.player_score("player-1").cards)
 
+    def test_player_score_cache(self):
+        scores = GameScores(self.ScoreDetectorMock())
+        scores.assign_cards("player-1", ["1", "2"])
+        scores.add_shared_cards(["3", "4", "5"])
+        score = scores.player_score("player-1")
+        self.assertIs(score, scores.player_score("player-1"))
+        self.assertEqual((1, 1), (scores.cache_hits, scores.cache_misses))
+
+        scores.add_shared_cards(["6"])
+        self.assertListEqual(["6", "5", "4", "3", "2", "1"], scores.player_score("player-1").cards)
+        self.assertEqual((1, 2), (scores.cache_hits, scores.cache_misses))
+
+        scores.assign_cards("player-1", ["7", "8"])
+        self.assertListEqual(["8", "7", "6", "5", "4", "3"], scores.player_score("player-1").cards)
+        self.assertEqual((1, 3), (scores.cache_hits, scores.cache_misses))
+
+    def test_showdown_with_side_pots_scores_each_hand_once(self):
+        players = [Player("player-{}".format(i), "Player {}".format(i), 100.0 * (i + 1), 0, True) for i in range(10)]
+        game_players = GamePlayers(players)
+        game_pots = GamePots(game_players)
+        game_pots.add_bets({player.id: player.money for player in players})
+        self.assertEqual(10, len(game_pots))
+
+        scores = GameScores(HoldemPokerScoreDetector())
+        scores.add_shared_cards([Card(6, 3), Card(14, 0), Card(8, 3), Card(9, 2), Card(4, 0)])
+        for i, player in enumerate(players):
+            scores.assign_cards(player.id, [Card(2 + i, 1), Card(3 + i, 2)])
+
+        winners_detector = GameWinnersDetector(game_players)
+        for pot in game_pots:
+            winners_detector.get_winners(pot.players, scores)
+        for player in players:
+            scores.player_score(player.id)
+
+        self.assertEqual(10, scores.cache_misses)
+
+    def test_incremental_board_scores(self):
+        detector = HoldemPokerScoreDetector()
+        rand = random.Random(0)
+        for _ in range(200):
+            deck = [Card(rank, suit) for rank in range(2, 15) for suit in range(4)]
+            rand.shuffle(deck)
+            scores = GameScores(detector)
+            players_cards = {"player-{}".format(i): [deck.pop(), deck.pop()] for i in range(6)}
+            for player_id, cards in players_cards.items():
+                scores.assign_cards(player_id, cards)
+            for street in (3, 1, 1):
+                scores.add_shared_cards([deck.pop() for _ in range(street)])
+                for player_id, cards in players_cards.items():
+                    expected = detector.get_score(cards + scores.shared_cards)
+                    self.assertEqual(expected.dto(), scores.player_score(player_id).dto())
+                    self.assertEqual(expected.strength, scores.player_score(player_id).strength)
+
 
 class GameWinnersDetectorTest(unittest.TestCase):
     def test_get_winners(self):
@@ -352,6 +516,46 @@ class GameWinnersDetectorTest(unittest.TestCase):
         winners = winner_detector.get_winners([player1, player2, player3, player4], GameScoresMock())
         self.assertListEqual([], winners)
 
+    def test_get_pots_winners_odd_chips(self):
+        player1 = Player("player-1", "Player One", 0.0, 0, True)
+        player2 = Player("player-2", "Player Two", 0.0, 0, True)
+        player3 = Player("player-3", "Player Three", 0.0, 0, True)
+        player4 = Player("player-4", "Player Four", 0.0, 0, True)
+
+        game_players = GamePlayers([player1, player2, player3, player4])
+        game_pots = GamePots(game_players)
+        game_pots.add_bets({"player-1": 25.0, "player-2": 25.0, "player-3": 25.0, "player-4": 25.0})
+
+        class ScoreMock:
+            def __init__(self, value):
+                self.value = value
+
+            def cmp(self, other):
+                return (self.value > other.value) - (self.value < other.value)
+
+        class GameScoresMock:
+            def player_score(self, player_id):
+                return ScoreMock(1 if player_id == "player-3" else 2)
+
+        winner_detector = GameWinnersDetector(game_players)
+
+        # 100 split among 3 winners: 33 each, the odd chip goes to the first winner left of the dealer
+        pot_winners, = winner_detector.get_pots_winners(game_pots, GameScoresMock(), "player-1")
+        self.assertListEqual([player2, player4, player1], pot_winners.winners)
+        self.assertEqual(33, pot_winners.money_split)
+        self.assertDictEqual({"player-2": 34, "player-4": 33, "player-1": 33}, pot_winners.prizes)
+
+        pot_winners, = winner_detector.get_pots_winners(game_pots, GameScoresMock(), "player-2")
+        self.assertListEqual([player4, player1, player2], pot_winners.winners)
+        self.assertDictEqual({"player-4": 34, "player-1": 33, "player-2": 33}, pot_winners.prizes)
+
+        game_players.fold("player-1")
+        game_players.fold("player-2")
+        game_players.fold("player-3")
+        game_players.fold("player-4")
+        pot_winners, = winner_detector.get_pots_winners(game_pots, GameScoresMock(), "player-1")
+        self.assertListEqual([], pot_winners.winners)
+
 
 class GameHoldemWinnerDetectorIntegrationTest(unittest.TestCase):
     def test_get_winners(self):
@@ -406,6 +610,44 @@ class GameHoldemWinnerDetectorIntegrationTest(unittest.TestCase):
         winners = winner_detector.get_winners(game_pots[3].players, game_scores)
         self.assertListEqual([player3], winners)
 
+    def test_get_pots_winners(self):
+        player1 = Player("player-1", "Player One", 800.0, 0, True)
+        player2 = Player("player-2", "Player Two", 600.0, 0, True)
+        player3 = Player("player-3", "Player Three", 1200.0, 0, True)
+        player4 = Player("player-4", "Player Four", 900.0, 0, True)
+        player5 = Player("player-5", "Player Five", 3000.0, 0, True)
+
+        game_players = GamePlayers([player1, player2, player3, player4, player5])
+
+        game_scores = GameScores(HoldemPokerScoreDetector())
+        game_scores.add_shared_cards([Card(6, 3), Card(14, 0), Card(8, 3), Card(9, 2), Card(4, 0)])
+        game_scores.assign_cards("player-1", [Card(14, 1), Card(6, 2)])
+        game_scores.assign_cards("player-2", [Card(14, 2), Card(8, 0)])
+        game_scores.assign_cards("player-3", [Card(4, 1), Card(3, 2)])
+        game_scores.assign_cards("player-4", [Card(3, 1), Card(4, 2)])
+        game_scores.assign_cards("player-5", [Card(13, 1), Card(4, 3)])
+
+        game_pots = GamePots(game_players)
+        game_players.fold("player-5")
+        game_pots.add_bets({
+            "player-1": 800.0,
+            "player-2": 600.0,
+            "player-3": 1200.0,
+            "player-4": 900.0,
+            "player-5": 900.0
+        })
+
+        winner_detector = GameWinnersDetector(game_players)
+        pots_winners = winner_detector.get_pots_winners(game_pots, game_scores, "player-5")
+
+        for pot, pot_winners in zip(game_pots, pots_winners):
+            self.assertIs(pot, pot_winners.pot)
+            self.assertCountEqual(winner_detector.get_winners(pot.players, game_scores), pot_winners.winners)
+        # Tied winners are listed in seat order from the left of the dealer
+        self.assertListEqual([[player2], [player1], [player3, player4], [player3]],
+                             [pot_winners.winners for pot_winners in pots_winners])
+        self.assertListEqual([3000, 800, 150, 300], [pot_winners.money_split for pot_winners in pots_winners])
+
 
 class GameBetRounderTest(unittest.TestCase):
     def test_bet_round_everyone_fold(self):
@@ -933,6 +1175,35 @@ class GameBetRounderTest(unittest.TestCase):
 
         bet_rounder.bet_round("player-2", bets, bet_function_mock)
 
+    def test_bet_round_random_bets(self):
+        # 每次下注的上下限与遍历所有玩家的计算结果比较
+        rand = random.Random(0)
+        for _ in range(300):
+            players = [Player("player-{}".format(i), "Player", rand.randint(1, 100) * 10, 0, True)
+                       for i in range(rand.randint(2, 8))]
+            game_players = GamePlayers(players)
+            last_raise = []
+
+            def bet_function(player, min_bet, max_bet, bets):
+                stakes = [p.money + bets[p.id] for p in game_players.round(player.id) if p is not player]
+                self.assertEqual(min(max(stakes) - bets[player.id], player.money), max_bet)
+                self.assertEqual(min(max(bets.values()) - bets[player.id], player.money), min_bet)
+                choice = rand.random()
+                if choice < 0.1:
+                    return None
+                if choice < 0.3 and min_bet > 0:
+                    return -1
+                if choice < 0.5:
+                    bet = rand.randint(min_bet, max_bet)
+                    if bet > min_bet:
+                        last_raise[:] = [player]
+                    return bet
+                return min_bet
+
+            best_player = GameBetRounder(game_players).bet_round(players[-1].id, {}, bet_function)
+            if last_raise:
+                self.assertIs(last_raise[0], best_player)
+
 
 class GameBetHandlerTest(unittest.TestCase):
     pass
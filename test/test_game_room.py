@@ -0,0 +1,186 @@
+import json
+import time
+import unittest
+from unittest import mock
+
+import gevent
+
+from poker.channel import Channel
+from poker.game_room import GameRoom, GameRoomEventHandler, GameRoomPlayers
+from poker.player_server import PlayerServer
+from poker.poker_game_holdem import HoldemPokerGameEventDispatcher
+
+
+class RecordingChannel(Channel):
+    def __init__(self, incoming=()):
+        self.messages = []
+        self.encoded = []
+        self.incoming = list(incoming)
+
+    def recv_message(self, timeout_epoch=None):
+        return self.incoming.pop(0)
+
+    def send_message(self, message):
+        self.messages.append(message)
+
+
+class PollingRecordingChannel(RecordingChannel):
+    """Messages can be polled, like a channel to a message queue."""
+
+    def poll_message(self):
+        return self.incoming.pop(0) if self.incoming else None
+
+
+class EncodedRecordingChannel(RecordingChannel):
+    """Keeps the serialized messages, like a channel to a remote host."""
+
+    def send_encoded(self, data, message=None):
+        self.encoded.append(data)
+
+
+class GameRoomEventHandlerTest(unittest.TestCase):
+    def _create_handler(self, channels):
+        room_players = GameRoomPlayers(len(channels))
+        for i, channel in enumerate(channels):
+            room_players.add_player(PlayerServer(channel, mock.Mock(), id="player-{}".format(i),
+                                                 name="Player {}".format(i), money=1000, loan=0, ready=True))
+        return GameRoomEventHandler(room_players, "room-1", mock.Mock())
+
+    def test_broadcast_encodes_once(self):
+        channels = [EncodedRecordingChannel() for _ in range(4)]
+        handler = self._create_handler(channels)
+        message = {"message_type": "game-update", "event": "bet", "bet": 10}
+        with mock.patch("poker.game_room.encode_message", wraps=lambda m: json.dumps(m).encode()) as encode:
+            handler.broadcast(message)
+        encode.assert_called_once_with(message)
+        for channel in channels:
+            self.assertListEqual([channels[0].encoded[0]], channel.encoded)
+            self.assertIs(channels[0].encoded[0], channel.encoded[0])
+        self.assertDictEqual(message, json.loads(channels[0].encoded[0]))
+        self.assertDictEqual({"encoded": 1, "sent": 4}, handler.pop_encode_counts())
+        self.assertDictEqual({"encoded": 0, "sent": 0}, handler.pop_encode_counts())
+
+    def test_send_to_player(self):
+        channels = [EncodedRecordingChannel() for _ in range(3)]
+        handler = self._create_handler(channels)
+        handler.send(handler._room_players.get_player("player-1"), {"message_type": "game-update"})
+        self.assertListEqual([0, 1, 0], [len(channel.encoded) for channel in channels])
+        self.assertDictEqual({"encoded": 1, "sent": 1}, handler.pop_encode_counts())
+
+    def test_in_process_channel_gets_message(self):
+        channel = RecordingChannel()
+        handler = self._create_handler([channel])
+        message = {"message_type": "game-update", "event": "fold"}
+        handler.broadcast(message)
+        self.assertListEqual([message], channel.messages)
+        # Without the original message, the encoded one is decoded
+        channel.send_encoded(b'{"message_type": "pong"}')
+        self.assertDictEqual({"message_type": "pong"}, channel.messages[-1])
+
+    def test_room_event_sends_state(self):
+        channels = [EncodedRecordingChannel() for _ in range(3)]
+        handler = self._create_handler(channels)
+        handler.room_event("player-added", "player-2")
+        for channel in channels:
+            state, room_update = [json.loads(data) for data in channel.encoded]
+            self.assertTrue(state["full"])
+            self.assertListEqual(["player-0", "player-1", "player-2"], state["player_ids"])
+            self.assertNotIn("players", room_update)
+            self.assertEqual(state["version"], room_update["version"])
+        # Same snapshot, same room update
+        self.assertDictEqual({"encoded": 2, "sent": 6}, handler.pop_encode_counts())
+
+    def test_state_delta_per_acknowledged_version(self):
+        channels = [EncodedRecordingChannel([{"message_type": "state-ack", "version": 1}, {"message_type": "pong"}])
+                    for _ in range(3)]
+        handler = self._create_handler(channels)
+        handler.update_state(seats=handler._room_players.seats,
+                             players=[player.dto() for player in handler._room_players.players])
+        players = handler._room_players.players
+        # The state-ack is handled by the player server, not returned
+        for player in players[:2]:
+            self.assertDictEqual({"message_type": "pong"}, player.recv_message())
+            self.assertEqual(1, player.state_version)
+        handler.pop_encode_counts()
+        for channel in channels:
+            channel.encoded = []
+
+        players[0].take_money(100)
+        handler.update_state(players=[player.dto() for player in players])
+        deltas = [json.loads(channel.encoded[0]) for channel in channels]
+        self.assertDictEqual({"player-0": {"money": 900}}, deltas[0]["players"])
+        self.assertIs(channels[0].encoded[0], channels[1].encoded[0])
+        self.assertTrue(deltas[2]["full"])
+        self.assertDictEqual({"encoded": 2, "sent": 3}, handler.pop_encode_counts())
+
+    def test_state_acks_received_between_replies(self):
+        channels = [PollingRecordingChannel() for _ in range(2)]
+        handler = self._create_handler(channels)
+        players = handler._room_players.players
+        handler.update_state(seats=handler._room_players.seats, players=[player.dto() for player in players])
+        version = handler.table_state.version
+        # Acknowledged while no reply is expected
+        channels[0].incoming = [{"message_type": "pong"}, {"message_type": "state-ack", "version": version}]
+        channels[1].incoming = []
+
+        # Channels just read: not read again on every state update
+        players[1].take_money(50)
+        handler.update_state(players=[player.dto() for player in players])
+        self.assertIsNone(players[0].state_version)
+        self.assertEqual(2, len(channels[0].incoming))
+
+        for channel in channels:
+            channel.messages = []
+        players[0].take_money(100)
+        now = time.time() + PlayerServer.STATE_ACK_POLL_INTERVAL
+        with mock.patch("poker.player_server.time.time", return_value=now):
+            handler.update_state(players=[player.dto() for player in players])
+        self.assertEqual(version, players[0].state_version)
+        self.assertDictEqual({"player-0": {"money": 900}, "player-1": {"money": 950}},
+                             channels[0].messages[0]["players"])
+        self.assertTrue(channels[1].messages[0]["full"])
+        # Messages other than acknowledgements are kept for the next reply
+        self.assertDictEqual({"message_type": "pong"}, players[0].recv_message())
+
+
+class GameRoomTest(unittest.TestCase):
+    def _player(self, channel, player_id):
+        return PlayerServer(channel, mock.Mock(), id=player_id, name=player_id, money=1000, loan=0, ready=True)
+
+    def test_rejoin_sends_hand_snapshot(self):
+        room = GameRoom("room-1", False, mock.Mock(), 4, mock.Mock())
+        channels = [EncodedRecordingChannel() for _ in range(3)]
+        for i, channel in enumerate(channels):
+            room.join(self._player(channel, "player-{}".format(i)))
+        room.game_event("new-game", {"event": "new-game", "players": [{"id": "player-0"}], "dealer_id": "player-0"})
+        for i in range(3):
+            room.game_event("cards-assignment", {"event": "cards-assignment", "target": "player-{}".format(i),
+                                                 "cards": [[i + 2, 0], [i + 2, 1]], "score": {"category": 1}})
+        for n in range(50):
+            room.game_event("bet", {"event": "bet", "player": {"id": "player-0"}, "bet": n, "bets": {"player-0": n}})
+
+        channel = EncodedRecordingChannel()
+        room.join(self._player(channel, "player-1"))
+        table_state, room_update, snapshot = [json.loads(data) for data in channel.encoded]
+        self.assertTrue(table_state["full"])
+        self.assertEqual("player-rejoined", room_update["event"])
+        self.assertEqual("hand-snapshot", snapshot["event"])
+        self.assertListEqual([[3, 0], [3, 1]], snapshot["cards"])
+        self.assertDictEqual({"player-0": 49}, snapshot["bets"])
+
+
+    def test_full_event_queue_loses_no_events(self):
+        room = GameRoom("room-1", False, mock.Mock(), 4, mock.Mock())
+        events = []
+        event_dispatcher = HoldemPokerGameEventDispatcher("game-1", mock.Mock())
+        with mock.patch.object(room, "game_event", side_effect=lambda event, event_data: (
+                gevent.sleep(0.001), events.append(event_data["n"]))):
+            event_dispatcher.subscribe(room, queue_size=2, overflow=room.EVENT_OVERFLOW)
+            for n in range(20):
+                event_dispatcher.raise_event("bet", {"n": n})
+            event_dispatcher.close()
+        self.assertListEqual(list(range(20)), events)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from poker.hand_history import FsyncPolicy, HandHistoryRecorder, HandHistoryWriter
+from poker.hand_replay import HandRecord, ReplayHoldemPokerGame
+from poker.poker_game_holdem import HoldemPokerGameEventDispatcher
+
+
+class HandHistoryWriterTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _read_records(self, writer):
+        records = []
+        for path in writer.segment_paths():
+            with open(path) as f:
+                records += [json.loads(line) for line in f]
+        return records
+
+    def test_records_written_in_order(self):
+        writer = HandHistoryWriter(self._directory, logger=logging.getLogger())
+        writer.start()
+        for n in range(100):
+            self.assertTrue(writer.write({"n": n}))
+        self.assertTrue(writer.close(5))
+        self.assertListEqual([{"n": n} for n in range(100)], self._read_records(writer))
+        metrics = writer.metrics()
+        self.assertEqual(100, metrics["written"])
+        self.assertLessEqual(metrics["batches"], 100)
+        self.assertFalse(writer.write({"n": 100}))
+
+    def test_segment_rotation(self):
+        writer = HandHistoryWriter(self._directory, segment_size=100, batch_size=1, logger=logging.getLogger())
+        writer.start()
+        for n in range(10):
+            writer.write({"n": n, "data": "x" * 20})
+        writer.close(5)
+        # Two records of 34 bytes per segment
+        paths = writer.segment_paths()
+        self.assertListEqual([HandHistoryWriter.segment_name(i + 1) for i in range(5)],
+                             [os.path.basename(path) for path in paths])
+        self.assertTrue(all(os.path.getsize(path) <= 100 for path in paths))
+        # Appends to the last segment after a restart
+        writer = HandHistoryWriter(self._directory, segment_size=100, batch_size=1, logger=logging.getLogger())
+        writer.start()
+        writer.write({"n": 10})
+        writer.close(5)
+        self.assertEqual(5, len(writer.segment_paths()))
+        self.assertListEqual(list(range(11)), [record["n"] for record in self._read_records(writer)])
+
+    def test_fsync_policies(self):
+        for fsync, expected in ((FsyncPolicy.BATCH, 5), (FsyncPolicy.NEVER, 0)):
+            with mock.patch("poker.hand_history.os.fsync") as os_fsync:
+                writer = HandHistoryWriter(self._directory, batch_size=1, fsync=fsync, logger=logging.getLogger())
+                writer.start()
+                for n in range(5):
+                    writer.write({"n": n})
+                    time.sleep(0.01)
+                writer.close(5)
+                self.assertEqual(expected, os_fsync.call_count)
+        self.assertRaises(ValueError, HandHistoryWriter, self._directory, fsync="always")
+
+    def test_fsync_interval(self):
+        with mock.patch("poker.hand_history.os.fsync") as os_fsync:
+            writer = HandHistoryWriter(self._directory, fsync=FsyncPolicy.INTERVAL, fsync_interval=0.05,
+                                       logger=logging.getLogger())
+            writer.start()
+            for n in range(20):
+                writer.write({"n": n})
+                time.sleep(0.005)
+            time.sleep(0.1)
+            # Synced after the interval even though no other record was written
+            self.assertEqual(0, writer.metrics()["queued"])
+            self.assertGreaterEqual(os_fsync.call_count, 2)
+            self.assertLess(os_fsync.call_count, 10)
+            writer.close(5)
+
+    def test_full_queue_drops_records(self):
+        # Never started: nothing is consumed
+        writer = HandHistoryWriter(self._directory, queue_size=3, logger=mock.Mock())
+        start = time.time()
+        self.assertListEqual([True, True, True, False, False], [writer.write({"n": n}) for n in range(5)])
+        self.assertLess(time.time() - start, 0.1)
+        self.assertEqual(2, writer.metrics()["dropped"])
+
+
+class HandHistoryRecorderTest(unittest.TestCase):
+    def test_record_hand(self):
+        writer = mock.Mock()
+        recorder = HandHistoryRecorder(writer)
+        event_dispatcher = HoldemPokerGameEventDispatcher("game-1", logging.getLogger())
+        event_dispatcher.subscribe(recorder)
+        # Dealer p2, blinds p0 and p1: everyone calls pre-flop then checks until the showdown
+        record = HandRecord(
+            players=[("p{}".format(i), "Player {}".format(i), 1000, 0) for i in range(3)],
+            dealer_id="p2",
+            big_blind=10,
+            small_blind=5,
+            actions=[("p2", 10), ("p0", 5), ("p1", 0)] + [(p, 0) for p in ["p0", "p1", "p2"]] * 3,
+            seed=7
+        )
+        ReplayHoldemPokerGame(record, event_dispatcher=event_dispatcher).replay()
+        event_dispatcher.close()
+
+        writer.write.assert_called_once()
+        hand = writer.write.call_args[0][0]
+        self.assertEqual("game-1", hand["game_id"])
+        events = [event["event"] for event in hand["events"]]
+        self.assertEqual("new-game", events[0])
+        self.assertEqual("game-over", events[-1])
+        for event in ("cards-assignment", "bet", "shared-cards", "showdown", "winner-designation"):
+            self.assertIn(event, events)
+        self.assertNotIn("game_id", hand["events"][0])
+        self.assertLessEqual(hand["start"], hand["end"])
+
+    def test_concurrent_games(self):
+        writer = mock.Mock()
+        recorder = HandHistoryRecorder(writer)
+        for game_id in ("game-1", "game-2"):
+            recorder.game_event("new-game", {"event": "new-game", "game_id": game_id})
+        recorder.game_event("bet", {"event": "bet", "game_id": "game-2", "bet": 10})
+        recorder.game_event("game-over", {"event": "game-over", "game_id": "game-2"})
+        recorder.game_event("bet", {"event": "bet", "game_id": "game-3", "bet": 10})
+        hand = writer.write.call_args[0][0]
+        self.assertEqual("game-2", hand["game_id"])
+        self.assertListEqual(["new-game", "bet", "game-over"], [event["event"] for event in hand["events"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import logging
+import os
+import shutil
+import tempfile
+import types
+import unittest
+
+from poker.hand_history import HandHistoryRecorder, HandHistoryWriter
+from poker.hand_history_index import HandHistoryIndex, summarize_hand
+from poker.hand_replay import HandRecord, ReplayHoldemPokerGame
+from poker.poker_game_holdem import HoldemPokerGameEventDispatcher
+from poker.score_detector import HoldemPokerScore
+
+
+def create_record(game_id, start, results, room_id="room-1", categories=None):
+    """A hand record where every player goes from 1000 chips to 1000 + result."""
+    categories = categories if categories else {}
+    pot = sum(-result for result in results.values() if result < 0)
+    return {
+        "game_id": game_id,
+        "room_id": room_id,
+        "start": start,
+        "end": start + 1,
+        "events": [
+            {"event": "new-game", "players": [{"id": player_id, "money": 1000} for player_id in results]},
+            {"event": "showdown", "players": {
+                player_id: {"cards": [], "score": {"category": category, "cards": []}}
+                for player_id, category in categories.items()
+            }},
+            {"event": "winner-designation", "pot": {"money": pot}, "pots": [], "players": {
+                player_id: {"id": player_id, "money": 1000 + result} for player_id, result in results.items()
+            }},
+            {"event": "game-over"},
+        ]
+    }
+
+
+class HandHistoryIndexTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        writer = HandHistoryWriter(self._directory, segment_size=2000, batch_size=1, logger=logging.getLogger())
+        writer.start()
+        for n in range(30):
+            writer.write(create_record(
+                "game-{}".format(n),
+                start=1000.0 + n,
+                results={"a": 50 if n % 3 == 0 else -50, "b": -50 if n % 3 == 0 else 50, "c": 0},
+                room_id="room-{}".format(n % 2),
+                categories={"a": HoldemPokerScore.FULL_HOUSE if n % 5 == 0 else HoldemPokerScore.PAIR,
+                            "b": HoldemPokerScore.TRIPS}
+            ))
+        writer.close(5)
+        self.assertGreater(len(writer.segment_paths()), 1)
+        self._index = HandHistoryIndex(self._directory)
+        self.assertEqual(30, self._index.update())
+
+    def tearDown(self):
+        self._index.close()
+        shutil.rmtree(self._directory)
+
+    def _game_ids(self, **kwargs):
+        return [int(hand["game_id"].split("-")[1]) for hand in self._index.query(**kwargs)]
+
+    def test_query(self):
+        self.assertListEqual(list(range(30)), self._game_ids())
+        self.assertListEqual([5, 10, 20, 25], self._game_ids(player_id="a", category=HoldemPokerScore.FULL_HOUSE,
+                                                             result="lost"))
+        self.assertListEqual([0, 15], self._game_ids(player_id="a", category=HoldemPokerScore.FULL_HOUSE,
+                                                     result="won"))
+        self.assertListEqual([1, 3, 5], self._game_ids(room_id="room-1", until=1006))
+        self.assertListEqual([10, 11, 12], self._game_ids(since=1010, limit=3))
+        self.assertListEqual([], self._game_ids(player_id="c", result="lost"))
+        self.assertListEqual([], self._game_ids(player_id="c", category=HoldemPokerScore.PAIR))
+        # Any player
+        self.assertListEqual(list(range(0, 30, 5)), self._game_ids(category=HoldemPokerScore.FULL_HOUSE))
+        self.assertEqual(30, self._index.count(min_pot=50, max_pot=50))
+        self.assertEqual(10, self._index.count(player_id="b", result="lost"))
+        self.assertRaises(ValueError, self._index.query, result="draw")
+
+    def test_query_is_lazy(self):
+        hands = self._index.query(player_id="a")
+        self.assertIsInstance(hands, types.GeneratorType)
+        self.assertEqual("game-0", next(hands)["game_id"])
+        hands.close()
+
+    def test_incremental_update(self):
+        self.assertEqual(0, self._index.update())
+        writer = HandHistoryWriter(self._directory, segment_size=2000, logger=logging.getLogger())
+        writer.start()
+        writer.write(create_record("game-30", 2000.0, {"a": 10, "b": -10}))
+        writer.close(5)
+        # A record being written is indexed once complete
+        with open(writer.segment_paths()[-1], "a") as f:
+            f.write('{"game_id": "game-31"')
+        self.assertEqual(1, self._index.update())
+        self.assertEqual(0, self._index.update())
+        self.assertListEqual([30], self._game_ids(since=2000))
+        # Reopened index
+        self._index.close()
+        self._index = HandHistoryIndex(self._directory)
+        self.assertEqual(31, self._index.count())
+
+    def test_summarize_recorded_hand(self):
+        writer = HandHistoryWriter(os.path.join(self._directory, "recorded"))
+        recorder = HandHistoryRecorder(writer)
+        writer.write = lambda record: setattr(self, "_record", record)
+        event_dispatcher = HoldemPokerGameEventDispatcher("game-1", logging.getLogger(), room_id="room-1")
+        event_dispatcher.subscribe(recorder)
+        ReplayHoldemPokerGame(HandRecord(
+            players=[("p{}".format(i), "Player {}".format(i), 1000, 0) for i in range(3)],
+            dealer_id="p2",
+            big_blind=10,
+            small_blind=5,
+            actions=[("p2", 10), ("p0", 5), ("p1", 0)] + [(p, 0) for p in ["p0", "p1", "p2"]] * 3,
+            seed=7
+        ), event_dispatcher=event_dispatcher).replay()
+        event_dispatcher.close()
+
+        self.assertEqual("room-1", self._record["room_id"])
+        pot, players = summarize_hand(self._record)
+        self.assertEqual(30, pot)
+        self.assertEqual(0, sum(player["net"] for player in players.values()))
+        self.assertTrue(all(player["category"] is not None for player in players.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
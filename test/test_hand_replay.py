@@ -0,0 +1,66 @@
+import logging
+import os
+import tempfile
+import unittest
+
+from poker.hand_replay import HandRecord, HandRecorder, ReplayError, ReplayHoldemPokerGame, replay_hands, \
+    load_hand_records, save_hand_records
+from poker.poker_game_holdem import HoldemPokerGameEventDispatcher
+
+
+class HandReplayTests(unittest.TestCase):
+    def _create_record(self, **kwargs):
+        # Dealer p3, blinds p0 and p1: everyone calls pre-flop then checks until the showdown
+        actions = [("p2", 10), ("p3", 10), ("p0", 5), ("p1", 0)] + [(p, 0) for p in ["p0", "p1", "p2", "p3"]] * 3
+        args = {
+            "players": [("p{}".format(i), "Player {}".format(i), 1000.0, 0) for i in range(4)],
+            "dealer_id": "p3",
+            "big_blind": 10.0,
+            "small_blind": 5.0,
+            "actions": actions,
+            "seed": 42,
+        }
+        args.update(kwargs)
+        return HandRecord(**args)
+
+    def test_replay_is_deterministic(self):
+        result = ReplayHoldemPokerGame(self._create_record()).replay()
+        self.assertEqual(4000.0, sum(result.values()))
+        self.assertEqual(result, ReplayHoldemPokerGame(self._create_record()).replay())
+        self.assertEqual(result, ReplayHoldemPokerGame(self._create_record(result=result)).replay())
+
+    def test_replay_folds(self):
+        record = self._create_record(actions=[("p2", -1), ("p3", -1), ("p0", -1)])
+        result = ReplayHoldemPokerGame(record).replay()
+        self.assertDictEqual({"p0": 995.0, "p1": 1005.0, "p2": 1000.0, "p3": 1000.0}, result)
+
+    def test_replay_errors(self):
+        record = self._create_record(result={"p0": 0.0, "p1": 0.0, "p2": 0.0, "p3": 4000.0})
+        self.assertRaises(ReplayError, ReplayHoldemPokerGame(record).replay)
+        record = self._create_record(actions=[("p3", -1)])
+        self.assertRaises(ReplayError, ReplayHoldemPokerGame(record).replay)
+        record = self._create_record(actions=[("p2", -1), ("p3", -1), ("p0", -1), ("p1", 0)])
+        self.assertRaises(ReplayError, ReplayHoldemPokerGame(record).replay)
+        self.assertRaises(ValueError, self._create_record, cards=[1, 2, 3])
+
+    def test_record_and_replay(self):
+        event_dispatcher = HoldemPokerGameEventDispatcher("game", logging.getLogger())
+        recorder = HandRecorder()
+        event_dispatcher.subscribe(recorder)
+        result = ReplayHoldemPokerGame(self._create_record(), event_dispatcher=event_dispatcher).replay()
+        event_dispatcher.close()
+
+        record, = recorder.records
+        self.assertIsNone(record.seed)
+        self.assertEqual(13, len(record.cards))
+        self.assertEqual(16, len(record.actions))
+        self.assertEqual(result, record.result)
+
+        path = os.path.join(tempfile.mkdtemp(), "hands.jsonl")
+        save_hand_records(path, [record] * 3)
+        stats = replay_hands(load_hand_records(path))
+        self.assertEqual(3, stats["hands"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from poker import database
+from poker.player import Player, to_chips
+
+
+class PlayerTest(unittest.TestCase):
+    def test_to_chips(self):
+        self.assertEqual(1000, to_chips(1000))
+        self.assertEqual(1000, to_chips(999.9999999))
+        self.assertEqual(25, to_chips("25"))
+        self.assertIs(int, type(to_chips(12.0)))
+        self.assertRaises(ValueError, to_chips, "abc")
+
+    def test_money_is_whole_chips(self):
+        player = Player("player-1", "Player One", 1000.0, 0, True)
+        self.assertIs(int, type(player.money))
+        player.take_money(100.0)
+        player.add_money(50)
+        self.assertIs(int, type(player.money))
+        self.assertEqual(950, player.money)
+        self.assertRaises(ValueError, player.take_money, 0.5)
+        self.assertRaises(ValueError, player.add_money, 10.25)
+        self.assertEqual(950, player.money)
+
+    def test_dto_cache(self):
+        player = Player("player-1", "Player One", 1000, 0, True)
+        dto = player.dto()
+        self.assertIs(dto, player.dto())
+        player.take_money(100)
+        self.assertTrue(player.dto_dirty)
+        self.assertEqual(900, player.dto()["money"])
+        self.assertEqual(1000, dto["money"])
+        player.add_loan()
+        self.assertDictEqual({"id": "player-1", "name": "Player One", "money": 1900, "loan": 1}, player.dto())
+
+
+class MigrateMoneyToChipsTest(unittest.TestCase):
+    def setUp(self):
+        fd, self._path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        conn = sqlite3.connect(self._path)
+        conn.execute("""
+            CREATE TABLE users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                money INTEGER DEFAULT 1000,
+                loan INTEGER DEFAULT 0,
+                hands INTEGER DEFAULT 0
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE daily (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                start_money FLOAT DEFAULT 3000,
+                latest_money FLOAT DEFAULT 3000,
+                date DATE DEFAULT (date('now', 'localtime'))
+            )
+        """)
+        conn.executemany("INSERT INTO users (username, money) VALUES (?, ?)",
+                         [("player-1", 2999.9999999), ("player-2", 1500), ("player-3", 812.5)])
+        conn.execute("INSERT INTO daily (username, start_money, latest_money, date) VALUES (?, ?, ?, ?)",
+                     ("player-1", 3000.0, 2999.9999999, "2024-12-01"))
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.remove(self._path)
+
+    def test_migrate(self):
+        with mock.patch.object(database, "DATABASE_PATH", self._path):
+            self.assertTrue(database.migrate_money_to_chips())
+            # Run at every startup: migrated only once
+            conn = sqlite3.connect(self._path)
+            conn.execute("UPDATE users SET money = 1499.5 WHERE username = 'player-2'")
+            conn.commit()
+            conn.close()
+            self.assertTrue(database.migrate_money_to_chips())
+
+        conn = sqlite3.connect(self._path)
+        self.assertEqual(
+            [("player-1", 3000, "integer"), ("player-2", 1499.5, "real"), ("player-3", 813, "integer")],
+            conn.execute("SELECT username, money, typeof(money) FROM users ORDER BY id").fetchall()
+        )
+        self.assertEqual(
+            [("player-1", 3000, 3000, "integer", "2024-12-01")],
+            conn.execute("SELECT username, start_money, latest_money, typeof(latest_money), date FROM daily").fetchall()
+        )
+        self.assertEqual(database.SCHEMA_VERSION_CHIPS, conn.execute("PRAGMA user_version").fetchone()[0])
+        conn.close()
+
+    def test_migration_rolled_back(self):
+        conn = sqlite3.connect(self._path)
+        conn.execute("CREATE TABLE daily_float (id INTEGER)")
+        conn.commit()
+        conn.close()
+        with mock.patch.object(database, "DATABASE_PATH", self._path):
+            self.assertFalse(database.migrate_money_to_chips())
+        conn = sqlite3.connect(self._path)
+        self.assertEqual(0, conn.execute("PRAGMA user_version").fetchone()[0])
+        self.assertEqual("real", conn.execute("SELECT typeof(money) FROM users WHERE id = 3").fetchone()[0])
+        conn.close()
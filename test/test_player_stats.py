@@ -0,0 +1,182 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import gevent
+
+from poker import database
+from poker.hand_replay import HandRecord, ReplayHoldemPokerGame
+from poker.player_stats import PlayerStatsRecorder
+from poker.poker_game_holdem import HoldemPokerGameEventDispatcher
+
+
+class PlayerStatsRecorderTest(unittest.TestCase):
+    def _play_hand(self, recorder, game_id="game-1"):
+        event_dispatcher = HoldemPokerGameEventDispatcher(game_id, logging.getLogger())
+        event_dispatcher.subscribe(recorder)
+        # Dealer p2, blinds p0 and p1: p2 raises, p0 calls and p1 folds, then p2 bets the flop and p0 calls
+        ReplayHoldemPokerGame(HandRecord(
+            players=[("p{}".format(i), "Player {}".format(i), 1000, 0) for i in range(3)],
+            dealer_id="p2",
+            big_blind=10,
+            small_blind=5,
+            actions=[("p2", 30), ("p0", 25), ("p1", -1),
+                     ("p0", 0), ("p2", 20), ("p0", 20),
+                     ("p0", 0), ("p2", 0),
+                     ("p0", 0), ("p2", 0)],
+            seed=7
+        ), event_dispatcher=event_dispatcher).replay()
+        event_dispatcher.close()
+
+    def test_hand_counters(self):
+        save = mock.Mock(return_value=True)
+        recorder = PlayerStatsRecorder(save)
+        self._play_hand(recorder)
+        save.assert_not_called()
+        counters = {player_id: stats.counters for player_id, stats in recorder.pending.items()}
+
+        self.assertEqual(1, counters["p2"]["vpip_hands"])
+        self.assertEqual(1, counters["p2"]["pfr_hands"])
+        self.assertEqual(2, counters["p2"]["aggressive_actions"])
+        self.assertEqual(0, counters["p2"]["calls"])
+        self.assertEqual(1, counters["p0"]["vpip_hands"])
+        self.assertEqual(0, counters["p0"]["pfr_hands"])
+        self.assertEqual(2, counters["p0"]["calls"])
+        # Big blind folding: not voluntarily in the pot
+        self.assertDictEqual({"hands": 1, "vpip_hands": 0, "pfr_hands": 0, "aggressive_actions": 0, "calls": 0,
+                              "showdowns": 0, "showdowns_won": 0, "net_chips": -10}, counters["p1"])
+
+        self.assertEqual(1, counters["p0"]["showdowns"])
+        self.assertEqual(1, counters["p2"]["showdowns"])
+        self.assertGreaterEqual(counters["p0"]["showdowns_won"] + counters["p2"]["showdowns_won"], 1)
+        self.assertEqual(0, sum(player["net_chips"] for player in counters.values()))
+
+        stats = recorder.pending["p2"].dto()
+        self.assertEqual(100.0, stats["vpip"])
+        self.assertIsNone(stats["af"])
+        self.assertEqual(100 * counters["p2"]["net_chips"], stats["net_per_100"])
+
+    def test_flush_in_batches(self):
+        save = mock.Mock(return_value=False)
+        recorder = PlayerStatsRecorder(save, logger=mock.Mock())
+        recorder.FLUSH_HANDS = 2
+        self._play_hand(recorder, "game-1")
+        save.assert_not_called()
+        self._play_hand(recorder, "game-2")
+        save.assert_called_once()
+        # Not saved: kept for the next flush
+        self.assertEqual(2, recorder.pending["p0"].counters["hands"])
+        save.return_value = True
+        self.assertTrue(recorder.flush())
+        self.assertEqual(2, save.call_args[0][0]["p0"]["hands"])
+        self.assertDictEqual({}, recorder.pending)
+
+    def test_flush_outside_event_loop(self):
+        threads = []
+        recorder = PlayerStatsRecorder(lambda stats: threads.append(threading.current_thread()) or True)
+        self._play_hand(recorder)
+        self.assertTrue(recorder.flush())
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.current_thread(), threads[0])
+
+
+    def test_hands_ending_during_flush(self):
+        for saved in (True, False):
+            release = threading.Event()
+            batches = []
+
+            def save(stats):
+                batches.append(stats)
+                release.wait(5)
+                return saved
+
+            recorder = PlayerStatsRecorder(save, logger=mock.Mock())
+            self._play_hand(recorder, "game-1")
+            flushes = [gevent.spawn(recorder.flush) for _ in range(2)]
+            gevent.sleep(0.05)
+            # Saving the first hand: the second one ends meanwhile, the second flush waits
+            self._play_hand(recorder, "game-2")
+            self.assertEqual(1, len(batches))
+            self.assertEqual(1, batches[0]["p0"]["hands"])
+            release.set()
+            gevent.joinall(flushes)
+            self.assertListEqual([saved, saved], [flush.value for flush in flushes])
+            if saved:
+                # Second hand saved by the second flush, never twice
+                self.assertListEqual([1, 1], [batch["p0"]["hands"] for batch in batches])
+                self.assertDictEqual({}, recorder.pending)
+            else:
+                # Both hands kept for the next flush
+                self.assertEqual(2, recorder.pending["p0"].counters["hands"])
+                self.assertEqual(2, batches[-1]["p0"]["hands"])
+
+    def test_short_stack_call(self):
+        recorder = PlayerStatsRecorder(mock.Mock(return_value=True))
+        event_dispatcher = HoldemPokerGameEventDispatcher("game-1", logging.getLogger())
+        event_dispatcher.subscribe(recorder)
+        # Dealer p2 raises to 100, p0 calls, p1 (big blind, 60 chips) calls all-in, then p0 and p2 check down
+        ReplayHoldemPokerGame(HandRecord(
+            players=[("p0", "Player 0", 1000, 0), ("p1", "Player 1", 60, 0), ("p2", "Player 2", 1000, 0)],
+            dealer_id="p2",
+            big_blind=10,
+            small_blind=5,
+            actions=[("p2", 100), ("p0", 95), ("p1", 50)] + [("p0", 0), ("p2", 0)] * 3,
+            seed=7
+        ), event_dispatcher=event_dispatcher).replay()
+        event_dispatcher.close()
+        counters = recorder.pending["p1"].counters
+        self.assertEqual(0, counters["aggressive_actions"])
+        self.assertEqual(1, counters["calls"])
+        self.assertEqual(1, counters["vpip_hands"])
+        self.assertEqual(0, counters["pfr_hands"])
+        self.assertEqual(1, recorder.pending["p2"].counters["pfr_hands"])
+
+
+class PlayerStatsDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        fd, self._path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        conn = sqlite3.connect(self._path)
+        conn.execute("""
+            CREATE TABLE users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                money INTEGER DEFAULT 1000,
+                loan INTEGER DEFAULT 0,
+                hands INTEGER DEFAULT 0
+            )
+        """)
+        conn.execute("INSERT INTO users (username, money, loan, hands) VALUES ('alice', 3500, 0, 4)")
+        conn.execute("INSERT INTO users (username, money, loan, hands) VALUES ('bob', 2500, 0, 4)")
+        conn.commit()
+        conn.close()
+        self._patch = mock.patch.object(database, "DATABASE_PATH", self._path)
+        self._patch.start()
+        database.create_daily_table()
+        database.create_player_stats_table()
+
+    def tearDown(self):
+        self._patch.stop()
+        os.remove(self._path)
+
+    def test_add_player_stats(self):
+        self.assertTrue(database.add_player_stats({1: {"hands": 2, "vpip_hands": 1, "calls": 1}}))
+        self.assertTrue(database.add_player_stats({
+            1: {"hands": 2, "vpip_hands": 1, "pfr_hands": 1, "aggressive_actions": 3, "calls": 1, "net_chips": 40}
+        }))
+        stats = database.query_player_stats()
+        self.assertDictEqual({"hands": 4, "vpip_hands": 2, "pfr_hands": 1, "aggressive_actions": 3, "calls": 2,
+                              "showdowns": 0, "showdowns_won": 0, "net_chips": 40}, stats["1"])
+
+        ranking = {row[0]: row for row in database.get_ranking_list()}
+        self.assertDictEqual({"hands": 4, "vpip": 50.0, "pfr": 25.0, "af": 1.5, "wsd": 0.0, "net_per_100": 1000.0},
+                             ranking["alice"][4])
+        self.assertIsNone(ranking["bob"][4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,16 @@
+import os
+import pickle
+import random
+import sys
+import tempfile
 import unittest
+from unittest import mock
 
 from poker.card import Card
-from poker.score_detector import HoldemPokerScore, HoldemPokerScoreDetector
+from poker.deck import DeckFactory
+from poker.hand_evaluator import HandEvaluator, straight_top, get_hand_evaluator, load_hand_evaluator
+from poker.score_detector import HoldemPokerScore, HoldemPokerScoreDetector, Cards, BitCards, CardSet, \
+    ScoreDetector
 
 
 class CardTests(unittest.TestCase):
@@ -10,6 +19,32 @@ class CardTests(unittest.TestCase):
         self.assertEquals(3, card.rank)
         self.assertEquals(2, card.suit)
 
+    def test_cards_are_interned(self):
+        card = Card(14, 3)
+        self.assertIs(card, Card(14, 3))
+        self.assertIs(card, Card.from_code(int(card)))
+        self.assertIs(card, pickle.loads(pickle.dumps(card)))
+        self.assertEqual((14, 3), card.dto())
+
+    def test_cards_are_hashable(self):
+        cards = {Card(10, 0), Card(10, 1), Card(10, 0)}
+        self.assertEqual(2, len(cards))
+        self.assertIn(Card(10, 1), cards)
+        self.assertNotIn(Card(11, 1), cards)
+
+    def test_invalid_cards(self):
+        self.assertRaises(ValueError, Card, 1, 0)
+        self.assertRaises(ValueError, Card, 15, 0)
+        self.assertRaises(ValueError, Card, 2, 4)
+        for code in [-1, 0, 7, 60, 1000]:
+            self.assertRaises(ValueError, Card.from_code, code)
+
+    def test_all_cards(self):
+        self.assertEqual(52, len(Card.all_cards()))
+        self.assertEqual(32, len(set(Card.all_cards(7))))
+        deck = DeckFactory(2).create_deck()
+        self.assertEqual(set(Card.all_cards()), set(deck.pop_cards(52)))
+
 
 class HoldemPokerScoreDetectorTests(unittest.TestCase):
     """
@@ -286,5 +321,176 @@ class HoldemPokerScoreTests(unittest.TestCase):
         self.assertEquals(0, score2.cmp(score1))
 
 
+class BitCardsTests(unittest.TestCase):
+    SCORE_FUNCTIONS = [
+        "straight_flush", "quads", "full_house", "flush", "straight", "trips", "two_pair", "pair", "no_pair"
+    ]
+
+    def test_card_set(self):
+        card_set = CardSet([Card(14, 3), Card(14, 0), Card(2, 1)])
+        self.assertEqual(3, len(card_set))
+        self.assertIn(Card(14, 0), card_set)
+        self.assertNotIn(Card(14, 1), card_set)
+        self.assertEqual([1 << 14, 1 << 2, 0, 1 << 14], card_set.suit_masks)
+        self.assertEqual(1 << 14, card_set.pairs_mask)
+        self.assertEqual([Card(14, 3), Card(14, 0), Card(2, 1)], CardSet.to_cards(card_set.bits))
+
+    def _test_same_scores(self, lowest_rank, num_cards, seed):
+        deck = [Card(rank, suit) for rank in range(lowest_rank, 15) for suit in range(4)]
+        rand = random.Random(seed)
+        for _ in range(5000):
+            cards = rand.sample(deck, num_cards)
+            expected = Cards(cards, lowest_rank)
+            actual = BitCards(cards, lowest_rank)
+            for score_function in self.SCORE_FUNCTIONS:
+                expected_cards = getattr(expected, score_function)()
+                actual_cards = getattr(actual, score_function)()
+                if expected_cards is None:
+                    self.assertIsNone(actual_cards)
+                else:
+                    self.assertEqual([card.dto() for card in expected_cards], [card.dto() for card in actual_cards])
+
+    def test_same_scores_as_cards(self):
+        for num_cards in (2, 5, 7, 10):
+            self._test_same_scores(2, num_cards, num_cards)
+
+    def test_same_scores_as_cards_short_deck(self):
+        self._test_same_scores(7, 7, 0)
+
+    def test_detector_with_bit_cards(self):
+        detector = HoldemPokerScoreDetector()
+        with mock.patch.object(BitCards, "straight_flush", autospec=True,
+                               side_effect=BitCards.straight_flush) as straight_flush:
+            # Hands the lookup tables don't cover
+            score = detector.get_score([Card(14, 2), Card(3, 2), Card(2, 2), Card(5, 2), Card(4, 2), Card(9, 1),
+                                        Card(9, 0), Card(9, 3)])
+            self.assertEqual(HoldemPokerScore.STRAIGHT_FLUSH, score.category)
+            self.assertEqual([Card(5, 2), Card(4, 2), Card(3, 2), Card(2, 2), Card(14, 2)], score.cards)
+            score = detector.get_score([Card(8, 0), Card(8, 3)])
+            self.assertEqual(HoldemPokerScore.PAIR, score.category)
+            self.assertEqual([Card(8, 3), Card(8, 0)], score.cards)
+            self.assertEqual(2, straight_flush.call_count)
+            # 5 to 7 cards: lookup tables
+            detector.get_score([Card(14, 2), Card(3, 2), Card(2, 2), Card(5, 2), Card(4, 2)])
+            self.assertEqual(2, straight_flush.call_count)
+
+
+class HandEvaluatorTests(unittest.TestCase):
+    def test_straight_top(self):
+        self.assertEqual(14, straight_top(0b1111100000000))
+        self.assertEqual(5, straight_top(0b1000000001111))
+        self.assertEqual(0, straight_top(0b1000000000111))
+
+    def test_table_score_matches_cards_score(self):
+        # The lookup tables must detect the same score (category, cards and their order) as Cards
+        detector = HoldemPokerScoreDetector()
+        deck = [Card(rank, suit) for rank in range(2, 15) for suit in range(4)]
+        rand = random.Random(0)
+        for _ in range(20000):
+            cards = rand.sample(deck, rand.randint(HandEvaluator.MIN_CARDS, HandEvaluator.MAX_CARDS))
+            table_score = detector._get_table_score(cards)
+            cards_score = detector._get_cards_score(cards)
+            self.assertEqual(cards_score.category, table_score.category)
+            self.assertEqual([card.dto() for card in cards_score.cards], [card.dto() for card in table_score.cards])
+            self.assertEqual(cards_score.strength, table_score.strength)
+
+    def test_evaluate_flushes(self):
+        detector = HoldemPokerScoreDetector()
+        evaluator = detector.evaluator
+        for suit in range(4):
+            cards = [Card(rank, suit) for rank in (2, 5, 9, 11, 13)] + [Card(13, (suit + 1) % 4), Card(9, (suit + 2) % 4)]
+            score = detector._get_cards_score(cards)
+            self.assertEqual(HoldemPokerScore.FLUSH, score.category)
+            self.assertEqual(score.strength, evaluator.evaluate([int(card) for card in cards]))
+
+
+class HandEvaluatorTablesFileTests(unittest.TestCase):
+    def test_save_and_load(self):
+        evaluator = get_hand_evaluator()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tables.bin")
+            evaluator.save(path)
+            loaded = HandEvaluator.load(path)
+            self.assertEqual(list(evaluator.flush_table), list(loaded.flush_table))
+            self.assertEqual(list(evaluator.displacements), list(loaded.displacements))
+            self.assertEqual(list(evaluator.rank_table), list(loaded.rank_table))
+            hand = [int(card) for card in [Card(14, 0), Card(14, 1), Card(9, 2), Card(9, 3), Card(2, 0), Card(5, 0), Card(7, 1)]]
+            self.assertEqual(evaluator.evaluate(hand), loaded.evaluate(hand))
+
+    def test_load_incompatible_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tables.bin")
+            with open(path, "wb") as f:
+                f.write(b"PYPOKER\0" + b"\xff" * 64)
+            self.assertRaises(ValueError, HandEvaluator.load, path)
+
+    def test_load_modified_tables(self):
+        evaluator = get_hand_evaluator()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tables.bin")
+            evaluator.save(path)
+            with open(path, "r+b") as f:
+                f.seek(-4, os.SEEK_END)
+                f.write(b"\x00\x00\x00\x00")
+            self.assertRaises(ValueError, HandEvaluator.load, path)
+            # Rebuilt rather than used
+            with mock.patch.object(HandEvaluator, "build", return_value=evaluator) as build:
+                load_hand_evaluator(path)
+                self.assertEqual(1, build.call_count)
+            self.assertEqual(list(evaluator.rank_table), list(HandEvaluator.load(path).rank_table))
+
+    def test_load_generates_missing_tables(self):
+        evaluator = get_hand_evaluator()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "v1", "tables.bin")
+            with mock.patch.object(HandEvaluator, "build", return_value=evaluator) as build:
+                loaded = load_hand_evaluator(path)
+                self.assertEqual(1, build.call_count)
+                self.assertTrue(os.path.exists(path))
+                load_hand_evaluator(path)
+                self.assertEqual(1, build.call_count)
+            self.assertEqual(list(evaluator.rank_table), list(loaded.rank_table))
+
+
+class ScoresBatchTests(unittest.TestCase):
+    def _random_hands(self, num_hands, seed):
+        deck = [Card(rank, suit) for rank in range(2, 15) for suit in range(4)]
+        rand = random.Random(seed)
+        return [rand.sample(deck, 7) for _ in range(num_hands)]
+
+    def test_batch_matches_get_score(self):
+        detector = HoldemPokerScoreDetector()
+        hands = self._random_hands(5000, 0)
+        strengths = detector.get_scores_batch([[int(card) for card in hand] for hand in hands])
+        self.assertEqual((5000,), strengths.shape)
+        self.assertListEqual([detector.get_score(hand).strength for hand in hands], strengths.tolist())
+
+    def test_batch_default_implementation(self):
+        hands = self._random_hands(200, 1)
+        codes = [[int(card) for card in hand] for hand in hands]
+        self.assertListEqual(
+            HoldemPokerScoreDetector().get_scores_batch(codes).tolist(),
+            ScoreDetector.get_scores_batch(HoldemPokerScoreDetector(), codes).tolist()
+        )
+
+    def test_batch_invalid_hands(self):
+        detector = HoldemPokerScoreDetector()
+        self.assertRaises(ValueError, detector.get_scores_batch, [[8, 9, 10, 11]])
+        self.assertRaises(ValueError, detector.get_scores_batch, [[8, 9, 10, 11, 12, 13, 3]])
+        self.assertRaises(ValueError, detector.get_scores_batch, [[8, 9, 10, 11, 12, 13, 13]])
+
+    def test_batch_without_numpy(self):
+        detector = HoldemPokerScoreDetector()
+        hands = self._random_hands(200, 2)
+        codes = [[int(card) for card in hand] for hand in hands]
+        expected = detector.get_scores_batch(codes).tolist()
+        with mock.patch.dict(sys.modules, {"numpy": None}):
+            self.assertListEqual(expected, detector.get_scores_batch(codes).tolist())
+            self.assertListEqual(expected, ScoreDetector.get_scores_batch(detector, codes).tolist())
+            self.assertRaises(ValueError, detector.get_scores_batch, [[8, 9, 10, 11]])
+            self.assertRaises(ValueError, detector.get_scores_batch, [[8, 9, 10, 11, 12, 13, 3]])
+            self.assertRaises(ValueError, detector.get_scores_batch, [[8, 9, 10, 11, 12, 13, 13]])
+
+
 if __name__ == '__main__':
     unittest.main()
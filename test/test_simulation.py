@@ -0,0 +1,42 @@
+import random
+import unittest
+
+from poker.simulation import HoldemSimulation, CallStrategy, RandomStrategy, ScoreStrategy
+
+
+class HoldemSimulationTests(unittest.TestCase):
+    def _create_simulation(self, seed):
+        rand = random.Random(seed)
+        return HoldemSimulation(
+            [CallStrategy(), RandomStrategy(rand, fold=0.2, raise_=0.3, raise_amount=200.0), ScoreStrategy(),
+             RandomStrategy(rand, fold=0.1, raise_=0.5, raise_amount=500.0)],
+            seed=seed
+        )
+
+    def test_money_is_conserved(self):
+        simulation = self._create_simulation(1)
+        report = simulation.run(300)
+        self.assertEqual(300, report.hands)
+        self.assertGreater(report.hands_per_sec, 0)
+        self.assertGreater(report.loans, 0)
+        # Loans bring 1000 chips to the table, refunds take them back
+        self.assertEqual(4000.0, sum(player.money - 1000 * player.loan for player in simulation.players))
+        self.assertEqual(0.0, sum(player["net"] for player in report.dto()["players"]))
+
+    def test_money_is_whole_chips(self):
+        simulation = HoldemSimulation([RandomStrategy(random.Random(2)) for _ in range(3)], big_blind=7, small_blind=3,
+                                      seed=2)
+        simulation.run(100)
+        self.assertTrue(all(type(player.money) is int for player in simulation.players))
+
+    def test_seeded_simulations(self):
+        report1 = self._create_simulation(7).run(100).dto()
+        report2 = self._create_simulation(7).run(100).dto()
+        self.assertListEqual(report1["players"], report2["players"])
+
+    def test_too_few_players(self):
+        self.assertRaises(ValueError, HoldemSimulation, [CallStrategy()])
+
+
+if __name__ == '__main__':
+    unittest.main()
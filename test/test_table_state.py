@@ -0,0 +1,146 @@
+import random
+import unittest
+
+from poker.table_state import HandSnapshot, TableState
+
+
+class TableStateTest(unittest.TestCase):
+    def _dto(self, player_id, money=1000, loan=0):
+        return {"id": player_id, "name": player_id.upper(), "money": money, "loan": loan}
+
+    def _apply(self, state: dict, message: dict) -> dict:
+        """Applies a table-state message as the client does."""
+        if message.get("full"):
+            return {"version": message["version"], "players": dict(message["players"]),
+                    "player_ids": list(message["player_ids"])}
+        self.assertLessEqual(message["base_version"], state["version"])
+        players = dict(state["players"])
+        for player_id, fields in message["players"].items():
+            if fields is None:
+                del players[player_id]
+            else:
+                player = dict(players.get(player_id, {}))
+                player.update(fields)
+                players[player_id] = player
+        return {"version": message["version"], "players": players,
+                "player_ids": message.get("player_ids", state["player_ids"])}
+
+    def test_snapshot(self):
+        table = TableState("room-1", 3)
+        self.assertTrue(table.update([self._dto("a")], seats=["a", None, None]))
+        self.assertDictEqual({
+            "message_type": "table-state",
+            "room_id": "room-1",
+            "version": 1,
+            "full": True,
+            "players": {"a": self._dto("a")},
+            "player_ids": ["a", None, None],
+        }, table.delta(None))
+
+    def test_delta_changed_fields(self):
+        table = TableState("room-1", 3)
+        table.update([self._dto("a"), self._dto("b")], seats=["a", "b", None])
+        self.assertFalse(table.update([self._dto("a"), self._dto("b")]))
+        self.assertTrue(table.update([self._dto("a", money=900), self._dto("b")]))
+        self.assertDictEqual({
+            "message_type": "table-state",
+            "room_id": "room-1",
+            "version": 2,
+            "base_version": 1,
+            "players": {"a": {"money": 900}},
+        }, table.delta(1))
+        self.assertDictEqual({}, table.delta(2)["players"])
+
+    def test_delta_seats(self):
+        table = TableState("room-1", 3)
+        table.update([self._dto("a"), self._dto("b")], seats=["a", "b", None])
+        table.update([self._dto("a"), self._dto("c")], seats=["a", None, "c"])
+        delta = table.delta(1)
+        self.assertListEqual(["a", None, "c"], delta["player_ids"])
+        self.assertDictEqual({"b": None, "c": self._dto("c")}, delta["players"])
+        # Players not seated are ignored
+        self.assertFalse(table.update([self._dto("b", money=0)]))
+
+    def test_snapshot_when_delta_unavailable(self):
+        table = TableState("room-1", 2)
+        table.MAX_REMOVED = 2
+        table.update([self._dto("a")], seats=["a", None])
+        for i in range(3):
+            player_id = "p{}".format(i)
+            table.update([self._dto(player_id)], seats=["a", player_id])
+        table.update(seats=["a", None])
+        self.assertTrue(table.delta(1).get("full"))
+        self.assertFalse(table.delta(table.version - 1).get("full"))
+        # Versions from the future
+        self.assertTrue(table.delta(table.version + 1).get("full"))
+
+    def test_random_deltas(self):
+        rand = random.Random(3)
+        ids = ["p{}".format(i) for i in range(8)]
+        table = TableState("room-1", 5)
+        seats = [None] * 5
+        money = {player_id: 1000 for player_id in ids}
+        clients = [{"version": None}, {"version": None}]
+        for _ in range(300):
+            if rand.random() < 0.2:
+                seat = rand.randrange(len(seats))
+                seats[seat] = None if seats[seat] else rand.choice([i for i in ids if i not in seats])
+            for player_id in rand.sample(ids, 3):
+                money[player_id] = rand.randint(0, 2000)
+            table.update([self._dto(player_id, money[player_id]) for player_id in ids], seats=list(seats))
+            for k, client in enumerate(clients):
+                # The second client acknowledges one version out of three
+                if k == 0 or rand.random() < 0.3:
+                    clients[k] = self._apply(client, table.delta(client["version"]))
+                    self.assertDictEqual(table.delta(None)["players"], clients[k]["players"])
+                    self.assertListEqual(seats, clients[k]["player_ids"])
+
+
+class HandSnapshotTest(unittest.TestCase):
+    def _message(self, event, **event_data):
+        event_data.update({"message_type": "game-update", "event": event})
+        return event_data
+
+    def test_snapshot(self):
+        hand = HandSnapshot()
+        self.assertIsNone(hand.snapshot("a"))
+        new_game = self._message("new-game", players=[{"id": "a"}, {"id": "b"}, {"id": "c"}], dealer_id="a")
+        action = self._message("player-action", player={"id": "c"}, min_bet=10, max_bet=100)
+        for message in [
+            new_game,
+            self._message("cards-assignment", target="a", cards=[[14, 3], [13, 3]], score={"category": 0}),
+            self._message("cards-assignment", target="b", cards=[[2, 0], [2, 1]], score={"category": 1}),
+            self._message("bet", player={"id": "a"}, bet=10, bets={"a": 10}),
+            self._message("fold", player={"id": "b"}),
+            self._message("pots-update", pots=[{"money": 20, "player_ids": ["a", "c"]}]),
+            self._message("shared-cards", cards=[[3, 0], [4, 0], [5, 0]]),
+            self._message("bet", player={"id": "a"}, bet=20, bets={"a": 20}),
+            action,
+        ]:
+            hand.update(message)
+
+        self.assertDictEqual({
+            "message_type": "game-update",
+            "event": "hand-snapshot",
+            "new_game": new_game,
+            "shared_cards": [[3, 0], [4, 0], [5, 0]],
+            "pots": [{"money": 20, "player_ids": ["a", "c"]}],
+            "bets": {"a": 20},
+            "folded_ids": ["b"],
+            "player_action": action,
+            "showdown": None,
+            "winner_pot": None,
+            "cards": [[14, 3], [13, 3]],
+            "score": {"category": 0},
+        }, hand.snapshot("a"))
+        # Hole cards of the other players are not sent
+        self.assertNotIn("cards", hand.snapshot("c"))
+
+        hand.update(self._message("bet", player={"id": "c"}, bet=20, bets={"a": 20, "c": 20}))
+        self.assertIsNone(hand.snapshot("a")["player_action"])
+        hand.update(self._message("game-over"))
+        self.assertIsNone(hand.snapshot("a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,12 @@ import logging
 import redis
 import os
 
+from poker.database import create_player_stats_table, migrate_money_to_chips
 from poker.game_server_redis import GameServerRedis
 from poker.game_room import GameRoomFactory
+from poker.hand_history import HandHistoryRecorder, HandHistoryWriter
+from poker.player_stats import PlayerStatsRecorder
+from poker.hand_evaluator import get_hand_evaluator
 from poker.poker_game_holdem import HoldemPokerGameFactory
 
 os.environ["REDIS_URL"] = "redis://localhost:6379/0"
@@ -13,6 +17,21 @@ if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG if 'DEBUG' in os.environ else logging.INFO)
     logger = logging.getLogger()
 
+    # Mapping the hand evaluator tables file (shared by every worker, generated only if missing)
+    get_hand_evaluator()
+
+    # Hand history of every game, written to disk by a background thread
+    hand_history_writer = HandHistoryWriter(os.environ.get("HAND_HISTORY_DIR", "hand-history"), logger=logger)
+    hand_history_writer.start()
+
+    # Money is accounted in integer chips: databases storing floats are converted once
+    if not migrate_money_to_chips():
+        raise SystemExit("Unable to convert the database money to integer chips")
+
+    # VPIP, PFR, aggression... saved in batches to the player_stats table
+    create_player_stats_table()
+    player_stats_recorder = PlayerStatsRecorder(logger=logger)
+
     redis_url = os.environ["REDIS_URL"]
     redis = redis.from_url(redis_url)
 
@@ -22,12 +41,16 @@ if __name__ == '__main__':
         room_factory=GameRoomFactory(
             room_size=10,
             game_factory=HoldemPokerGameFactory(
-                big_blind=10.0,
-                small_blind=5.0,
+                big_blind=10,
+                small_blind=5,
                 logger=logger,
-                game_subscribers=[]
+                game_subscribers=[HandHistoryRecorder(hand_history_writer), player_stats_recorder]
             )
         ),
         logger=logger
     )
-    server.start()
+    try:
+        server.start()
+    finally:
+        player_stats_recorder.flush()
+        hand_history_writer.close()